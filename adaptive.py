@@ -0,0 +1,54 @@
+"""
+adaptive.py
+Motion- and state-gated pose inference rate.
+
+Pose runs at full rate whenever the detector reports an attempt in progress
+(Detector.in_attempt(), e.g. a jump in the air or a ball in flight) or when
+cheap frame differencing on a small grayscale thumbnail shows motion. After
+MOTION_HOLD_SECONDS without either, pose drops to IDLE_FPS until something
+moves again.
+"""
+
+import cv2
+
+IDLE_FPS = 5.0
+MOTION_THRESHOLD = 4.0       # mean absolute grey-level change on the thumbnail
+MOTION_HOLD_SECONDS = 1.0    # stay at full rate this long after the last motion
+THUMBNAIL_SIZE = (160, 90)
+
+
+class AdaptiveScheduler:
+    def __init__(self, idle_fps=IDLE_FPS, motion_threshold=MOTION_THRESHOLD):
+        self.idle_interval = 1.0 / idle_fps
+        self.motion_threshold = motion_threshold
+        self.prev_thumb = None
+        self.last_motion = -float("inf")
+        self.last_inference = -float("inf")
+        self.inferred = 0
+        self.skipped = 0
+
+    def motion(self, image):
+        """Mean absolute difference between this frame's thumbnail and the previous one."""
+        thumb = cv2.cvtColor(cv2.resize(image, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        prev, self.prev_thumb = self.prev_thumb, thumb
+        if prev is None:
+            return float("inf")
+        return float(cv2.absdiff(thumb, prev).mean())
+
+    def should_infer(self, frame, detector):
+        now = frame.timestamp
+        if self.motion(frame.image) > self.motion_threshold:
+            self.last_motion = now
+        run = (detector.in_attempt()
+               or now - self.last_motion < MOTION_HOLD_SECONDS
+               or now - self.last_inference >= self.idle_interval)
+        if run:
+            self.last_inference = now
+            self.inferred += 1
+        else:
+            self.skipped += 1
+        return run
+
+    def summary(self):
+        total = self.inferred + self.skipped
+        return f"Pose ran on {self.inferred} of {total} frames ({self.skipped} skipped while idle)"
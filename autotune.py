@@ -0,0 +1,207 @@
+"""
+autotune.py
+Pose model complexity and resolution chosen to hold a per-test FPS target.
+
+Every Detector names a target_fps: jumps and throws need more frames per second
+than the sit-and-reach hold. With --autotune the tracker first measures
+sustained throughput on the live camera at each of LEVELS, from the most to the
+least expensive, and keeps the first level that reaches the target (or the
+fastest one if none does). A level is a MediaPipe model complexity, a capture
+size and the scale of the image pose inference sees.
+
+While running, the tuner watches how long every inferred frame takes. Once per
+ADJUST_SECONDS it steps one level down when throughput has fallen below the
+target, or one level up when there is clear headroom and that level has not
+recently been measured too slow. Runtime steps keep the capture size chosen at
+startup, so pixel geometry (calibration, lane boxes, ROI crops) never moves, and
+no step is taken while the detector reports an attempt in progress.
+"""
+
+import time
+from collections import namedtuple
+
+import cv2
+
+# complexity: MediaPipe model_complexity, capture_size: (w, h) asked of the camera,
+# scale: fraction of the captured frame's size that pose inference sees
+Level = namedtuple("Level", ["complexity", "capture_size", "scale"])
+
+LEVELS = (
+    Level(2, (1280, 720), 1.0),
+    Level(1, (1280, 720), 1.0),
+    Level(1, (1280, 720), 0.5),
+    Level(0, (1280, 720), 0.5),
+    Level(0, (960, 540), 0.5),
+    Level(0, (640, 360), 0.5),
+)
+DEFAULT_LEVEL = Level(1, (1280, 720), 1.0)
+
+WARMUP_FRAMES = 10          # frames run through a new level before timing it
+MEASURE_SECONDS = 1.5       # timed frames per level at startup
+ADJUST_SECONDS = 5.0        # runtime decision window
+MIN_SAMPLES = 20            # inferred frames needed before a runtime decision
+STEP_DOWN_RATIO = 0.9       # step down below this fraction of the target
+STEP_UP_RATIO = 1.6         # step up above this multiple of the target
+RETRY_SECONDS = 60.0        # how long a level measured too slow is not retried
+
+
+class AutoTuner:
+    """
+    Picks and adjusts the pose Level for one tracker.
+
+    build(level) returns the estimate function (BGR image -> pose results) for a
+    level and raises OSError or RuntimeError if its model cannot be loaded (the
+    lite and heavy models are downloaded on first use).
+    """
+
+    def __init__(self, target_fps, build, frame_size, levels=LEVELS):
+        self.target_fps = target_fps
+        self.build = build
+        # never ask for more than the tracker's configured frame size
+        self.levels = [l for l in levels if l.capture_size[0] <= frame_size[0]] or [DEFAULT_LEVEL]
+        self.level = None
+        self.unavailable = set()    # model complexities that failed to load
+        self.measured = {}          # level -> (fps, time measured)
+        self.switches = 0
+        self._samples = 0
+        self._busy = 0.0
+        self._window_start = None
+
+    def tune(self, cap, live=True):
+        """Measure levels on real frames and settle on one; returns its estimate function."""
+        if not live:
+            # a video file's resolution is fixed: only complexity and inference scale can vary
+            size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            self.levels = list(dict.fromkeys(l._replace(capture_size=size) for l in self.levels))
+        print(f"Auto-tuning pose for {self.target_fps:.0f} FPS...")
+        best = None
+        for level in self.levels:
+            fps = self._measure(cap, level, live)
+            if fps is None:
+                continue
+            print(f"  complexity {level.complexity}, capture {level.capture_size[0]}x{level.capture_size[1]}, "
+                  f"inference scale {level.scale:g}: {fps:.1f} FPS")
+            if best is None or fps > self.measured[best][0]:
+                best = level
+            if fps >= self.target_fps:
+                best = level
+                break
+        if not live:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        if best is None:
+            raise RuntimeError("no pose model could be loaded")
+        if self.measured[best][0] < self.target_fps:
+            print(f"WARNING: no setting reaches {self.target_fps:.0f} FPS; using the fastest.")
+        if live:
+            set_capture_size(cap, best.capture_size)
+        estimate = self.build(best)
+        self._select(best)
+        return estimate
+
+    def _measure(self, cap, level, live):
+        """Sustained FPS of the capture + inference pipeline at a level, or None if its model is unavailable."""
+        estimate = self._try_build(level)
+        if estimate is None:
+            return None
+        if live:
+            set_capture_size(cap, level.capture_size)
+        read_seconds = infer_seconds = 0.0
+        warmup = timed = 0
+        end = None
+        while end is None or time.perf_counter() < end:
+            start = time.perf_counter()
+            ret, image = cap.read()
+            if not ret:
+                break
+            read = time.perf_counter()
+            estimate(image)
+            done = time.perf_counter()
+            if end is None:
+                warmup += 1
+                if warmup >= WARMUP_FRAMES:
+                    end = done + MEASURE_SECONDS
+                continue
+            read_seconds += read - start
+            infer_seconds += done - read
+            timed += 1
+        if not timed:
+            return None
+        # capture and inference run on separate threads, so the slower stage sets the rate
+        fps = timed / max(read_seconds, infer_seconds)
+        self.measured[level] = (fps, time.monotonic())
+        return fps
+
+    def _try_build(self, level):
+        if level.complexity in self.unavailable:
+            return None
+        try:
+            return self.build(level)
+        except (OSError, RuntimeError) as e:
+            print(f"Pose model complexity {level.complexity} unavailable: {e}")
+            self.unavailable.add(level.complexity)
+            return None
+
+    def _select(self, level):
+        self.level = level
+        # runtime steps stay at the chosen capture size
+        self._runtime = [l for l in self.levels
+                         if l.capture_size == level.capture_size and l.complexity not in self.unavailable]
+        self._samples = 0
+        self._busy = 0.0
+        self._window_start = None
+
+    def observe(self, seconds):
+        """Account for one inferred frame that took seconds end to end."""
+        self._samples += 1
+        self._busy += seconds
+
+    def adjust(self, now, in_attempt):
+        """A new estimate function when the level should change, else None."""
+        if self._window_start is None:
+            self._window_start = now
+            return None
+        if in_attempt or now - self._window_start < ADJUST_SECONDS or self._samples < MIN_SAMPLES:
+            return None
+        fps = self._samples / self._busy
+        self.measured[self.level] = (fps, time.monotonic())
+        self._samples = 0
+        self._busy = 0.0
+        self._window_start = now
+
+        i = self._runtime.index(self.level)
+        if fps < self.target_fps * STEP_DOWN_RATIO and i + 1 < len(self._runtime):
+            return self._switch(self._runtime[i + 1], fps)
+        if fps > self.target_fps * STEP_UP_RATIO and i > 0:
+            upper = self._runtime[i - 1]
+            known = self.measured.get(upper)
+            if known is None or known[0] >= self.target_fps or time.monotonic() - known[1] > RETRY_SECONDS:
+                return self._switch(upper, fps)
+        return None
+
+    def _switch(self, level, fps):
+        estimate = self._try_build(level)
+        if estimate is None:
+            self._runtime = [l for l in self._runtime if l.complexity not in self.unavailable]
+            return None
+        print(f"Pose at {fps:.1f} FPS (target {self.target_fps:.0f}): switching to complexity "
+              f"{level.complexity}, inference scale {level.scale:g}")
+        self.switches += 1
+        self._select(level)
+        return estimate
+
+    def register(self, registry):
+        registry.gauge("tracker_pose_model_complexity", "MediaPipe model complexity in use",
+                       function=lambda: self.level.complexity)
+        registry.gauge("tracker_inference_scale", "Fraction of the frame size pose inference sees",
+                       function=lambda: self.level.scale)
+        registry.gauge("tracker_target_fps", "Auto-tune FPS target", function=lambda: self.target_fps)
+
+    def summary(self):
+        level = self.level
+        return (f"Auto-tune: complexity {level.complexity}, capture {level.capture_size[0]}x{level.capture_size[1]}, "
+                f"inference scale {level.scale:g} ({self.switches} runtime switches)")
+
+
+def set_capture_size(cap, size):
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
@@ -0,0 +1,148 @@
+"""
+ball.py
+Lightweight tracker for a thrown ball, cheap enough for every camera frame.
+
+The ball is found by background subtraction: a running-average background
+(updated with BACKGROUND_ALPHA per frame, so a ball at rest fades into it) is
+compared with the frame, the foreground pixels are cleaned up and split into
+blobs, and blobs of a plausible ball size and shape are kept. A blob must also
+have moved since the previous frame, which rules out the "ghost" a ball leaves
+behind where it rested. An optional HSV colour range narrows the mask further
+for a brightly coloured ball.
+
+Only a search window is examined: around the predicted position (constant
+velocity from the last two sightings) while the ball is tracked, around a hint
+point (the athlete's hands) while waiting for a throw, and the whole frame
+otherwise. Sizes are given for a 1280 px wide frame and scale with the frame.
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+REFERENCE_WIDTH = 1280
+BALL_RADIUS_RANGE = (8, 60)   # px
+DIFF_THRESHOLD = 25           # grey levels from the background
+BACKGROUND_ALPHA = 0.05       # running-average weight of each new frame
+MIN_FILL = 0.3                # blob area / enclosing circle area (motion blur stretches the ball)
+MIN_MOVING = 0.1              # fraction of a blob's pixels that changed since the previous frame
+SEARCH_MARGIN = 80            # px around the predicted position
+HAND_RADIUS = 220             # px around the hint point
+LOST_SECONDS = 0.25           # unseen this long: the track is dropped
+
+OPEN_KERNEL = np.ones((3, 3), np.uint8)
+
+
+class BallTracker:
+    """Follows one moving ball through a stream of BGR frames."""
+
+    def __init__(self, hsv_range=None):
+        self.hsv_range = hsv_range  # ((h, s, v) low, (h, s, v) high) or None
+        self.background = None      # float32 grey running average
+        self.prev_gray = None
+        self.spare = None           # grey buffer of the frame before last, reused for the next frame
+        self.last = None            # (timestamp, x, y, radius) of the last sighting
+        self.velocity = None        # (vx, vy) px/s
+        self.window = None          # last search window, for drawing
+
+    def reset(self):
+        self.last = None
+        self.velocity = None
+
+    def update(self, image, timestamp, near=None):
+        """Ball (x, y, radius) in pixels in this frame, or None. near=(x, y) focuses the search when not tracking."""
+        if self.spare is None or self.spare.shape != image.shape[:2]:
+            self.spare = np.empty(image.shape[:2], np.uint8)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self.spare)
+        # prev is only read during this call; its buffer takes the next frame
+        prev, self.prev_gray, self.spare = self.prev_gray, gray, self.prev_gray
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            return None
+
+        h, w = gray.shape
+        scale = w / REFERENCE_WIDTH
+        target = self._target(timestamp, near)
+        if target is None:
+            x0, y0, x1, y1 = 0, 0, w, h
+        else:
+            radius = self._search_radius(timestamp, near) * scale
+            x0, y0 = max(0, int(target[0] - radius)), max(0, int(target[1] - radius))
+            x1, y1 = min(w, int(target[0] + radius)), min(h, int(target[1] + radius))
+            if x1 <= x0 or y1 <= y0:
+                self._missed(timestamp)
+                return None
+        self.window = (x0, y0, x1, y1)
+
+        background = cv2.convertScaleAbs(self.background[y0:y1, x0:x1])
+        _, mask = cv2.threshold(cv2.absdiff(gray[y0:y1, x0:x1], background), DIFF_THRESHOLD, 255, cv2.THRESH_BINARY)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, OPEN_KERNEL)
+        _, moving = cv2.threshold(cv2.absdiff(gray[y0:y1, x0:x1], prev[y0:y1, x0:x1]), DIFF_THRESHOLD, 255,
+                                  cv2.THRESH_BINARY)
+        cv2.accumulateWeighted(gray, self.background, BACKGROUND_ALPHA)
+        if self.hsv_range is not None:
+            hsv = cv2.cvtColor(image[y0:y1, x0:x1], cv2.COLOR_BGR2HSV)
+            mask = cv2.bitwise_and(mask, cv2.inRange(hsv, *self.hsv_range))
+
+        ball = self._pick(mask, cv2.bitwise_and(mask, moving), (x0, y0), target, scale)
+        if ball is None:
+            self._missed(timestamp)
+            return None
+        if self.last is not None and timestamp > self.last[0]:
+            dt = timestamp - self.last[0]
+            self.velocity = ((ball[0] - self.last[1]) / dt, (ball[1] - self.last[2]) / dt)
+        self.last = (timestamp,) + ball
+        return ball
+
+    def speed(self):
+        """Ball speed in px/s, or 0 without a velocity estimate."""
+        return math.hypot(*self.velocity) if self.velocity is not None else 0.0
+
+    def _target(self, timestamp, near):
+        if self.last is None:
+            return near
+        t, x, y, _ = self.last
+        if self.velocity is None:
+            return x, y
+        dt = timestamp - t
+        return x + self.velocity[0] * dt, y + self.velocity[1] * dt
+
+    def _search_radius(self, timestamp, near):
+        if self.last is None:
+            return HAND_RADIUS
+        # the prediction gets less certain the longer the ball has been unseen
+        return SEARCH_MARGIN + 0.5 * self.speed() * (timestamp - self.last[0])
+
+    def _missed(self, timestamp):
+        if self.last is not None and timestamp - self.last[0] > LOST_SECONDS:
+            self.reset()
+
+    def _pick(self, mask, moving, origin, target, scale):
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        r_min, r_max = BALL_RADIUS_RANGE[0] * scale, BALL_RADIUS_RANGE[1] * scale
+        best, best_key = None, None
+        for contour in contours:
+            (cx, cy), radius = cv2.minEnclosingCircle(contour)
+            if not r_min <= radius <= r_max:
+                continue
+            area = cv2.contourArea(contour)
+            if area < MIN_FILL * math.pi * radius * radius:
+                continue
+            bx, by, bw, bh = cv2.boundingRect(contour)
+            if cv2.countNonZero(moving[by:by + bh, bx:bx + bw]) < MIN_MOVING * area:
+                continue
+            x, y = cx + origin[0], cy + origin[1]
+            # nearest to where the ball should be; the biggest blob when there is no expectation
+            key = math.hypot(x - target[0], y - target[1]) if target is not None else -area
+            if best_key is None or key < best_key:
+                best, best_key = (x, y, radius), key
+        return best
+
+
+def parse_hsv_range(text):
+    """'H0,S0,V0,H1,S1,V1' -> ((h0, s0, v0), (h1, s1, v1)) for cv2.inRange."""
+    values = [int(v) for v in text.split(",")]
+    if len(values) != 6:
+        raise ValueError(f"ball colour {text!r} must be H0,S0,V0,H1,S1,V1")
+    return np.array(values[:3], np.uint8), np.array(values[3:], np.uint8)
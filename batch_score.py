@@ -0,0 +1,161 @@
+"""
+batch_score.py
+Headless offline scoring of recorded trial videos.
+
+Runs the same Detector logic as the live trackers over every frame of each video
+on a multiprocessing pool (a fresh MediaPipe Pose per video, so no tracking state
+carries over between clips) and writes all detected events (reps, jumps,
+throws, reach records) to one CSV.
+
+Usage:
+    python batch_score.py sit_ups clips/            # every video in a folder
+    python batch_score.py vertical_jump a.mp4 b.mp4 -o jumps.csv -j 8 --arm-at 1.0
+    python batch_score.py broad_jump clips/ --set takeoff_x=300 --set takeoff_y=650
+
+The jump tests only score once the standing reach / take-off line is set,
+which live is the 's' key. Give it with --set NAME=VALUE (as for landmarks.py),
+or use --arm-at SECONDS to press 's' on the first frame at or after SECONDS
+with a pose, while the athlete stands still at the start of the clip. The
+broad jump clears its take-off line after each jump, so it scores one jump
+per clip.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import cv2
+import mediapipe as mp
+
+from calibration import Calibration
+from detectors import DETECTORS, create_detector, detector_class
+from pipeline import Frame, media_timestamp
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+OUTPUT_CSV = "batch_results.csv"
+
+mp_pose = mp.solutions.pose
+
+_calibration = None
+
+
+def _init_worker(test, calibration_file, pixels_per_cm):
+    global _calibration
+    # One process per core already; keep OpenCV from oversubscribing with its own threads
+    cv2.setNumThreads(1)
+    if calibration_file is not None:
+        _calibration = Calibration.load(calibration_file)
+    if pixels_per_cm is not None:
+        _calibration = _calibration or Calibration()
+        _calibration.set_scale(detector_class(test).calibration_plane, pixels_per_cm)
+
+
+def score_video(task):
+    """Run one video through a fresh detector. Returns (path, frames, seconds, events)."""
+    path, test, setup, arm_at = task
+    detector = create_detector(test)
+    if _calibration is not None:
+        detector.set_calibration(_calibration)
+    for name, value in setup.items():
+        setattr(detector, name, value)
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        print(f"ERROR: Could not open {path}")
+        return path, 0, 0.0, []
+    pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+    events = []
+    index = 0
+    start = time.perf_counter()
+    while True:
+        ret, image = cap.read()
+        if not ret:
+            break
+        frame = Frame(index, media_timestamp(cap), image)
+        lm = None
+        if detector.needs_pose():
+            results = pose.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+            lm = results.pose_landmarks.landmark if results.pose_landmarks else None
+        for post_path, payload in detector.process(lm, frame):
+            if post_path not in detector.state_paths:
+                events.append((index, frame.timestamp, post_path, payload))
+        if arm_at is not None and lm is not None and frame.timestamp >= arm_at:
+            detector.handle_key(ord('s'))
+            arm_at = None
+        index += 1
+    cap.release()
+    pose.close()
+    return path, index, time.perf_counter() - start, events
+
+
+def collect_videos(inputs):
+    videos = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    videos.append(os.path.join(item, name))
+        else:
+            videos.append(item)
+    return videos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score recorded videos offline.")
+    parser.add_argument("test", choices=sorted(DETECTORS))
+    parser.add_argument("inputs", nargs="+", help="video files or folders of videos")
+    parser.add_argument("-o", "--output", default=OUTPUT_CSV)
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--calibration", metavar="PATH", help="calibration file of the camera that filmed the videos")
+    parser.add_argument("--pixels-per-cm", type=float, default=None,
+                        help="plain pixel scale instead of a calibration file (sit_and_reach needs one of "
+                             "the two to report cm)")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="detector setup normally done with keys/clicks, e.g. standing_reach_y=412, "
+                             "takeoff_x=300")
+    parser.add_argument("--arm-at", type=float, metavar="SECONDS",
+                        help="press 's' (standing reach / take-off line) at this point of every video")
+    args = parser.parse_args(argv)
+    setup = {}
+    for item in args.set:
+        name, _, value = item.partition("=")
+        try:
+            setup[name] = float(value)
+        except ValueError:
+            parser.error(f"--set {item!r} must be NAME=NUMBER")
+
+    videos = collect_videos(args.inputs)
+    if not videos:
+        print("No videos found.")
+        return 1
+
+    start = time.perf_counter()
+    total_frames = 0
+    scored = {}
+    with Pool(args.jobs, initializer=_init_worker, initargs=(args.test, args.calibration, args.pixels_per_cm)) as pool:
+        tasks = [(path, args.test, setup, args.arm_at) for path in videos]
+        for path, frames, seconds, events in pool.imap_unordered(score_video, tasks):
+            scored[path] = events
+            total_frames += frames
+            rate = frames / seconds if seconds > 0 else 0.0
+            print(f"{path}: {len(events)} events, {frames} frames at {rate:.1f} FPS")
+
+    with open(args.output, "w", newline="") as csvfile:
+        csvw = csv.writer(csvfile)
+        csvw.writerow(["video", "test", "frame", "time_s", "event", "data"])
+        for path in videos:
+            for index, t, post_path, payload in scored.get(path, []):
+                csvw.writerow([path, args.test, index, f"{t:.3f}", post_path.lstrip("/"),
+                               json.dumps(payload) if payload is not None else ""])
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {len(videos)} videos ({total_frames} frames) in {elapsed:.1f} s "
+          f"-> {total_frames / elapsed if elapsed > 0 else 0.0:.1f} FPS overall. Results in {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
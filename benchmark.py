@@ -0,0 +1,249 @@
+"""
+benchmark.py
+Per-stage latency benchmark for the tracker loops.
+
+Runs each test's loop serially over a recorded video (or synthetic frames) with
+no camera, timing every stage of a frame separately: cap.read, cvtColor,
+pose.process, detector logic, result posting, draw_landmarks and the putText
+overlay (plus imshow / waitKey(5) with --display). Like the trackers, the loop
+reads into and converts into reused buffers and draws on the frame in place. Reports p50/p95/p99
+per stage and sustained FPS, and writes everything as JSON so runs can be diffed.
+
+As in the live pipeline, pose only runs on frames where the detector's
+needs_pose() asks for it. The jump detectors are armed ('s', standing reach /
+take-off line) on the first frame with a pose, so their detect stage does its
+real work on a recorded video. Synthetic frames have no athlete in them.
+
+    python benchmark.py --video trial.mp4 --frames 600 -o bench.json
+    python benchmark.py --synthetic --tests sit_ups vertical_jump
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+import cv2
+import mediapipe as mp
+import numpy as np
+import requests
+
+from detectors import DETECTORS, create_detector
+from framering import RgbConverter
+from pipeline import (FRAME_WIDTH, FRAME_HEIGHT, Frame, media_timestamp, mp_drawing, mp_pose, pose_estimator,
+                      send_posts)
+from telemetry import TelemetryClient
+
+OUTPUT_JSON = "bench_results.json"
+PERCENTILES = (50, 95, 99)
+
+
+class StageTimer:
+    """Collects per-stage durations for one benchmark run."""
+
+    def __init__(self):
+        self.samples = {}
+        self._last = None
+
+    def start(self):
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.samples.setdefault(stage, []).append(now - self._last)
+        self._last = now
+
+    def summary(self):
+        stages = {}
+        for stage, values in self.samples.items():
+            ms = np.asarray(values) * 1000.0
+            stats = {f"p{p}_ms": float(np.percentile(ms, p)) for p in PERCENTILES}
+            stats["mean_ms"] = float(ms.mean())
+            stats["count"] = len(values)
+            stages[stage] = stats
+        return stages
+
+
+class SyntheticCapture:
+    """cv2.VideoCapture stand-in producing noise frames with a moving block."""
+
+    def __init__(self, frames, size=(FRAME_WIDTH, FRAME_HEIGHT)):
+        self.remaining = frames
+        w, h = size
+        rng = np.random.default_rng(0)
+        self.background = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+        self.t = 0
+
+    def read(self, image=None):
+        if self.remaining <= 0:
+            return False, None
+        self.remaining -= 1
+        if image is None:
+            frame = self.background.copy()
+        else:
+            frame = image
+            frame[:] = self.background
+        h, w = frame.shape[:2]
+        x = int((self.t * 7) % (w - 200))
+        cv2.rectangle(frame, (x, h // 3), (x + 200, h // 3 + 300), (40, 200, 40), -1)
+        self.t += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+
+def open_source(args):
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        if not cap.isOpened():
+            raise SystemExit(f"ERROR: Could not open {args.video}")
+        return cap
+    return SyntheticCapture(args.frames)
+
+
+def run_test(test, args, sender):
+    detector = create_detector(test)
+    cap = open_source(args)
+    timer = StageTimer()
+    frames = 0
+    to_rgb = RgbConverter()
+    image = None
+    armed = False
+    start = time.perf_counter()
+    with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+        estimate = pose_estimator(pose, roi=True) if args.roi else None
+        while frames < args.frames:
+            timer.start()
+            ret, image = cap.read(image)
+            if not ret:
+                break
+            # time-based detectors see the recording's clock, as the trackers do for video files
+            timestamp = media_timestamp(cap) if args.video else time.monotonic()
+            timer.mark("read")
+            frame = Frame(frames, timestamp, image)
+
+            results = None
+            if detector.needs_pose():
+                if estimate is not None:
+                    results = estimate(image)
+                    timer.mark("pose")
+                else:
+                    frame_rgb = to_rgb(image)
+                    timer.mark("cvtColor")
+                    results = pose.process(frame_rgb)
+                    timer.mark("pose")
+
+            pose_landmarks = results.pose_landmarks if results is not None else None
+            lm = pose_landmarks.landmark if pose_landmarks else None
+            posts = detector.process(lm, frame)
+            if not armed and lm is not None:
+                detector.handle_key(ord('s'))
+                armed = True
+            timer.mark("detect")
+            if sender is not None:
+                sender(detector, posts)
+                timer.mark("post")
+
+            vis_frame = image
+            if detector.draw_landmarks and pose_landmarks:
+                mp_drawing.draw_landmarks(vis_frame, pose_landmarks, mp_pose.POSE_CONNECTIONS)
+            timer.mark("draw_landmarks")
+            detector.draw(vis_frame)
+            timer.mark("overlay")
+
+            if args.display:
+                cv2.imshow(test, vis_frame)
+                timer.mark("imshow")
+                cv2.waitKey(5)
+                timer.mark("waitKey")
+            frames += 1
+    elapsed = time.perf_counter() - start
+    cap.release()
+    if args.display:
+        cv2.destroyWindow(test)
+    return {
+        "frames": frames,
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "stages": timer.summary(),
+    }
+
+
+def make_sender(args, test):
+    """
+    Return (send, close): send(detector, posts) posts a detector's results and close()
+    shuts the connection down; (None, None) when posting is not benchmarked.
+    """
+    if not args.server:
+        return None, None
+    if args.blocking_post:
+        session = requests.Session()
+
+        def blocking(detector, posts):
+            for path, payload in posts:
+                try:
+                    session.post(f"{args.server}/{test}/{args.station}{path}", json=payload, timeout=2.0)
+                except Exception as e:
+                    print("Could not update counter:", e)
+        return blocking, session.close
+    client = TelemetryClient(f"{args.server}/{test}/{args.station}")
+    return (lambda detector, posts: send_posts(client, detector, posts)), client.close
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark per-stage latency of the tracker loops.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--video", help="recorded video to drive the loops")
+    source.add_argument("--synthetic", action="store_true", help="use generated frames (default)")
+    parser.add_argument("--tests", nargs="+", choices=sorted(DETECTORS), default=list(DETECTORS))
+    parser.add_argument("--frames", type=int, default=300, help="frames per test")
+    parser.add_argument("--roi", action="store_true", help="benchmark ROI-cropped inference")
+    parser.add_argument("--display", action="store_true", help="also time imshow and waitKey(5)")
+    parser.add_argument("--server", help="results server URL to include result posting, e.g. http://127.0.0.1:5000")
+    parser.add_argument("--station", default="bench")
+    parser.add_argument("--blocking-post", action="store_true",
+                        help="time a synchronous requests.post per result instead of the telemetry queue")
+    parser.add_argument("-o", "--output", default=OUTPUT_JSON)
+    args = parser.parse_args(argv)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "source": args.video or "synthetic",
+            "frames": args.frames,
+            "roi": args.roi,
+            "display": args.display,
+            "post": ("blocking" if args.blocking_post else "telemetry") if args.server else None,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "opencv": cv2.__version__,
+            "mediapipe": getattr(mp, "__version__", "unknown"),
+        },
+        "results": {},
+    }
+    for test in args.tests:
+        sender, close = make_sender(args, test)
+        try:
+            result = run_test(test, args, sender)
+        finally:
+            if close is not None:
+                close()
+        report["results"][test] = result
+        print(f"{test}: {result['fps']:.1f} FPS over {result['frames']} frames")
+        for stage, stats in result["stages"].items():
+            print(f"  {stage:<15} p50 {stats['p50_ms']:7.2f} ms  p95 {stats['p95_ms']:7.2f} ms  "
+                  f"p99 {stats['p99_ms']:7.2f} ms")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+broadcast.py
+Server-Sent Events fan-out for the dashboard apps.
+
+publish() serializes the new state once into an SSE frame and hands the same
+bytes to every connected viewer. Each viewer has a small latest-wins queue, so
+a slow screen only ever skips to the newest state instead of backing up.
+"""
+
+import json
+import queue
+import threading
+
+from flask import Response
+
+KEEPALIVE_SECONDS = 15.0
+
+
+class Broadcaster:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = set()
+        self._last = None
+
+    def publish(self, state):
+        message = ("data: " + json.dumps(state) + "\n\n").encode("utf-8")
+        with self._lock:
+            self._last = message
+            clients = list(self._clients)
+        for q in clients:
+            _put_latest(q, message)
+
+    def viewer_count(self):
+        with self._lock:
+            return len(self._clients)
+
+    def stream(self):
+        """Flask response that streams every published state to one viewer."""
+        q = queue.Queue(maxsize=1)
+        with self._lock:
+            self._clients.add(q)
+            if self._last is not None:
+                q.put_nowait(self._last)
+
+        def generate():
+            try:
+                while True:
+                    try:
+                        yield q.get(timeout=KEEPALIVE_SECONDS)
+                    except queue.Empty:
+                        yield b": keepalive\n\n"
+            finally:
+                with self._lock:
+                    self._clients.discard(q)
+
+        return Response(generate(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _put_latest(q, item):
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
@@ -0,0 +1,206 @@
+"""
+calibration.py
+Per-camera calibration: lens undistortion and pixel -> real-world cm lookup tables.
+
+A camera's calibration is a JSON file (by default calibration/<station>.json):
+
+    {
+      "image_size": [1280, 720],
+      "camera_matrix": [[fx, 0, cx], [0, fy, cy], [0, 0, 1]],   optional
+      "dist_coeffs": [k1, k2, p1, p2, k3],                        optional
+      "planes": {
+        "floor": {"homography": [[...], [...], [...]]},          undistorted px -> floor cm
+        "wall": {"pixels_per_cm": 44.0}                            or a plain scale
+      }
+    }
+
+Each plane is turned once into a table holding the plane's (X, Y) in cm for
+every pixel of the raw (distorted) frame, so converting a landmark is a
+bilinear lookup rather than undistort + homography per point. Tables are
+cached next to the JSON file (<name>-<plane>.lut.npz) and rebuilt only when the
+calibration changes.
+
+Plane axes follow the image: X grows to the right and Y grows downwards. A
+plane the file does not describe falls back to DEFAULT_PIXELS_PER_CM.
+
+A camera running at a different resolution than it was calibrated at (e.g.
+after auto-tuning picked a smaller capture size) reuses the calibration as long
+as the aspect ratio matches: pixel coordinates are scaled to the calibrated
+size before the lookup.
+"""
+
+import hashlib
+import json
+import math
+import os
+
+import cv2
+import numpy as np
+
+CALIBRATION_DIR = "calibration"
+DEFAULT_PIXELS_PER_CM = 44.0
+
+
+def calibration_path(camera):
+    return os.path.join(CALIBRATION_DIR, f"{camera}.json")
+
+
+class PlaneMap:
+    """Pixel -> plane cm conversion for one plane of one camera."""
+
+    def __init__(self, table=None, pixels_per_cm=DEFAULT_PIXELS_PER_CM, offset=(0, 0), scale=1.0):
+        self.table = table  # (h, w, 2) float32 of plane cm, or None for a uniform scale
+        self.pixels_per_cm = pixels_per_cm
+        self.offset = offset
+        self.scale = scale  # calibrated pixels per frame pixel
+
+    def shifted(self, dx, dy):
+        """The same plane for a crop whose top-left corner is at (dx, dy) in the full frame."""
+        return PlaneMap(self.table, self.pixels_per_cm, (self.offset[0] + dx, self.offset[1] + dy), self.scale)
+
+    def to_cm(self, x, y):
+        """Plane (X, Y) in cm for pixel coordinates; scalars or arrays (NaN stays NaN)."""
+        scalar = np.ndim(x) == 0 and np.ndim(y) == 0
+        if scalar and self.table is not None and math.isfinite(x) and math.isfinite(y):
+            return self._lookup_point((x + self.offset[0]) * self.scale, (y + self.offset[1]) * self.scale)
+        x = (np.asarray(x, dtype=np.float64) + self.offset[0]) * self.scale
+        y = (np.asarray(y, dtype=np.float64) + self.offset[1]) * self.scale
+        if self.table is None:
+            cx, cy = x / self.pixels_per_cm, y / self.pixels_per_cm
+        else:
+            cx, cy = self._lookup(x, y)
+        if scalar:
+            return float(cx), float(cy)
+        return cx, cy
+
+    def _lookup_point(self, x, y):
+        # per-landmark path used by the live detectors; avoids array set-up costs
+        h, w = self.table.shape[:2]
+        x = min(max(float(x), 0.0), w - 1.0)
+        y = min(max(float(y), 0.0), h - 1.0)
+        x0 = min(int(x), w - 2)
+        y0 = min(int(y), h - 2)
+        fx, fy = x - x0, y - y0
+        (a, b), (c, d) = self.table[y0:y0 + 2, x0:x0 + 2].tolist()
+        cx = (a[0] * (1 - fx) + b[0] * fx) * (1 - fy) + (c[0] * (1 - fx) + d[0] * fx) * fy
+        cy = (a[1] * (1 - fx) + b[1] * fx) * (1 - fy) + (c[1] * (1 - fx) + d[1] * fx) * fy
+        return cx, cy
+
+    def _lookup(self, x, y):
+        h, w = self.table.shape[:2]
+        finite = np.isfinite(x) & np.isfinite(y)
+        x = np.clip(np.where(finite, x, 0.0), 0.0, w - 1.0)
+        y = np.clip(np.where(finite, y, 0.0), 0.0, h - 1.0)
+        x0 = np.minimum(x.astype(np.intp), w - 2)
+        y0 = np.minimum(y.astype(np.intp), h - 2)
+        fx = (x - x0)[..., None]
+        fy = (y - y0)[..., None]
+        t = self.table
+        value = ((t[y0, x0] * (1 - fx) + t[y0, x0 + 1] * fx) * (1 - fy)
+                 + (t[y0 + 1, x0] * (1 - fx) + t[y0 + 1, x0 + 1] * fx) * fy)
+        value = np.where(finite[..., None], value, np.nan)
+        return value[..., 0], value[..., 1]
+
+
+def build_table(image_size, camera_matrix=None, dist_coeffs=None, homography=None, pixels_per_cm=None):
+    """(h, w, 2) float32 plane coordinates in cm for every raw pixel."""
+    w, h = image_size
+    xs, ys = np.meshgrid(np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32))
+    points = np.stack([xs, ys], axis=-1).reshape(-1, 1, 2)
+    if camera_matrix is not None:
+        K = np.asarray(camera_matrix, dtype=np.float64)
+        D = np.asarray(dist_coeffs if dist_coeffs is not None else [], dtype=np.float64)
+        # P=K keeps undistorted points in pixel units, which is what the homography expects
+        points = cv2.undistortPoints(points, K, D, P=K)
+    if homography is not None:
+        points = cv2.perspectiveTransform(points.astype(np.float64), np.asarray(homography, dtype=np.float64))
+    else:
+        points = points / pixels_per_cm
+    return points.reshape(h, w, 2).astype(np.float32)
+
+
+class Calibration:
+    def __init__(self, data=None, path=None):
+        self.data = data or {}
+        self.data.setdefault("planes", {})
+        self.path = path
+        self.frame_size = None
+        self.scale = 1.0
+        self._planes = {}
+
+    @classmethod
+    def load(cls, path):
+        """The calibration stored at path, or an empty one that will be saved there."""
+        if not os.path.exists(path):
+            return cls(path=path)
+        with open(path) as f:
+            return cls(json.load(f), path)
+
+    def save(self, path=None):
+        path = path or self.path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp, path)
+        self.path = path
+
+    def has_plane(self, name):
+        return name in self.data["planes"]
+
+    def set_scale(self, name, pixels_per_cm):
+        """Describe a plane by a plain pixels-per-cm scale (e.g. from a two-point click) in frame pixels."""
+        if self.frame_size is not None:
+            self.data.setdefault("image_size", list(self.frame_size))
+        self.data["planes"][name] = {"pixels_per_cm": float(pixels_per_cm) * self.scale}
+        self._planes.pop(name, None)
+
+    def check_size(self, image_size):
+        """Note the camera's frame size; a resized frame with the calibrated aspect ratio is scaled to fit."""
+        self.frame_size = tuple(image_size)
+        self.scale = 1.0
+        self._planes.clear()
+        size = self.data.get("image_size")
+        if size is None or tuple(size) == self.frame_size:
+            return
+        if abs(size[0] * image_size[1] - size[1] * image_size[0]) <= 0.01 * size[0] * image_size[1]:
+            self.scale = size[0] / image_size[0]
+            print(f"Calibration is for {size[0]}x{size[1]} frames; scaling "
+                  f"{image_size[0]}x{image_size[1]} frames to match.")
+        else:
+            print(f"WARNING: calibration is for {size[0]}x{size[1]} frames but the camera gives "
+                  f"{image_size[0]}x{image_size[1]}; recalibrate or set the capture size.")
+
+    def plane(self, name):
+        """PlaneMap for a named plane, building or loading its lookup table once."""
+        plane = self._planes.get(name)
+        if plane is None:
+            plane = self._planes[name] = self._build_plane(name)
+        return plane
+
+    def _build_plane(self, name):
+        spec = self.data["planes"].get(name, {})
+        pixels_per_cm = spec.get("pixels_per_cm", DEFAULT_PIXELS_PER_CM)
+        camera_matrix = self.data.get("camera_matrix")
+        if camera_matrix is None and "homography" not in spec:
+            return PlaneMap(pixels_per_cm=pixels_per_cm, scale=self.scale)
+        if "image_size" not in self.data:
+            raise ValueError("calibration with camera_matrix or homography needs image_size")
+
+        source = dict(image_size=self.data["image_size"], camera_matrix=camera_matrix,
+                      dist_coeffs=self.data.get("dist_coeffs"), homography=spec.get("homography"),
+                      pixels_per_cm=pixels_per_cm)
+        key = hashlib.sha1(json.dumps(source, sort_keys=True).encode("utf-8")).hexdigest()
+        cache = None
+        if self.path is not None:
+            cache = f"{os.path.splitext(self.path)[0]}-{name}.lut.npz"
+            if os.path.exists(cache):
+                cached = np.load(cache)
+                if str(cached["key"]) == key:
+                    return PlaneMap(cached["table"], pixels_per_cm, scale=self.scale)
+        table = build_table(**source)
+        if cache is not None:
+            np.savez(cache, key=key, table=table)
+        return PlaneMap(table, pixels_per_cm, scale=self.scale)
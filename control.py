@@ -0,0 +1,100 @@
+"""
+control.py
+Local HTTP control API replacing the keyboard on headless stations.
+
+    POST /set          same as pressing 's' (standing reach / take-off line)
+    POST /reset        same as pressing 'r'
+    POST /calibrate    sit-and-reach calibration, JSON {"pixels_per_cm": 44.0}
+                       or {"points": [[x1, y1], [x2, y2]], "length_cm": 30.0};
+                       saved to the camera's calibration file
+    POST /focus        several tests on one camera (multitest.py): JSON {"test": name}
+                       picks the test keys, commands and the overlay apply to
+    POST /switch       station daemon (station.py): JSON {"test": name} plus optional
+                       "thresholds", "params", "calibration" and "station"
+    POST /quit         same as pressing 'q'
+    GET  /             list the available commands
+
+Commands are handed to a callback (normally FramePipeline.submit) and
+acknowledged immediately with 202; they are applied between frames. A body
+that is not a JSON object, or a /calibrate body without a usable scale, is
+answered with 400 and never reaches the tracker.
+"""
+
+import json
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTROL_PORT = 5100
+COMMANDS = ("set", "reset", "calibrate", "focus", "switch", "quit")
+
+
+def start_control_server(dispatch, port=CONTROL_PORT, host="127.0.0.1"):
+    """Serve the control API from a daemon thread; dispatch(command, data) is called per request."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/":
+                self._reply(404, {"error": "not found"})
+                return
+            self._reply(200, {"commands": list(COMMANDS)})
+
+        def do_POST(self):
+            command = self.path.split("?")[0].strip("/")
+            if command not in COMMANDS:
+                self._reply(404, {"error": f"unknown command {command!r}"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                data = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._reply(400, {"error": "body must be JSON"})
+                return
+            error = check_body(command, data)
+            if error is not None:
+                self._reply(400, {"error": error})
+                return
+            dispatch(command, data)
+            self._reply(202, {"accepted": command})
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Control API listening on http://{host}:{port}/")
+    return server
+
+
+def is_number(value):
+    return not isinstance(value, bool) and isinstance(value, (int, float)) and math.isfinite(value)
+
+
+def check_body(command, data):
+    """Why the body of a command is unusable, or None when it is fine."""
+    if not isinstance(data, dict):
+        return "body must be a JSON object"
+    if command != "calibrate":
+        return None
+    if "pixels_per_cm" in data:
+        if not is_number(data["pixels_per_cm"]) or data["pixels_per_cm"] <= 0:
+            return "pixels_per_cm must be a positive number"
+        return None
+    points, length_cm = data.get("points"), data.get("length_cm")
+    if (not isinstance(points, list) or len(points) != 2
+            or not all(isinstance(p, list) and len(p) == 2 and all(is_number(v) for v in p) for p in points)):
+        return "calibrate needs pixels_per_cm, or points [[x1, y1], [x2, y2]] and length_cm"
+    if not is_number(length_cm) or length_cm <= 0:
+        return "length_cm must be a positive number"
+    if points[0] == points[1]:
+        return "the two points must differ"
+    return None
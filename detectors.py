@@ -0,0 +1,38 @@
+"""
+detectors.py
+Registry of the test types and the Detector class implementing each one.
+
+Each tracker module also provides batch_events(landmarks, index, timestamps,
+frame_size, ...), a vectorized version of its detector for scoring whole
+recordings; timestamps are the frames' capture times in seconds.
+
+Tracker modules are imported lazily so tools that only need one test do not pay
+for importing all of them.
+"""
+
+import importlib
+
+# test name -> (module, Detector class)
+DETECTORS = {
+    "sit_ups": ("sit_ups", "SitUpCounter"),
+    "vertical_jump": ("standing_vertical_jump", "VerticalJumpDetector"),
+    "broad_jump": ("standing_broad_jump", "BroadJumpDetector"),
+    "medicine_ball": ("medical_ball", "MedicineBallDetector"),
+    "sit_and_reach": ("sit_and_reach", "SitAndReachDetector"),
+}
+
+
+def detector_class(test):
+    if test not in DETECTORS:
+        raise ValueError(f"Unknown test type {test!r}; expected one of {', '.join(DETECTORS)}")
+    module_name, class_name = DETECTORS[test]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_detector(test, **params):
+    """A new Detector for test; params are its constructor arguments (e.g. pose_every)."""
+    return detector_class(test)(**params)
+
+
+def batch_function(test):
+    return getattr(importlib.import_module(DETECTORS[test][0]), "batch_events")
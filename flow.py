@@ -0,0 +1,73 @@
+"""
+flow.py
+Sparse optical flow for following a few landmarks between pose frames.
+
+PointFlow is seeded with pixel positions from a frame that ran pose and moves
+them to every following frame with pyramidal Lucas-Kanade flow. Flow is only
+computed on a PATCH_RADIUS patch around each point, not the whole frame, so a
+handful of points costs well under a millisecond. A point is dropped when the
+flow fails or does not map back to where it came from (forward-backward error
+above MAX_FB_ERROR); it stays lost until the next pose frame seeds it again.
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+PATCH_RADIUS = 64       # px around each point
+WIN_SIZE = (21, 21)
+PYRAMID_LEVELS = 2
+MAX_FB_ERROR = 1.5      # px
+CRITERIA = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03)
+
+
+class PointFlow:
+    """Follows a fixed list of points from frame to frame; lost points are None."""
+
+    def __init__(self):
+        self.gray = None
+        self.spare = None       # the grey buffer of the frame before last, reused for the next frame
+        self.points = []
+
+    def seed(self, image, points):
+        """Restart from known (x, y) pixel positions (None for points not seen) in this frame."""
+        self.gray, self.spare = self._gray(image), self.gray
+        self.points = list(points)
+
+    def tracking(self, i=0):
+        return i < len(self.points) and self.points[i] is not None
+
+    def track(self, image):
+        """The points moved to this frame: [(x, y) or None]."""
+        gray = self._gray(image)
+        if self.gray is None or self.gray.shape != gray.shape:
+            self.points = [None] * len(self.points)
+        else:
+            self.points = [self._follow(self.gray, gray, p) if p is not None else None for p in self.points]
+        self.gray, self.spare = gray, self.gray
+        return list(self.points)
+
+    def _gray(self, image):
+        if self.spare is None or self.spare.shape != image.shape[:2]:
+            self.spare = np.empty(image.shape[:2], np.uint8)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self.spare)
+
+    def _follow(self, prev, gray, point):
+        h, w = gray.shape
+        x0, y0 = max(0, int(point[0]) - PATCH_RADIUS), max(0, int(point[1]) - PATCH_RADIUS)
+        x1, y1 = min(w, int(point[0]) + PATCH_RADIUS + 1), min(h, int(point[1]) + PATCH_RADIUS + 1)
+        if x1 - x0 < WIN_SIZE[0] or y1 - y0 < WIN_SIZE[1]:
+            return None
+        before, after = prev[y0:y1, x0:x1], gray[y0:y1, x0:x1]
+        start = np.float32([[[point[0] - x0, point[1] - y0]]])
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(before, after, start, None, winSize=WIN_SIZE,
+                                                    maxLevel=PYRAMID_LEVELS, criteria=CRITERIA)
+        if not status[0, 0]:
+            return None
+        back, status, _ = cv2.calcOpticalFlowPyrLK(after, before, moved, None, winSize=WIN_SIZE,
+                                                   maxLevel=PYRAMID_LEVELS, criteria=CRITERIA)
+        if not status[0, 0] or math.hypot(*(back - start)[0, 0]) > MAX_FB_ERROR:
+            return None
+        x, y = moved[0, 0]
+        return float(x) + x0, float(y) + y0
@@ -0,0 +1,210 @@
+"""
+framering.py
+Zero-copy frame transport between a capture process and the tracker process.
+
+A FrameRing is a fixed number of preallocated frame slots in shared memory,
+plus a small shared header holding every slot's sequence number, timestamp and
+reader pin count. The writer claims the oldest slot no reader holds, has the
+camera decode straight into it and publishes it with the next sequence number;
+a reader pins a published slot, works on the pixels in place and releases it.
+Frames never go through a pipe or pickle, and no per-frame image is allocated
+on either side. RgbConverter does the same for the RGB copy pose inference
+needs.
+
+Readers ask for the newest frame (latest wins, like the threaded pipeline) or
+for the oldest one newer than the last they took (every frame, while the ring
+still holds it). When every slot is pinned the writer drops the camera frame.
+
+CaptureProcess runs the camera in its own process (spawned: MediaPipe and
+OpenCV are not fork-safe) so that reading and decoding the camera use another
+core than pose inference. Timestamps are time.monotonic(), which is the same
+clock in every process, or the stream position for video files.
+"""
+
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+RING_SLOTS = 8
+EMPTY = -1
+
+
+class FrameRing:
+    """Shared-memory ring of (h, w, 3) uint8 frames; one writer, any number of readers."""
+
+    def __init__(self, shape, slots=RING_SLOTS, context=None, name=None, condition=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        # header: seq (int64), timestamp (float64), pins (int64) per slot; next seq and closed flag
+        header_bytes = 8 * (3 * slots + 2)
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_bytes + slots * frame_bytes)
+            self.condition = (context or multiprocessing).Condition()
+        else:
+            # spawned processes share the creator's resource tracker, which unlinks the segment once
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.condition = condition
+        buf = self.shm.buf
+        self.seq = np.ndarray((slots,), np.int64, buf, 0)
+        self.timestamps = np.ndarray((slots,), np.float64, buf, 8 * slots)
+        self.pins = np.ndarray((slots,), np.int64, buf, 16 * slots)
+        self.state = np.ndarray((2,), np.int64, buf, 24 * slots)  # next seq, closed
+        self.frames = np.ndarray((slots,) + self.shape, np.uint8, buf, header_bytes)
+        if self.owner:
+            self.seq[:] = EMPTY
+            self.pins[:] = 0
+            self.state[:] = 0
+
+    def __reduce__(self):
+        # other processes attach to the same memory by name (at process start)
+        return _attach, (self.shape, self.slots, self.shm.name, self.condition)
+
+    # writer side
+
+    def claim(self):
+        """A free slot to write the next frame into, or None when readers hold them all."""
+        with self.condition:
+            newest = int(np.argmax(self.seq))
+            best = None
+            for slot in range(self.slots):
+                if self.pins[slot] or (slot == newest and self.seq[slot] != EMPTY):
+                    continue
+                if best is None or self.seq[slot] < self.seq[best]:
+                    best = slot
+            if best is not None:
+                self.seq[best] = EMPTY
+            return best
+
+    def publish(self, slot, timestamp):
+        with self.condition:
+            self.timestamps[slot] = timestamp
+            self.seq[slot] = self.state[0]
+            self.state[0] += 1
+            self.condition.notify_all()
+
+    def close(self):
+        """No more frames: readers get None once they have taken the last one."""
+        with self.condition:
+            self.state[1] = 1
+            self.condition.notify_all()
+
+    # reader side
+
+    def acquire(self, after=EMPTY, every=False, timeout=None):
+        """
+        Pin a frame newer than sequence number after: (seq, timestamp, image view),
+        or None at the end of the stream or on timeout. every=True takes the oldest
+        such frame instead of the newest.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                newer = np.flatnonzero(self.seq > after)
+                if len(newer):
+                    pick = self.seq[newer].argmin() if every else self.seq[newer].argmax()
+                    slot = int(newer[pick])
+                    self.pins[slot] += 1
+                    return int(self.seq[slot]), float(self.timestamps[slot]), self.frames[slot]
+                if self.state[1]:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def closed(self):
+        return bool(self.state[1])
+
+    def release(self, seq):
+        """Unpin the frame with sequence number seq."""
+        with self.condition:
+            for slot in np.flatnonzero(self.seq == seq):
+                if self.pins[slot]:
+                    self.pins[slot] -= 1
+
+    def detach(self):
+        # views into the buffer must go before it can be closed
+        del self.seq, self.timestamps, self.pins, self.state, self.frames
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _attach(shape, slots, name, condition):
+    return FrameRing(shape, slots, name=name, condition=condition)
+
+
+class RgbConverter:
+    """BGR -> RGB into a buffer that is reused while the image size stays the same."""
+
+    def __init__(self):
+        self.buffer = None
+
+    def __call__(self, image):
+        if self.buffer is None or self.buffer.shape != image.shape:
+            self.buffer = np.empty(image.shape, np.uint8)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=self.buffer)
+
+
+class CaptureProcess:
+    """Reads a camera or video file in a separate process into a FrameRing."""
+
+    def __init__(self, source, frame_size, fps=None, media_time=False, slots=RING_SLOTS):
+        context = multiprocessing.get_context("spawn")
+        self.ring = FrameRing((frame_size[1], frame_size[0], 3), slots, context)
+        self.stop_event = context.Event()
+        self.captured = context.Value("q", 0, lock=False)
+        self.dropped = context.Value("q", 0, lock=False)
+        self.process = context.Process(target=_capture_main, name="capture", daemon=True,
+                                       args=(self.ring, source, frame_size, fps, media_time, self.stop_event,
+                                             self.captured, self.dropped))
+
+    def start(self):
+        self.process.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.ring.detach()
+
+
+def _capture_main(ring, source, frame_size, fps, media_time, stop_event, captured, dropped):
+    from pipeline import media_timestamp, open_capture
+
+    cv2.setNumThreads(1)
+    cap = open_capture(source, frame_size, fps)
+    try:
+        while cap is not None and not stop_event.is_set():
+            slot = ring.claim()
+            if slot is None:
+                # every slot is being worked on: skip this camera frame
+                if not cap.grab():
+                    break
+                dropped.value += 1
+                continue
+            target = ring.frames[slot]
+            ret, image = cap.read(target)
+            if not ret:
+                print("Camera read failed. Exiting.")
+                break
+            if image is not target:
+                if image.shape != target.shape:
+                    print(f"ERROR: camera gives {image.shape[1]}x{image.shape[0]} frames, "
+                          f"expected {target.shape[1]}x{target.shape[0]}.")
+                    break
+                target[:] = image
+            ring.publish(slot, media_timestamp(cap) if media_time else time.monotonic())
+            captured.value += 1
+    finally:
+        ring.close()
+        if cap is not None:
+            cap.release()
+        ring.detach()
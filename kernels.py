@@ -0,0 +1,137 @@
+"""
+kernels.py
+NumPy helpers for scoring whole landmark sequences at once.
+
+Landmark sequences are (N frames, 33, 4) arrays of (x, y, z, visibility) as
+produced by landmarks.LandmarkReplay; frames without a detected pose are NaN and
+fail every threshold comparison, exactly like the live detectors skipping them.
+
+angle_deg() is also what the per-frame angle() helpers call, so the batch and
+live paths evaluate bit-identical joint angles. The same goes for the
+sub-frame event helpers (crossing, lerp, extremum_point, fit_minimum,
+last_fall_below), which place release, landing, take-off and peak events
+between frames using capture timestamps.
+"""
+
+import numpy as np
+
+X, Y, Z, VISIBILITY = 0, 1, 2, 3
+NO_SAMPLE = (np.nan, np.nan, np.nan)  # missing (t, x, y) neighbour for extremum_point
+
+
+def angle_deg(bax, bay, bcx, bcy):
+    """Angle at b (degrees) between vectors b->a and b->c; works on scalars or arrays."""
+    cosine_angle = np.divide(bax * bcx + bay * bcy,
+                             np.sqrt(bax * bax + bay * bay) * np.sqrt(bcx * bcx + bcy * bcy))
+    return np.degrees(np.arccos(np.clip(cosine_angle, -1.0, 1.0)))
+
+
+def as_float64(landmarks):
+    return np.asarray(landmarks, dtype=np.float64)
+
+
+def detected(landmarks):
+    return ~np.isnan(landmarks[:, 0, X])
+
+
+def joint_angle(landmarks, a, b, c):
+    """Angle at landmark b for every frame of an (N, 33, 4) array."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return angle_deg(landmarks[:, a, X] - landmarks[:, b, X], landmarks[:, a, Y] - landmarks[:, b, Y],
+                         landmarks[:, c, X] - landmarks[:, b, X], landmarks[:, c, Y] - landmarks[:, b, Y])
+
+
+def alternations(first, second):
+    """
+    Fire points of a two-state machine that waits for `first`, then for `second`, then repeats.
+
+    first and second are mutually exclusive boolean arrays over frames. Returns two
+    index arrays: for each completed cycle, the frame where `first` was first seen
+    and the frame where `second` then fired.
+    """
+    idx = np.flatnonzero(first | second)
+    is_first = first[idx]
+    run_start = np.ones(len(idx), dtype=bool)
+    run_start[1:] = is_first[1:] != is_first[:-1]
+    runs = idx[run_start]
+    runs_first = is_first[run_start]
+    if len(runs) and not runs_first[0]:
+        # Machine starts waiting for `first`; a leading `second` run is ignored
+        runs = runs[1:]
+    cycles = len(runs) // 2
+    return runs[0:2 * cycles:2], runs[1:2 * cycles:2]
+
+
+def crossing(threshold, before, after):
+    """Fraction of the way from before to after at which a linearly moving value reaches threshold."""
+    return (threshold - before) / (after - before)
+
+
+def lerp(a, b, fraction):
+    return a + (b - a) * fraction
+
+
+def parabola_extremum(t0, y0, t1, y1, t2, y2):
+    """
+    Time and value of the vertex of the parabola through (t0, y0), (t1, y1), (t2, y2).
+
+    t0 < t1 < t2 need not be evenly spaced; the vertex is clamped to [t0, t2]. Where
+    the three points are collinear or a neighbour is NaN, (t1, y1) is returned as is.
+    Works on scalars or arrays.
+    """
+    u0, u2 = t0 - t1, t2 - t1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        d0 = (y0 - y1) / u0
+        d2 = (y2 - y1) / u2
+        q = (d2 - d0) / (u2 - u0)
+        p = d0 - q * u0
+        u = np.clip(-p / (2 * q), u0, u2)
+        y = y1 + p * u + q * u * u
+    flat = (q == 0) | np.isnan(u)
+    return np.where(flat, t1, t1 + u), np.where(flat, y1, y)
+
+
+def extremum_point(before, peak, after):
+    """
+    (t, x, y) of a track's turning point in y: the vertex of the parabola through the
+    extreme (t, x, y) sample and its neighbours in time, x interpolated at that time,
+    so the turning point can fall between frames. Works on scalars or arrays; NaN
+    neighbours (NO_SAMPLE) leave the sample as it is.
+    """
+    (t0, x0, y0), (t1, x1, y1), (t2, x2, y2) = before, peak, after
+    t, y = parabola_extremum(t0, y0, t1, y1, t2, y2)
+    u = t - t1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x = np.where(u < 0, lerp(x1, x0, u / (t0 - t1)), np.where(u > 0, lerp(x1, x2, u / (t2 - t1)), x1))
+    return t, x, y
+
+
+def fit_minimum(ts, xs, ys, window):
+    """
+    (t, x, y) of the lowest point of a densely sampled track: a least-squares parabola
+    through the samples within window seconds of the lowest y sample (and at least its
+    neighbours), x interpolated at the vertex time. Falls back to the lowest sample
+    when fewer than three samples are available or they do not curve upwards.
+    """
+    ts, xs, ys = (np.asarray(a, dtype=np.float64) for a in (ts, xs, ys))
+    i = int(np.argmin(ys))
+    near = np.abs(ts - ts[i]) <= window
+    near[max(i - 1, 0):i + 2] = True
+    if near.sum() < 3:
+        return ts[i], xs[i], ys[i]
+    u = ts[near] - ts[i]
+    a, b, c = np.polyfit(u, ys[near], 2)
+    if a <= 0:
+        return ts[i], xs[i], ys[i]
+    vertex = min(max(-b / (2 * a), u[0]), u[-1])
+    return ts[i] + vertex, np.interp(vertex, u, xs[near]), c + b * vertex + a * vertex * vertex
+
+
+def last_fall_below(ts, values, threshold, end):
+    """Time values last went from >= threshold to below it at or before index end, interpolated; None if never."""
+    values = np.asarray(values[:end + 1], dtype=np.float64)
+    went = np.flatnonzero((values[:-1] >= threshold) & (values[1:] < threshold))
+    if not len(went):
+        return None
+    k = went[-1]
+    return float(lerp(ts[k], ts[k + 1], crossing(threshold, values[k], values[k + 1])))
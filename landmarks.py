@@ -0,0 +1,199 @@
+"""
+landmarks.py
+Compact recording and replay of per-frame pose landmarks.
+
+A recording is a 16-byte header (magic, frame width, frame height) followed by
+fixed-size little-endian records of RECORD_DTYPE: capture index, capture
+timestamp and the 33 landmarks as (x, y, z, visibility) float32. Frames without
+a detected pose are stored as NaN. Because records are fixed-size the file can
+be memory-mapped and sliced directly as an (N, 33, 4) array.
+
+Replaying a recording through a Detector skips MediaPipe entirely, so threshold
+changes (DOWN_ANGLE, KNEE_LOCK_ANGLE, HOLD_DURATION, ...) can be re-checked on a
+whole session in seconds:
+
+    python landmarks.py sit_ups session.lmk
+    python landmarks.py vertical_jump session.lmk --vectorized --set standing_reach_y=412
+    python landmarks.py broad_jump session.lmk --set takeoff_x=300 --calibration calibration/lane1.json
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+NUM_LANDMARKS = 33
+MAGIC = b"POSELM01"
+HEADER = struct.Struct("<8sII")
+RECORD_DTYPE = np.dtype([
+    ("index", "<u4"),
+    ("timestamp", "<f8"),
+    ("landmarks", "<f4", (NUM_LANDMARKS, 4)),
+])
+FLUSH_RECORDS = 256
+
+Landmark = namedtuple("Landmark", ["x", "y", "z", "visibility"])
+
+
+def landmarks_to_array(pose_landmarks, out=None):
+    """Copy a MediaPipe NormalizedLandmarkList into a (33, 4) float32 array."""
+    if out is None:
+        out = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+    for i, lm in enumerate(pose_landmarks.landmark):
+        out[i] = (lm.x, lm.y, lm.z, lm.visibility)
+    return out
+
+
+class LandmarkList:
+    """Read-only stand-in for pose_landmarks.landmark backed by a (33, 4) array row."""
+    __slots__ = ("_rows",)
+
+    def __init__(self, array):
+        self._rows = array.tolist()
+
+    def __getitem__(self, i):
+        return Landmark(*self._rows[i])
+
+    def __len__(self):
+        return len(self._rows)
+
+
+class LandmarkRecorder:
+    """Appends one record per frame, writing to disk in batches of FLUSH_RECORDS."""
+
+    def __init__(self, path, frame_size):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, frame_size[0], frame_size[1]))
+        self.buffer = np.empty(FLUSH_RECORDS, dtype=RECORD_DTYPE)
+        self.count = 0
+
+    def write(self, frame, pose_landmarks):
+        i = self.count
+        self.buffer["index"][i] = frame.index
+        self.buffer["timestamp"][i] = frame.timestamp
+        if pose_landmarks is None:
+            self.buffer["landmarks"][i] = np.nan
+        else:
+            landmarks_to_array(pose_landmarks, self.buffer["landmarks"][i])
+        self.count += 1
+        if self.count == FLUSH_RECORDS:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer[:self.count].tobytes())
+        self.file.flush()
+        self.count = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class LandmarkReplay:
+    """Memory-mapped view of a recording."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic, width, height = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a landmark recording")
+        self.frame_size = (width, height)
+        if os.path.getsize(path) > HEADER.size:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size)
+        else:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+        self.index = self.records["index"]
+        self.timestamps = self.records["timestamp"]
+        # (N, 33, 4) view; rows of NaN are frames without a detected pose
+        self.landmarks = self.records["landmarks"]
+        self.detected = ~np.isnan(self.landmarks[:, 0, 0])
+
+    def __len__(self):
+        return len(self.records)
+
+    def frames(self):
+        """Yield (Frame, landmarks or None) in the form Detector.process() expects."""
+        from pipeline import Frame
+
+        width, height = self.frame_size
+        # Detectors only read image.shape; a zero-stride array gives the shape without the pixels
+        image = np.broadcast_to(np.zeros(1, dtype=np.uint8), (height, width, 3))
+        landmarks = self.landmarks
+        detected = self.detected
+        for i, (index, timestamp) in enumerate(zip(self.index.tolist(), self.timestamps.tolist())):
+            lm = LandmarkList(landmarks[i]) if detected[i] else None
+            yield Frame(index, timestamp, image), lm
+
+
+def replay(detector, recording):
+    """Run a Detector over a LandmarkReplay and return its events as (index, timestamp, path, payload)."""
+    # a recording holds no pixels, so image-tracking detectors fall back to landmarks alone
+    detector.image_tracking = False
+    events = []
+    for frame, lm in recording.frames():
+        for path, payload in detector.process(lm, frame):
+            if path not in detector.state_paths:
+                events.append((frame.index, frame.timestamp, path, payload))
+    return events
+
+
+def main(argv=None):
+    from calibration import Calibration
+    from detectors import DETECTORS, batch_function, create_detector, detector_class
+
+    parser = argparse.ArgumentParser(description="Replay a landmark recording through a detector.")
+    parser.add_argument("test", choices=sorted(DETECTORS))
+    parser.add_argument("recording")
+    parser.add_argument("--vectorized", action="store_true", help="use the NumPy batch kernels")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="detector setup normally done with keys/clicks, e.g. standing_reach_y=412, "
+                             "takeoff_x=300, pixels_per_cm=44")
+    parser.add_argument("--calibration", metavar="PATH", help="camera calibration file used when recording")
+    args = parser.parse_args(argv)
+    setup = {}
+    for item in args.set:
+        name, _, value = item.partition("=")
+        try:
+            setup[name] = float(value)
+        except ValueError:
+            parser.error(f"--set {item!r} must be NAME=NUMBER")
+
+    recording = LandmarkReplay(args.recording)
+    plane_name = detector_class(args.test).calibration_plane
+    calibration = Calibration.load(args.calibration) if args.calibration else None
+    if "pixels_per_cm" in setup:
+        calibration = calibration or Calibration()
+    if calibration is not None:
+        calibration.check_size(recording.frame_size)
+        if "pixels_per_cm" in setup:
+            calibration.set_scale(plane_name, setup.pop("pixels_per_cm"))
+
+    start = time.perf_counter()
+    if args.vectorized:
+        if calibration is not None and calibration.has_plane(plane_name):
+            setup["plane"] = calibration.plane(plane_name)
+        batch = batch_function(args.test)(recording.landmarks, recording.index, recording.timestamps,
+                                           recording.frame_size, **setup)
+        rows = np.searchsorted(recording.index, [index for index, _, _ in batch])
+        events = [(index, float(recording.timestamps[row]), path, payload)
+                  for row, (index, path, payload) in zip(rows, batch)]
+    else:
+        detector = create_detector(args.test)
+        if calibration is not None:
+            detector.set_calibration(calibration)
+        for name, value in setup.items():
+            setattr(detector, name, value)
+        events = replay(detector, recording)
+    elapsed = time.perf_counter() - start
+    for index, timestamp, path, payload in events:
+        print(f"frame {index} t={timestamp:.3f}s {path.lstrip('/')} {payload if payload is not None else ''}")
+    print(f"Replayed {len(recording)} frames in {elapsed:.2f} s ({len(recording) / max(elapsed, 1e-9):.0f} frames/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
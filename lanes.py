@@ -0,0 +1,233 @@
+"""
+lanes.py
+Several athletes in one camera frame, one marked lane each.
+
+The frame is split into lane boxes (equal vertical strips with --lanes N, or
+explicit normalized boxes with --lane-box X0,Y0,X1,Y1). Every lane has its own
+MediaPipe Pose, which tracks the single athlete in its crop, and its own
+Detector, which sees a Frame whose image is the lane crop and landmarks
+normalized to that crop, exactly as if a camera were looking at the lane
+alone. Each lane's calibration is shifted by its crop offset, so the camera's
+calibration file still applies.
+
+Lane i (counted from 1) posts to station "<station>-lane<i>" on the results
+server, so every lane has its own counts and dashboard. Keys apply to all lanes;
+control API commands take {"lane": i} to target one lane. Sit-and-reach click
+calibration ('c') is not available with lanes, since the window's mouse clicks
+are not bound to a lane: use POST /calibrate with {"lane": i} instead. --autotune picks one
+pose level for all lanes together, measured on their combined inference time.
+"""
+
+import copy
+import time
+
+import cv2
+
+from adaptive import AdaptiveScheduler
+from autotune import DEFAULT_LEVEL
+from control import CONTROL_PORT, start_control_server
+from metrics import start_metrics_server
+from pipeline import (Frame, PoseModels, TrackerMetrics, capture_size, frame_pipeline, load_calibration, mp_drawing,
+                      mp_pose, open_capture, parse_source, pose_estimator, results_writer, send_posts, start_autotune,
+                      station_url, write_results)
+from telemetry import TelemetryClient
+
+LANE_COLOR = (255, 200, 0)
+
+
+def lane_boxes(count=None, boxes=None):
+    """Normalized (x0, y0, x1, y1) lane boxes: explicit 'X0,Y0,X1,Y1' boxes, else count equal vertical strips."""
+    if boxes:
+        return [parse_box(box) for box in boxes]
+    count = count or 1
+    return [(i / count, 0.0, (i + 1) / count, 1.0) for i in range(count)]
+
+
+def parse_box(text):
+    """'X0,Y0,X1,Y1' in 0..1 -> tuple."""
+    values = tuple(float(v) for v in text.split(","))
+    if len(values) != 4 or not (0 <= values[0] < values[2] <= 1 and 0 <= values[1] < values[3] <= 1):
+        raise ValueError(f"lane box {text!r} must be X0,Y0,X1,Y1 with 0 <= X0 < X1 <= 1 and 0 <= Y0 < Y1 <= 1")
+    return values
+
+
+class Lane:
+    """One lane: its crop box, Pose models, Detector and telemetry client."""
+
+    def __init__(self, number, box, detector, telemetry, station):
+        self.number = number
+        self.box = box
+        self.detector = detector
+        self.models = PoseModels()
+        self.estimate = None
+        self.telemetry = telemetry
+        self.writer = results_writer(detector, station)
+
+    def use(self, level, roi=False):
+        """Run pose at an autotune Level from the next frame on."""
+        self.estimate = pose_estimator(self.models.get(level.complexity), roi, level.scale)
+
+    def pixels(self, w, h):
+        x0, y0, x1, y1 = self.box
+        return int(x0 * w), int(y0 * h), int(x1 * w), int(y1 * h)
+
+    def crop(self, image):
+        h, w = image.shape[:2]
+        x0, y0, x1, y1 = self.pixels(w, h)
+        return image[y0:y1, x0:x1]
+
+    def process(self, frame):
+        crop = self.crop(frame.image)
+        results = self.estimate(crop) if self.detector.needs_pose() else None
+        lm = results.pose_landmarks.landmark if results is not None and results.pose_landmarks else None
+        posts = self.detector.process(lm, Frame(frame.index, frame.timestamp, crop))
+        send_posts(self.telemetry, self.detector, posts)
+        write_results(self.writer, self.detector, posts)
+        return results
+
+    def draw(self, vis_frame, results):
+        view = self.crop(vis_frame)
+        if self.detector.draw_landmarks and results is not None and results.pose_landmarks:
+            mp_drawing.draw_landmarks(view, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
+        self.detector.draw(view)
+        h, w = vis_frame.shape[:2]
+        x0, y0, x1, y1 = self.pixels(w, h)
+        cv2.rectangle(vis_frame, (x0, y0), (x1 - 1, y1 - 1), LANE_COLOR, 2)
+        cv2.putText(vis_frame, f"Lane {self.number}", (x0 + 10, y1 - 15),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, LANE_COLOR, 2, cv2.LINE_AA)
+
+
+class LaneGroup:
+    """The lanes of one camera, driven together by the pipeline."""
+
+    def __init__(self, lanes):
+        self.lanes = lanes
+
+    def in_attempt(self):
+        return any(lane.detector.in_attempt() for lane in self.lanes)
+
+    def handle_key(self, key):
+        if key == ord('c'):
+            print('Click calibration is not available with lanes; use the control API: '
+                  'POST /calibrate {"lane": i, "points": [[x1, y1], [x2, y2]], "length_cm": ...}')
+            return
+        for lane in self.lanes:
+            lane.detector.handle_key(key)
+
+    def handle_command(self, command, data):
+        number = data.get("lane")
+        for lane in self.lanes:
+            if number is None or int(number) == lane.number:
+                lane.detector.handle_command(command, data)
+
+
+def run_lanes(detector, window_name, frame_size, options):
+    """run_tracker for a camera covering several lanes; each lane gets its own copy of the detector."""
+    if options.record:
+        print("ERROR: --record is not supported with lanes.")
+        return False
+    try:
+        boxes = lane_boxes(options.lanes, options.lane_box)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return False
+    cap = open_capture(parse_source(options.source), frame_size, options.capture_fps)
+    if cap is None:
+        return True
+
+    if not options.headless:
+        cv2.namedWindow(window_name)
+    lanes = []
+    for i, box in enumerate(boxes):
+        station = f"{options.station}-lane{i + 1}"
+        lanes.append(Lane(i + 1, box, detector if i == 0 else copy.deepcopy(detector),
+                          TelemetryClient(station_url(detector.test, station, options.server)), station))
+
+    try:
+        def build(level):
+            for lane in lanes:
+                lane.use(level, options.roi)
+            return lambda image: [lane.estimate(lane.crop(image)) for lane in lanes]
+
+        tuner = None
+        if options.autotune:
+            tuner, _ = start_autotune(detector, options, cap, frame_size, build)
+        else:
+            build(DEFAULT_LEVEL)
+        actual_size = capture_size(cap)
+        calibration = load_calibration(options, actual_size)
+        for lane in lanes:
+            lane.detector.set_calibration(calibration, lane.pixels(*actual_size)[:2])
+        group = LaneGroup(lanes)
+        print(f"Tracking {len(lanes)} lanes as stations {options.station}-lane1..{len(lanes)}")
+        metrics = TrackerMetrics(detector.test, options.station)
+        if tuner is not None:
+            tuner.register(metrics.registry)
+        scheduler = AdaptiveScheduler() if options.adaptive else None
+
+        def infer(frame):
+            if scheduler is not None and not scheduler.should_infer(frame, group):
+                return None
+            start = time.perf_counter()
+            results = [lane.process(frame) for lane in lanes]
+            if any(r is not None for r in results):
+                # frames every lane handled without pose (flow, ball) are not pose inferences
+                metrics.observe(frame, time.perf_counter() - start,
+                                any(r is not None and r.pose_landmarks for r in results))
+            if tuner is not None and any(r is not None for r in results):
+                tuner.observe(time.perf_counter() - start)
+                tuner.adjust(frame.timestamp, group.in_attempt())
+            return results
+
+        def render(frame, results):
+            vis_frame = frame.image
+            for i, lane in enumerate(lanes):
+                lane.draw(vis_frame, results[i] if results is not None else None)
+            cv2.imshow(window_name, vis_frame)
+
+            key = cv2.waitKey(5)
+            if key == -1:
+                return True
+            key &= 0xFF
+            if key == ord('q'):
+                return False
+            pipeline.submit(group.handle_key, key)
+            return True
+
+        def dispatch(command, data):
+            if command == "quit":
+                pipeline.stop()
+            else:
+                pipeline.submit(group.handle_command, command, data)
+
+        pipeline = frame_pipeline(cap, infer, None if options.headless else render, options,
+                                  max(lane.detector.capture_backlog for lane in lanes))
+        metrics.bind(pipeline, lanes[0].telemetry)
+        servers = []
+        if options.metrics_port:
+            servers.append(start_metrics_server(metrics.registry, options.metrics_port))
+        control_port = options.control_port or (CONTROL_PORT if options.headless else None)
+        if control_port:
+            servers.append(start_control_server(dispatch, control_port))
+        try:
+            pipeline.run()
+        except KeyboardInterrupt:
+            pipeline.stop()
+        for server in servers:
+            server.shutdown()
+    finally:
+        # flush every lane's results even if one lane's detector raised
+        for lane in lanes:
+            lane.telemetry.close()
+            if lane.writer is not None:
+                lane.writer.close()
+            lane.models.close()
+
+    if scheduler is not None:
+        print(scheduler.summary())
+    if tuner is not None:
+        print(tuner.summary())
+    cap.release()
+    if not options.headless:
+        cv2.destroyAllWindows()
+    return pipeline.ended
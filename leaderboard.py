@@ -0,0 +1,196 @@
+"""
+leaderboard.py
+Incrementally maintained leaderboards and percentiles for every test.
+
+Each athlete's best score per test is kept in a Ranking: a Fenwick tree of
+athlete counts over score bins (SCORE_BINS gives each test's range and bin
+width) plus the athletes in every bin. A new best moves one athlete between two
+bins, O(log bins); rank, top-N and percentile reads walk the tree the same way
+and never re-scan attempt history. There is one Ranking per test overall and
+one per test and age group.
+
+Higher scores rank higher for every test. Scores outside a test's range are
+clamped into its first or last bin for ordering, but reported exactly.
+"""
+
+import math
+import threading
+
+# test -> (lowest score, highest score, bin width)
+SCORE_BINS = {
+    "sit_and_reach": (-50.0, 100.0, 0.1),
+    "vertical_jump": (0.0, 150.0, 0.1),
+    "sit_ups": (0.0, 300.0, 1.0),
+    "broad_jump": (0.0, 400.0, 0.1),
+    "medicine_ball": (0.0, 2500.0, 1.0),
+}
+DEFAULT_PERCENTILES = (25, 50, 75, 90)
+
+
+class Ranking:
+    """Order statistics over athletes' best scores in one leaderboard."""
+
+    def __init__(self, low, high, width):
+        self.low = low
+        self.width = width
+        self.bins = int(math.ceil((high - low) / width)) + 1
+        self.tree = [0] * (self.bins + 1)  # 1-based Fenwick tree
+        self.members = {}  # bin -> {athlete: score}
+        self.count = 0
+
+    def _bin(self, score):
+        return min(max(int((score - self.low) / self.width), 0), self.bins - 1)
+
+    def _update(self, b, delta):
+        i = b + 1
+        while i <= self.bins:
+            self.tree[i] += delta
+            i += i & -i
+
+    def _count_upto(self, b):
+        """Athletes in bins 0..b (0 for b < 0)."""
+        i, total = b + 1, 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def _kth_bin(self, k):
+        """Bin holding the k-th lowest score (1-based)."""
+        pos, step = 0, 1 << self.bins.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.bins and self.tree[nxt] < k:
+                pos = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return pos
+
+    def add(self, athlete, score):
+        b = self._bin(score)
+        self.members.setdefault(b, {})[athlete] = score
+        self._update(b, 1)
+        self.count += 1
+
+    def remove(self, athlete, score):
+        b = self._bin(score)
+        members = self.members[b]
+        del members[athlete]
+        if not members:
+            del self.members[b]
+        self._update(b, -1)
+        self.count -= 1
+
+    def rank(self, score):
+        """1-based rank a score would have; equal scores share a rank."""
+        return self.count - self._count_upto(self._bin(score)) + 1 + self._ahead_in_bin(score)
+
+    def _ahead_in_bin(self, score):
+        return sum(1 for s in self.members.get(self._bin(score), {}).values() if s > score)
+
+    def percentile_of(self, score):
+        """Percentage of athletes scoring below score."""
+        if not self.count:
+            return 0.0
+        b = self._bin(score)
+        below = self._count_upto(b - 1)
+        below += sum(1 for s in self.members.get(b, {}).values() if s < score)
+        return 100.0 * below / self.count
+
+    def percentile(self, p):
+        """Score at the p-th percentile (nearest rank), or None when empty."""
+        if not self.count:
+            return None
+        k = min(max(int(math.ceil(p / 100.0 * self.count)), 1), self.count)
+        b = self._kth_bin(k)
+        scores = sorted(self.members[b].values())
+        return scores[k - self._count_upto(b - 1) - 1]
+
+    def top(self, n):
+        """[(athlete, score)] for the n best, best first."""
+        result = []
+        k = self.count
+        while k > 0 and len(result) < n:
+            b = self._kth_bin(k)
+            members = sorted(self.members[b].items(), key=lambda item: -item[1])
+            result.extend(members)
+            k -= len(members)
+        return result[:n]
+
+
+class Leaderboards:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.best = {test: {} for test in SCORE_BINS}          # test -> athlete -> best score
+        self.overall = {test: Ranking(*bins) for test, bins in SCORE_BINS.items()}
+        self.groups = {test: {} for test in SCORE_BINS}        # test -> age group -> Ranking
+        self.age_groups = {}                                   # athlete -> age group
+
+    def _group_ranking(self, test, group):
+        ranking = self.groups[test].get(group)
+        if ranking is None:
+            ranking = self.groups[test][group] = Ranking(*SCORE_BINS[test])
+        return ranking
+
+    def record(self, test, athlete, score):
+        """Account for a new attempt; only a new personal best changes any ranking."""
+        if test not in SCORE_BINS or score is None:
+            return
+        with self.lock:
+            best = self.best[test]
+            old = best.get(athlete)
+            if old is not None and score <= old:
+                return
+            best[athlete] = score
+            group = self.age_groups.get(athlete)
+            rankings = [self.overall[test]]
+            if group is not None:
+                rankings.append(self._group_ranking(test, group))
+            for ranking in rankings:
+                if old is not None:
+                    ranking.remove(athlete, old)
+                ranking.add(athlete, score)
+
+    def set_age_group(self, athlete, group):
+        with self.lock:
+            old = self.age_groups.get(athlete)
+            if old == group:
+                return
+            self.age_groups[athlete] = group
+            for test, best in self.best.items():
+                score = best.get(athlete)
+                if score is None:
+                    continue
+                if old is not None:
+                    self._group_ranking(test, old).remove(athlete, score)
+                self._group_ranking(test, group).add(athlete, score)
+
+    def leaderboard(self, test, n=10, age_group=None, percentiles=DEFAULT_PERCENTILES):
+        with self.lock:
+            # reads never create a group's ranking, so unknown ?age_group= values cost nothing
+            ranking = self.overall[test] if age_group is None else self.groups[test].get(age_group)
+            if ranking is None:
+                return dict(test=test, age_group=age_group, athletes=0, top=[],
+                            percentiles={str(p): None for p in percentiles})
+            entries = []
+            for athlete, score in ranking.top(n):
+                entries.append(dict(rank=ranking.rank(score), athlete=athlete, score=score,
+                                    age_group=self.age_groups.get(athlete)))
+            return dict(test=test, age_group=age_group, athletes=ranking.count, top=entries,
+                        percentiles={str(p): ranking.percentile(p) for p in percentiles})
+
+    def standing(self, test, athlete):
+        """An athlete's best, overall rank and percentile, or None if they have no score."""
+        with self.lock:
+            score = self.best[test].get(athlete)
+            if score is None:
+                return None
+            ranking = self.overall[test]
+            standing = dict(test=test, athlete=athlete, score=score, rank=ranking.rank(score),
+                            athletes=ranking.count, percentile=ranking.percentile_of(score))
+            group = self.age_groups.get(athlete)
+            group_ranking = self.groups[test].get(group) if group is not None else None
+            if group_ranking is not None:
+                standing.update(age_group=group, group_rank=group_ranking.rank(score),
+                                group_athletes=group_ranking.count)
+            return standing
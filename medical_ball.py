@@ -3,27 +3,42 @@ import mediapipe as mp
 import numpy as np
 import math
 import time
-import requests
+
+import kernels
+from ball import REFERENCE_WIDTH, BallTracker, parse_hsv_range
+from calibration import PlaneMap
+from pipeline import Detector, run_tracker, tracker_arg_parser
 
 FRAME_WIDTH = 1280
 FRAME_HEIGHT = 720
-FPS = 30  # set to your camera FPS
-PIXELS_PER_CM = 44.0  # calibration factor
+RELEASE_X = 0.7  # without ball tracking: wrist passing this fraction of the frame width marks the release
+LAND_X = 0.3     # and this one the landing
+RELEASE_GAP = 90            # px (1280 wide frame): ball this far from both hands has left them
+MIN_RELEASE_SPEED = 300     # px/s (1280 wide frame): and is moving, not just set down
+MIN_DROP = 30               # px (1280 wide frame): the ball must fall this far from its highest point to land
+MAX_FLIGHT_SECONDS = 4.0
+BALL_ACTIVE_SECONDS = 0.5   # before the throw, pose runs on every frame this long after the ball was last seen moving
+POSE_IDLE_SECONDS = 0.5     # and otherwise this often, to keep track of where the hands are
+OUTPUT_CSV = "medicine_ball_results.csv"
 
 mp_drawing = mp.solutions.drawing_utils
 mp_pose = mp.solutions.pose
 
-def calculate_metrics(release, land, pixels_per_cm, fps):
-    # Flight time (s)
-    flight_time = (land['frame'] - release['frame']) / fps
+def calculate_metrics(release, land, plane):
+    # Flight time (s) from capture timestamps, so dropped frames do not stretch it
+    flight_time = land['t'] - release['t']
+
+    # Release and landing points on the throw plane (cm)
+    release_x, release_y = plane.to_cm(release['x'], release['y'])
+    land_x, land_y = plane.to_cm(land['x'], land['y'])
 
     # Range in cm
-    D_cm = abs(land['x'] - release['x']) / pixels_per_cm
+    D_cm = abs(land_x - release_x)
 
-    # Speeds (cm/s) using frame-based Δt
+    # Speeds (cm/s) over the measured Δt
     dt = flight_time if flight_time > 0 else 1e-6
-    vx = (land['x'] - release['x']) / pixels_per_cm / dt
-    vy = (land['y'] - release['y']) / pixels_per_cm / dt
+    vx = (land_x - release_x) / dt
+    vy = (land_y - release_y) / dt
     v = math.sqrt(vx**2 + vy**2)
 
     # Release angle (deg)
@@ -45,87 +60,232 @@ def calculate_metrics(release, land, pixels_per_cm, fps):
         "score": score
     }
 
-def main():
-    cap = cv2.VideoCapture(0)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+def event_point(threshold, prev, t, x, y):
+    """
+    Where and when the wrist crossed x = threshold, interpolated between the previous
+    sample prev = (t, x, y) and this one; this sample as is when prev did not straddle it.
+    """
+    if prev is not None and (prev[1] - threshold) * (x - threshold) <= 0 and prev[1] != x:
+        f = kernels.crossing(threshold, prev[1], x)
+        return {"t": kernels.lerp(prev[0], t, f), "x": threshold, "y": kernels.lerp(prev[2], y, f)}
+    return {"t": t, "x": x, "y": y}
+
+class MedicineBallDetector(Detector):
+    """
+    Medicine ball throw.
+
+    With image_tracking (the live trackers) the ball itself is followed by a
+    BallTracker on every frame. The tracker only sees the ball while it moves,
+    so before the throw pose runs on every frame just while the ball is moving
+    (picked up, carried, wound up) and every POSE_IDLE_SECONDS otherwise, which
+    keeps the last hand positions fresh. The release is the ball leaving the
+    hands, and during the flight only the ball tracker runs. The landing is where the ball stops falling (bounce or
+    stop), interpolated between frames. Without image_tracking (landmark
+    replays) the right wrist crossing RELEASE_X and LAND_X stands in for the ball.
+    """
+    test = "medicine_ball"
+    draw_landmarks = False
+    # The throw is measured on the wall plane the camera faces (see calibration.py)
+    calibration_plane = "wall"
+    # fast movements: aim --autotune at a high frame rate
+    target_fps = 60.0
+    image_tracking = True
+    results_csv = OUTPUT_CSV
+    results_header = ("flight_time", "range_cm", "vx", "vy", "v", "angle_deg", "score")
+
+    def __init__(self, ball_hsv=None):
+        self.release = None
+        self.land = None
+        self.throw_detected = False
+        self.metrics = None
+        self.prev = None  # (timestamp, x, y) of the wrist in the last frame with a pose
+        self.ball = BallTracker(ball_hsv)
+        self.ball_position = None
+        self.held = None     # (timestamp, x, y) of the ball the last time it was in the hands
+        self.leaving = None  # first sighting clear of the hands, confirmed as a release by the next one
+        self.flight = []     # (timestamp, x, y) ball sightings since the release
+        self.hands = []      # wrist pixel positions from the last frame with a pose
+        self.pose_time = -math.inf
+        self.ball_time = -math.inf  # when the ball was last seen
+        self.now = -math.inf
+
+    def process(self, lm, frame):
+        if self.image_tracking:
+            return self._follow_ball(lm, frame)
+        return self._follow_wrist(lm, frame)
+
+    def _follow_ball(self, lm, frame):
+        h, w = frame.image.shape[:2]
+        scale = w / REFERENCE_WIDTH
+        self.now = frame.timestamp
+        if lm is not None:
+            self.hands = []
+            for landmark in (mp_pose.PoseLandmark.LEFT_WRIST, mp_pose.PoseLandmark.RIGHT_WRIST):
+                wrist = lm[landmark.value]
+                if wrist.visibility > 0.5:
+                    self.hands.append((wrist.x * w, wrist.y * h))
+            self.pose_time = frame.timestamp
+        # between pose frames the last hand positions stand in, while they are recent
+        hands = self.hands if frame.timestamp - self.pose_time <= 2 * POSE_IDLE_SECONDS else []
+        near = None
+        if not self.throw_detected and hands:
+            near = (sum(x for x, _ in hands) / len(hands), sum(y for _, y in hands) / len(hands))
+        ball = self.ball.update(frame.image, frame.timestamp, near)
+        self.ball_position = ball
+        sample = (frame.timestamp, ball[0], ball[1]) if ball is not None else None
+        if ball is not None:
+            self.ball_time = frame.timestamp
+
+        if not self.throw_detected:
+            if sample is None or not hands:
+                return []
+            gap = min(math.hypot(sample[1] - x, sample[2] - y) for x, y in hands)
+            if gap <= RELEASE_GAP * scale:
+                self.held, self.leaving = sample, None
+            elif self.ball.speed() < MIN_RELEASE_SPEED * scale:
+                self.leaving = None
+            elif self.leaving is None:
+                # one fast sighting away from the hands may be a stray blob; wait for a second
+                self.leaving = sample
+            else:
+                # released between the last sighting in the hands (if the ball stood out there) and now
+                self.flight = [p for p in (self.held, self.leaving) if p is not None] + [sample]
+                t, x, y = self.flight[0]
+                self.release = {"t": t, "x": x, "y": y}
+                self.throw_detected = True
+                print("Release detected!")
+            return []
+
+        if self.ball.last is None or frame.timestamp - self.release["t"] > MAX_FLIGHT_SECONDS:
+            print("Ball lost in flight; throw not scored.")
+            self.reset()
+            return []
+        if sample is None:
+            return []
+        self.flight.append(sample)
+        if len(self.flight) < 3:
+            return []
+        before, peak = self.flight[-3], self.flight[-2]
+        # The ball was falling and no longer is: it hit the ground at about the lowest sighting
+        top = min(y for _, _, y in self.flight)
+        if peak[2] > before[2] and sample[2] <= peak[2] and peak[2] - top >= MIN_DROP * scale:
+            t, x, y = kernels.extremum_point(before, peak, sample)
+            self.land = {"t": float(t), "x": float(x), "y": float(y)}
+            print("Landing detected!")
+            return self._score()
+        return []
+
+    def _follow_wrist(self, lm, frame):
+        h, w = frame.image.shape[:2]
+
+        if lm is not None:
+            wrist = lm[mp_pose.PoseLandmark.RIGHT_WRIST.value]
+            wrist_x = wrist.x * w
+            wrist_y = wrist.y * h
+
+            # Release detection
+            if not self.throw_detected and wrist_x > w * RELEASE_X:
+                self.release = event_point(w * RELEASE_X, self.prev, frame.timestamp, wrist_x, wrist_y)
+                self.throw_detected = True
+                print("Release detected!")
+
+            # Landing detection
+            if self.throw_detected and wrist_x < w * LAND_X:
+                self.land = event_point(w * LAND_X, self.prev, frame.timestamp, wrist_x, wrist_y)
+                print("Landing detected!")
+            self.prev = (frame.timestamp, wrist_x, wrist_y)
+
+        # Calculate metrics once per throw
+        if self.release and self.land:
+            return self._score()
+        return []
 
+    def _score(self):
+        self.metrics = calculate_metrics(self.release, self.land, self.plane)
+
+        # Reset after one throw
+        self.reset()
+
+        # Send to Flask API
+        return [("/increment", self.metrics)]
+
+    def reset(self):
+        self.release, self.land = None, None
+        self.throw_detected = False
+        self.held = None
+        self.leaving = None
+        self.flight = []
+        self.ball.reset()
+
+    def result_rows(self, posts):
+        return [[payload[key] for key in self.results_header] for path, payload in posts if path == "/increment"]
+
+    def draw(self, vis_frame):
+        if self.image_tracking:
+            for _, x, y in list(self.flight):
+                cv2.circle(vis_frame, (int(x), int(y)), 4, (0, 200, 255), -1)
+            if self.ball_position is not None:
+                x, y, r = self.ball_position
+                cv2.circle(vis_frame, (int(x), int(y)), int(r), (0, 255, 255), 2)
+
+        # Display the last throw on screen
+        if self.metrics:
+            y0 = 60
+            for k, v in self.metrics.items():
+                cv2.putText(vis_frame, f"{k}: {v:.2f}", (30, y0),
+                            cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
+                y0 += 40
+
+    def in_attempt(self):
+        return self.throw_detected
+
+    def needs_pose(self):
+        if not self.image_tracking:
+            return True
+        if self.throw_detected:
+            # during the flight only the ball matters
+            return False
+        return self.now - self.ball_time <= BALL_ACTIVE_SECONDS or self.now - self.pose_time >= POSE_IDLE_SECONDS
+
+    def handle_key(self, key):
+        if key == ord('r'):
+            self.reset()
+
+def batch_events(landmarks, index, timestamps, frame_size, plane=None):
+    """Vectorized MedicineBallDetector over an (N, 33, 4) landmark array; returns [(index, path, payload)]."""
+    if plane is None:
+        plane = PlaneMap()
+    L = kernels.as_float64(landmarks)
+    w, h = frame_size
+    wrist_x = L[:, mp_pose.PoseLandmark.RIGHT_WRIST.value, kernels.X] * w
+    wrist_y = L[:, mp_pose.PoseLandmark.RIGHT_WRIST.value, kernels.Y] * h
+    releases, lands = kernels.alternations(wrist_x > w * RELEASE_X, wrist_x < w * LAND_X)
+    seen = np.flatnonzero(kernels.detected(L))
+
+    def point(threshold, i):
+        # interpolate from the previous frame with a pose, as the live detector does
+        pos = np.searchsorted(seen, i)
+        prev = None
+        if pos > 0:
+            j = seen[pos - 1]
+            prev = (float(timestamps[j]), float(wrist_x[j]), float(wrist_y[j]))
+        return event_point(threshold, prev, float(timestamps[i]), float(wrist_x[i]), float(wrist_y[i]))
+
+    events = []
+    for r, l in zip(releases, lands):
+        release = point(w * RELEASE_X, r)
+        land = point(w * LAND_X, l)
+        events.append((int(index[l]), "/increment", calculate_metrics(release, land, plane)))
+    return events
+
+def main():
+    parser = tracker_arg_parser()
+    parser.add_argument("--ball-color", metavar="H0,S0,V0,H1,S1,V1",
+                        help="HSV range of the ball's colour, to ignore other moving things")
+    args = parser.parse_args()
+    ball_hsv = parse_hsv_range(args.ball_color) if args.ball_color else None
     WINDOW_NAME = "Medicine Ball Throw (press 'q' to quit, 'r' to reset)"
-    cv2.namedWindow(WINDOW_NAME)
-
-    release = None
-    land = None
-    throw_detected = False
-    frame_count = 0
-
-    with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = pose.process(frame_rgb)
-            vis_frame = frame.copy()
-            h, w = frame.shape[:2]
-
-            if results.pose_landmarks:
-                lm = results.pose_landmarks.landmark
-                wrist = lm[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-                wrist_x = wrist.x * w
-                wrist_y = wrist.y * h
-
-                # Release detection
-                if not throw_detected and wrist_x > w * 0.7:
-                    release = {
-                        "frame": frame_count,
-                        "x": wrist_x,
-                        "y": wrist_y,
-                    }
-                    throw_detected = True
-                    print("Release detected!")
-
-                # Landing detection
-                if throw_detected and wrist_x < w * 0.3:
-                    land = {
-                        "frame": frame_count,
-                        "x": wrist_x,
-                        "y": wrist_y,
-                    }
-                    print("Landing detected!")
-
-            # Calculate metrics once per throw
-            if release and land:
-                metrics = calculate_metrics(release, land, PIXELS_PER_CM, FPS)
-
-                # Send to Flask API
-                try:
-                    requests.post("http://127.0.0.1:5000/increment", json=metrics)
-                except:
-                    print("⚠ Could not connect to Flask server.")
-
-                # Display on screen
-                y0 = 60
-                for k, v in metrics.items():
-                    cv2.putText(vis_frame, f"{k}: {v:.2f}", (30, y0),
-                                cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
-                    y0 += 40
-
-                # Reset after one throw
-                release, land = None, None
-                throw_detected = False
-
-            cv2.imshow(WINDOW_NAME, vis_frame)
-            key = cv2.waitKey(5)
-            if key == ord('q'):
-                break
-            elif key == ord('r'):
-                release, land = None, None
-                throw_detected = False
-
-            frame_count += 1
-
-    cap.release()
-    cv2.destroyAllWindows()
+    run_tracker(MedicineBallDetector(ball_hsv), WINDOW_NAME, frame_size=(FRAME_WIDTH, FRAME_HEIGHT), options=args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,239 @@
+"""
+multitest.py
+Several tests on one camera, sharing one capture and one pose inference per frame.
+
+    python multitest.py vertical_jump broad_jump --source 0
+    python multitest.py sit_ups sit_and_reach --headless --station gym2
+
+Every test's Detector is a plug-in: the camera is read once, pose runs once per
+frame (on frames where any detector needs it) and the landmarks are handed to
+every detector in turn. Each detector posts to its own test on the results
+server (/<test>/<station>) and writes its own results CSV, exactly as when its
+tracker script runs alone, so hosting another test adds no inference cost.
+
+Keys apply to the focused test, whose overlay is the one drawn: number keys
+1..N switch between the tests in the order given. Control API commands apply to
+the focused test too, or to the one named by {"test": name}; POST /focus
+{"test": name} switches the focus.
+"""
+
+import time
+
+import cv2
+
+from adaptive import AdaptiveScheduler
+from autotune import DEFAULT_LEVEL
+from control import CONTROL_PORT, start_control_server
+from detectors import DETECTORS, create_detector
+from landmarks import LandmarkRecorder
+from metrics import start_metrics_server
+from pipeline import (FRAME_HEIGHT, FRAME_WIDTH, PoseModels, TrackerMetrics, capture_size, frame_pipeline,
+                      load_calibration, mp_drawing, mp_pose, open_capture, parse_source, pose_estimator,
+                      results_writer, send_posts, start_autotune, station_url, tracker_arg_parser, write_results)
+from telemetry import TelemetryClient
+
+STATUS_COLOR = (255, 200, 0)
+
+
+class TestSlot:
+    """One test on the shared camera: its Detector, telemetry client and results writer."""
+
+    def __init__(self, detector, telemetry, station=None):
+        self.detector = detector
+        self.telemetry = telemetry
+        self.writer = results_writer(detector, station)
+
+    def process(self, lm, frame):
+        posts = self.detector.process(lm, frame)
+        send_posts(self.telemetry, self.detector, posts)
+        write_results(self.writer, self.detector, posts)
+
+
+class DetectorGroup:
+    """The tests of one camera, driven together by the pipeline."""
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.focus = 0
+
+    def focused(self):
+        return self.slots[self.focus].detector
+
+    def in_attempt(self):
+        return any(slot.detector.in_attempt() for slot in self.slots)
+
+    def needs_pose(self):
+        return any(slot.detector.needs_pose() for slot in self.slots)
+
+    def set_focus(self, i):
+        self.focus = i
+        print(f"Keys and overlay: {self.focused().test}")
+
+    def handle_key(self, key):
+        if ord('1') <= key < ord('1') + len(self.slots):
+            self.set_focus(key - ord('1'))
+        else:
+            self.focused().handle_key(key)
+
+    def handle_command(self, command, data):
+        test = data.get("test")
+        if test is None:
+            if command != "focus":
+                self.focused().handle_command(command, data)
+            return
+        for i, slot in enumerate(self.slots):
+            if slot.detector.test == test:
+                if command == "focus":
+                    self.set_focus(i)
+                else:
+                    slot.detector.handle_command(command, data)
+                return
+        print(f"WARNING: {command}: no test {test!r} on this camera")
+
+    def draw_status(self, vis_frame):
+        labels = [f"[{i + 1} {slot.detector.test}]" if i == self.focus else f"{i + 1} {slot.detector.test}"
+                  for i, slot in enumerate(self.slots)]
+        cv2.putText(vis_frame, "  ".join(labels), (30, vis_frame.shape[0] - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, STATUS_COLOR, 2, cv2.LINE_AA)
+
+
+def run_tests(detectors, window_name, frame_size=(FRAME_WIDTH, FRAME_HEIGHT), options=None):
+    """run_tracker for several Detectors (one per test) fed from one camera and one pose inference."""
+    if options is None:
+        options = tracker_arg_parser().parse_args([])
+    if (options.lanes or 0) > 1 or options.lane_box:
+        print("ERROR: lanes are not supported with several tests.")
+        return
+    cap = open_capture(parse_source(options.source), frame_size, options.capture_fps)
+    if cap is None:
+        return True
+
+    if not options.headless:
+        cv2.namedWindow(window_name)
+    models = PoseModels()
+
+    def build(level):
+        return pose_estimator(models.get(level.complexity), options.roi, level.scale)
+
+    tuner = None
+    if options.autotune:
+        # the most demanding test sets the frame rate
+        fastest = max(detectors, key=lambda detector: detector.target_fps)
+        tuner, estimate = start_autotune(fastest, options, cap, frame_size, build)
+    else:
+        estimate = build(DEFAULT_LEVEL)
+    actual_size = capture_size(cap)
+    calibration = load_calibration(options, actual_size)
+    slots = []
+    for detector in detectors:
+        detector.set_calibration(calibration)
+        slots.append(TestSlot(detector, TelemetryClient(station_url(detector.test, options.station, options.server)),
+                              options.station))
+    group = DetectorGroup(slots)
+    tests = "+".join(detector.test for detector in detectors)
+    print(f"Tracking {tests} from one pose inference per frame")
+    recorder = None
+    if options.record:
+        recorder = LandmarkRecorder(options.record, actual_size)
+    metrics = TrackerMetrics(tests, options.station)
+    if tuner is not None:
+        tuner.register(metrics.registry)
+    scheduler = AdaptiveScheduler() if options.adaptive else None
+
+    try:
+        def infer(frame):
+            nonlocal estimate
+            if scheduler is not None and not scheduler.should_infer(frame, group):
+                return None
+            start = time.perf_counter()
+            results = estimate(frame.image) if group.needs_pose() else None
+            pose_landmarks = results.pose_landmarks if results is not None else None
+            if results is not None:
+                # frames the detector handled without pose (flow, ball) are not pose inferences
+                metrics.observe(frame, time.perf_counter() - start, pose_landmarks is not None)
+            if recorder is not None:
+                recorder.write(frame, pose_landmarks)
+            lm = pose_landmarks.landmark if pose_landmarks else None
+            for slot in slots:
+                slot.process(lm, frame)
+            if tuner is not None and results is not None:
+                tuner.observe(time.perf_counter() - start)
+                estimate = tuner.adjust(frame.timestamp, group.in_attempt()) or estimate
+            return results
+
+        def render(frame, results):
+            vis_frame = frame.image
+            detector = group.focused()
+            if detector.draw_landmarks and results is not None and results.pose_landmarks:
+                mp_drawing.draw_landmarks(vis_frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
+            detector.draw(vis_frame)
+            group.draw_status(vis_frame)
+            cv2.imshow(window_name, vis_frame)
+
+            key = cv2.waitKey(5)
+            if key == -1:
+                return True
+            key &= 0xFF
+            if key == ord('q'):
+                return False
+            pipeline.submit(group.handle_key, key)
+            return True
+
+        def dispatch(command, data):
+            if command == "quit":
+                pipeline.stop()
+            else:
+                pipeline.submit(group.handle_command, command, data)
+
+        pipeline = frame_pipeline(cap, infer, None if options.headless else render, options,
+                                  max(detector.capture_backlog for detector in detectors))
+        if not options.headless:
+            for detector in detectors:
+                detector.bind_window(window_name, pipeline.submit)
+        metrics.bind(pipeline, slots[0].telemetry)
+        servers = []
+        if options.metrics_port:
+            servers.append(start_metrics_server(metrics.registry, options.metrics_port))
+        control_port = options.control_port or (CONTROL_PORT if options.headless else None)
+        if control_port:
+            servers.append(start_control_server(dispatch, control_port))
+        try:
+            pipeline.run()
+        except KeyboardInterrupt:
+            pipeline.stop()
+        for server in servers:
+            server.shutdown()
+    finally:
+        models.close()
+        # flush queued results even if the pipeline or a detector raised
+        for slot in slots:
+            slot.telemetry.close()
+            if slot.writer is not None:
+                slot.writer.close()
+
+    if scheduler is not None:
+        print(scheduler.summary())
+    if tuner is not None:
+        print(tuner.summary())
+    if recorder is not None:
+        recorder.close()
+    cap.release()
+    if not options.headless:
+        cv2.destroyAllWindows()
+    return pipeline.ended
+
+
+def main(argv=None):
+    parser = tracker_arg_parser("Run several tests on one camera from one pose inference per frame.")
+    parser.add_argument("tests", nargs="+", choices=list(DETECTORS), metavar="TEST",
+                        help=f"tests to run: {', '.join(DETECTORS)}")
+    args = parser.parse_args(argv)
+    if len(set(args.tests)) != len(args.tests):
+        parser.error("each test can only be given once")
+    detectors = [create_detector(test) for test in args.tests]
+    window_name = f"{' + '.join(args.tests)} (1-{len(detectors)} to switch test, 'q' to quit)"
+    run_tests(detectors, window_name, options=args)
+
+
+if __name__ == "__main__":
+    main()
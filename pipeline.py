@@ -0,0 +1,631 @@
+"""
+pipeline.py
+Shared capture -> inference -> render pipeline for the tracker scripts.
+
+Capture runs on its own thread, pose inference + detector logic on a second
+thread and rendering (imshow / waitKey) on the main thread. The stages are
+joined by bounded queues with a "latest frame wins" policy: when a stage falls
+behind, the oldest waiting frame is dropped so end-to-end latency stays bounded.
+
+With --headless there is no render stage at all (no frame copy, overlay,
+imshow or waitKey); keyboard controls come from the local control API instead.
+With --lanes / --lane-box one camera covers several athletes (see lanes.py);
+multitest.py runs several tests from one camera and one pose inference;
+station.py keeps the camera and pose model loaded and switches between tests.
+With --autotune the pose model complexity and resolution are picked for the
+detector's target_fps at startup and adjusted while running (see autotune.py).
+--capture-fps asks the camera for a frame rate, for detectors that follow fast
+movements between pose frames. With --capture-process the camera is read and
+decoded in a separate process, which hands frames over through shared memory
+without copying them (see framering.py).
+
+Frames are drawn on in place for display: once inference is done with a frame,
+render owns it, so no per-frame copy is made.
+"""
+
+import argparse
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from adaptive import AdaptiveScheduler
+from autotune import DEFAULT_LEVEL, AutoTuner
+from calibration import Calibration, PlaneMap, calibration_path
+from control import CONTROL_PORT, start_control_server
+from framering import EMPTY, RING_SLOTS, CaptureProcess, RgbConverter
+from landmarks import LandmarkRecorder
+from metrics import Registry, start_metrics_server
+from results_writer import ResultsWriter
+from roi import RoiPose
+from telemetry import TelemetryClient
+
+FRAME_WIDTH = 1280
+FRAME_HEIGHT = 720
+SERVER_URL = "http://127.0.0.1:5000"
+STATION_ID = "default"
+
+mp_drawing = mp.solutions.drawing_utils
+mp_pose = mp.solutions.pose
+
+# index: capture sequence number, timestamp: capture time in seconds (time.monotonic() when read from a
+# camera, the frame's position in the stream for video files). Kinematics use timestamps, never frame counts.
+Frame = namedtuple("Frame", ["index", "timestamp", "image"])
+
+_STOP = object()
+
+# control API command -> keyboard key it stands in for
+COMMAND_KEYS = {"set": "s", "reset": "r", "calibrate": "c"}
+
+INFERENCE_BUCKETS = (0.005, 0.01, 0.02, 0.03, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0)
+FPS_SMOOTHING = 0.1
+
+
+def put_latest(q, item, on_drop=None, limit=None):
+    """
+    Put item on a bounded queue, dropping the oldest entries if it is full. Returns the number dropped.
+    on_drop(entry) is called for every dropped entry. limit bounds the queue below its maxsize.
+    """
+    dropped = 0
+    while True:
+        try:
+            if limit is not None and q.qsize() >= limit:
+                raise queue.Full
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                entry = q.get_nowait()
+                dropped += 1
+                if on_drop is not None:
+                    on_drop(entry)
+            except queue.Empty:
+                pass
+
+
+class Detector:
+    """
+    Base class for the per-test logic driven by the pipeline.
+
+    test names the results_server.py namespace the detector posts under.
+
+    process() runs on the inference thread for every inferred frame and returns a
+    list of (path, payload) posts for the results server. Paths listed in
+    state_paths are coalesced to their latest value; everything else is an event.
+    draw() and bind_window() run on the render thread; handle_key() is marshalled
+    onto the inference thread, as is handle_command() for the control API.
+    bind_window() gets the pipeline's submit so window callbacks can do the same.
+    in_attempt() tells the adaptive scheduler when every
+    frame matters; the default keeps pose at full rate.
+
+    Detectors with a results_csv get a ResultsWriter; result_rows() turns the posts
+    of one frame into CSV rows (without the leading timestamp column).
+
+    set_calibration() hands over the camera's Calibration; detectors measuring in cm
+    name their calibration_plane and convert pixels with self.plane.to_cm().
+
+    target_fps is the inference rate --autotune aims for.
+
+    needs_pose() lets a detector that follows something cheaper than the pose (the
+    medicine ball) skip pose inference on frames it does not need one; process()
+    then gets lm=None. Detectors with image_tracking read the pixels themselves;
+    replays of landmark recordings, which hold no pixels, switch it off.
+
+    capture_backlog is how many captured frames may wait for inference. The default
+    keeps only the latest; a detector that must see every frame (tracking between
+    pose frames) raises it so frames queue up while pose runs.
+    """
+    test = None
+    draw_landmarks = True
+    state_paths = ()
+    results_csv = None
+    results_header = ()
+    calibration_plane = None
+    plane = PlaneMap()
+    target_fps = 30.0
+    image_tracking = False
+    capture_backlog = 1
+
+    def process(self, lm, frame):
+        return []
+
+    def result_rows(self, posts):
+        return []
+
+    def draw(self, vis_frame):
+        pass
+
+    def handle_key(self, key):
+        pass
+
+    def handle_command(self, command, data):
+        if command in COMMAND_KEYS:
+            self.handle_key(ord(COMMAND_KEYS[command]))
+
+    def in_attempt(self):
+        return True
+
+    def needs_pose(self):
+        return True
+
+    def set_calibration(self, calibration, offset=(0, 0)):
+        """offset is the top-left corner of the detector's crop in the full frame."""
+        if self.calibration_plane is not None:
+            self.plane = calibration.plane(self.calibration_plane).shifted(*offset)
+
+    def bind_window(self, window_name, submit):
+        pass
+
+
+class FramePipeline:
+    """
+    Three-stage capture/inference/render pipeline joined by latest-wins queues.
+
+    With render=None the pipeline is headless: inference results are not queued
+    and run() just waits for the stream to end or stop() to be called.
+    media_time stamps frames with their position in the stream (video files).
+    capture_backlog sizes the capture queue separately (default queue_size); it
+    can be changed while running (station.py switching tests).
+
+    With a CaptureProcess instead of cap, frames are views into its shared-memory
+    ring. Each one stays pinned until render is done with it (inference when
+    headless) or a latest-wins queue drops it.
+    """
+
+    def __init__(self, cap, infer, render, queue_size=1, media_time=False, capture_backlog=None, capture=None):
+        self.cap = cap
+        self.capture = capture
+        self.media_time = media_time
+        self.infer = infer
+        self.render = render
+        self.capture_backlog = capture_backlog or queue_size
+        self.capture_q = queue.Queue()
+        self.output_q = queue.Queue(maxsize=queue_size)
+        self.commands = queue.Queue()
+        self.stop_event = threading.Event()
+        self.captured = 0
+        self.dropped = 0
+        self.ended = False  # the camera failed or the video ran out (rather than stop() or 'q')
+
+    def submit(self, fn, *args):
+        """Run fn(*args) on the inference thread between frames."""
+        self.commands.put((fn, args))
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _capture_loop(self):
+        index = 0
+        while not self.stop_event.is_set():
+            ret, image = self.cap.read()
+            if not ret:
+                print("Camera read failed. Exiting.")
+                self.ended = True
+                break
+            timestamp = media_timestamp(self.cap) if self.media_time else time.monotonic()
+            self.dropped += put_latest(self.capture_q, Frame(index, timestamp, image), limit=self.capture_backlog)
+            self.captured += 1
+            index += 1
+        put_latest(self.capture_q, _STOP)
+
+    def _ring_loop(self):
+        ring = self.capture.ring
+        seq = EMPTY
+        while not self.stop_event.is_set():
+            # a detector that needs every frame gets them in order rather than just the newest
+            taken = ring.acquire(seq, self.capture_backlog > 1, timeout=0.1)
+            if taken is None:
+                if ring.closed():
+                    self.ended = True
+                    break
+                continue
+            skipped = taken[0] - seq - 1 if seq != EMPTY else 0
+            seq, timestamp, image = taken
+            self.dropped += skipped + put_latest(self.capture_q, Frame(seq, timestamp, image), self._release,
+                                                 self.capture_backlog)
+            self.captured = self.capture.captured.value
+        self.captured = self.capture.captured.value
+        self.dropped += self.capture.dropped.value
+        put_latest(self.capture_q, _STOP)
+
+    def _release(self, item):
+        """Give a frame's ring slot back to the capture process; item is a Frame or (Frame, results)."""
+        if self.capture is None or item is _STOP:
+            return
+        frame = item if isinstance(item, Frame) else item[0]
+        self.capture.ring.release(frame.index)
+
+    def _run_commands(self):
+        while True:
+            try:
+                fn, args = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                fn(*args)
+            except Exception as e:
+                # a bad key or control request must not take the inference thread down
+                print(f"WARNING: {getattr(fn, '__name__', fn)} failed: {e!r}")
+
+    def _inference_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                frame = self.capture_q.get(timeout=0.1)
+            except queue.Empty:
+                self._run_commands()
+                continue
+            self._run_commands()
+            if frame is _STOP:
+                break
+            results = self.infer(frame)
+            if self.render is not None:
+                self.dropped += put_latest(self.output_q, (frame, results), self._release)
+            else:
+                self._release(frame)
+        put_latest(self.output_q, _STOP)
+
+    def run(self):
+        """Start capture and inference threads and render on the calling thread until stopped."""
+        if self.capture is not None:
+            self.capture.start()
+        capture_thread = threading.Thread(target=self._ring_loop if self.capture is not None else self._capture_loop,
+                                          daemon=True)
+        inference_thread = threading.Thread(target=self._inference_loop, daemon=True)
+        capture_thread.start()
+        inference_thread.start()
+        try:
+            if self.render is None:
+                while inference_thread.is_alive():
+                    inference_thread.join(timeout=0.5)
+                return
+            while not self.stop_event.is_set():
+                try:
+                    item = self.output_q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _STOP:
+                    break
+                frame, results = item
+                keep_going = self.render(frame, results)
+                self._release(item)
+                if keep_going is False:
+                    break
+        finally:
+            self.stop_event.set()
+            inference_thread.join(timeout=2.0)
+            capture_thread.join(timeout=2.0)
+            if self.capture is not None:
+                if inference_thread.is_alive() or capture_thread.is_alive():
+                    # e.g. autotune loading a new model: the ring must stay mapped while a thread can read a slot
+                    print("Waiting for the inference thread before closing the frame ring...")
+                    inference_thread.join()
+                    capture_thread.join()
+                self.capture.stop()
+
+
+class TrackerMetrics:
+    """Throughput metrics for one tracker, exported with --metrics-port."""
+
+    def __init__(self, test, station):
+        self.registry = Registry({"test": test, "station": station})
+        r = self.registry
+        self.inferred = 0
+        self.detected = 0
+        self.fps = 0.0
+        self._last_timestamp = None
+        self.frames_total = r.counter("tracker_frames_inferred_total", "Frames run through pose inference")
+        self.detected_total = r.counter("tracker_pose_detected_total", "Inferred frames in which a pose was found")
+        self.inference_seconds = r.histogram("tracker_inference_seconds", "Pose inference latency",
+                                             buckets=INFERENCE_BUCKETS)
+        r.gauge("tracker_fps", "Inferred frames per second (smoothed)", function=lambda: self.fps)
+        r.gauge("tracker_pose_hit_rate", "Fraction of inferred frames with a detected pose",
+                function=lambda: self.detected / self.inferred if self.inferred else 0.0)
+
+    def bind(self, pipeline, telemetry):
+        r = self.registry
+        r.gauge("tracker_frames_captured", "Frames read from the camera", function=lambda: pipeline.captured)
+        r.gauge("tracker_frames_dropped", "Frames dropped by the latest-wins queues", function=lambda: pipeline.dropped)
+        r.gauge("tracker_telemetry_queue_depth", "Results waiting to be sent to the server",
+                function=telemetry.queue_depth)
+
+    def observe(self, frame, seconds, detected):
+        self.inferred += 1
+        self.frames_total.inc()
+        self.inference_seconds.observe(seconds)
+        if detected:
+            self.detected += 1
+            self.detected_total.inc()
+        if self._last_timestamp is not None and frame.timestamp > self._last_timestamp:
+            rate = 1.0 / (frame.timestamp - self._last_timestamp)
+            self.fps = rate if self.fps == 0.0 else FPS_SMOOTHING * rate + (1.0 - FPS_SMOOTHING) * self.fps
+        self._last_timestamp = frame.timestamp
+
+
+def open_capture(source=0, frame_size=(FRAME_WIDTH, FRAME_HEIGHT), fps=None):
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        print("ERROR: Camera could not be opened.")
+        return None
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, frame_size[0])
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, frame_size[1])
+    if fps and not isinstance(source, str):
+        cap.set(cv2.CAP_PROP_FPS, fps)
+        actual = cap.get(cv2.CAP_PROP_FPS)
+        if actual and actual < fps:
+            print(f"WARNING: camera gives {actual:.0f} FPS, not the {fps:.0f} asked for.")
+    return cap
+
+
+def send_posts(telemetry, detector, posts):
+    for path, payload in posts:
+        if path in detector.state_paths:
+            telemetry.state(path, payload)
+        else:
+            telemetry.event(path, payload)
+
+
+def results_writer(detector, tag=None):
+    """A ResultsWriter for the detector's results_csv, or None if it has none."""
+    if detector.results_csv is None:
+        return None
+    return ResultsWriter(detector.results_csv, ["timestamp"] + list(detector.results_header), tag)
+
+
+def write_results(writer, detector, posts):
+    if writer is None or not posts:
+        return
+    rows = detector.result_rows(posts)
+    if rows:
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        for row in rows:
+            writer.write([stamp] + list(row))
+
+
+def station_url(test, station=STATION_ID, server=SERVER_URL):
+    return f"{server}/{test}/{station}"
+
+
+def tracker_arg_parser(description=None):
+    """Command-line options shared by every tracker script."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--source", default="0", help="camera index or video file (default: camera 0)")
+    parser.add_argument("--station", default=STATION_ID, help="station id used on the results server")
+    parser.add_argument("--server", default=SERVER_URL, help=f"results server URL (default {SERVER_URL})")
+    parser.add_argument("--record", metavar="PATH", help="save every frame's pose landmarks to PATH for replay")
+    parser.add_argument("--roi", action="store_true",
+                        help="run pose on a crop around the athlete instead of the full frame")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="lower the pose rate while idle and nothing moves")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus-style /metrics on this port")
+    parser.add_argument("--headless", action="store_true",
+                        help="no window or overlay drawing; control the station through the control API")
+    parser.add_argument("--control-port", type=int,
+                        help=f"serve the control API on this port (default {CONTROL_PORT} when headless)")
+    parser.add_argument("--calibration", metavar="PATH",
+                        help="camera calibration file (default calibration/<station>.json)")
+    parser.add_argument("--autotune", action="store_true",
+                        help="pick pose model complexity and resolution to reach the test's target FPS")
+    parser.add_argument("--target-fps", type=float, help="FPS target for --autotune (default: per test)")
+    parser.add_argument("--capture-fps", type=float, help="frame rate to ask of the camera (e.g. 120)")
+    parser.add_argument("--capture-process", action="store_true",
+                        help="read and decode the camera in a separate process, sharing frames through shared memory")
+    parser.add_argument("--lanes", type=int, help="split the frame into this many vertical lanes, one athlete each")
+    parser.add_argument("--lane-box", action="append", metavar="X0,Y0,X1,Y1",
+                        help="explicit lane box in normalized coordinates (repeat per lane)")
+    return parser
+
+
+def parse_source(source):
+    return int(source) if str(source).isdigit() else source
+
+
+def load_calibration(options, frame_size):
+    """The camera's Calibration for these options, checked against the capture size."""
+    calibration = Calibration.load(options.calibration or calibration_path(options.station))
+    calibration.check_size(frame_size)
+    return calibration
+
+
+def media_timestamp(cap):
+    """Stream position in seconds of the frame cap.read() just returned."""
+    return cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+
+
+def is_video_file(source):
+    return isinstance(parse_source(source), str)
+
+
+def capture_size(cap):
+    return int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+
+class PoseModels:
+    """MediaPipe Pose instances by model complexity, created on first use."""
+
+    def __init__(self):
+        self.models = {}
+
+    def get(self, complexity):
+        pose = self.models.get(complexity)
+        if pose is None:
+            pose = self.models[complexity] = mp_pose.Pose(
+                model_complexity=complexity, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+        return pose
+
+    def close(self):
+        for pose in self.models.values():
+            pose.close()
+        self.models.clear()
+
+
+def pose_estimator(pose, roi=False, scale=1.0):
+    """
+    Return a function mapping a BGR frame to MediaPipe pose results (full-frame coordinates).
+
+    scale < 1 shrinks the image pose sees; landmarks are normalized, so callers see no difference.
+    """
+    if roi:
+        process = RoiPose(pose).process
+    else:
+        to_rgb = RgbConverter()
+
+        def process(image):
+            return pose.process(to_rgb(image))
+    if scale >= 1.0:
+        return process
+    small = None
+
+    def estimate(image):
+        nonlocal small
+        h, w = image.shape[:2]
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        if small is None or small.shape[:2] != (size[1], size[0]):
+            small = np.empty((size[1], size[0], 3), np.uint8)
+        return process(cv2.resize(image, size, dst=small, interpolation=cv2.INTER_AREA))
+    return estimate
+
+
+def frame_pipeline(cap, infer, render, options, capture_backlog=1):
+    """
+    The FramePipeline for a tracker's options: cap read on a thread, or with --capture-process
+    reopened in a CaptureProcess at its current size (cap itself is released).
+    """
+    media_time = is_video_file(options.source)
+    capture = None
+    if options.capture_process:
+        capture = CaptureProcess(parse_source(options.source), capture_size(cap), options.capture_fps, media_time,
+                                 max(RING_SLOTS, capture_backlog + 4))
+        # a camera can only be opened by one process
+        cap.release()
+        cap = None
+    return FramePipeline(cap, infer, render, media_time=media_time, capture_backlog=capture_backlog,
+                         capture=capture)
+
+
+def start_autotune(detector, options, cap, frame_size, build):
+    """An AutoTuner for the detector's FPS target, already tuned on cap; returns (tuner, estimate)."""
+    tuner = AutoTuner(options.target_fps or detector.target_fps, build, frame_size)
+    return tuner, tuner.tune(cap, live=not is_video_file(options.source))
+
+
+def run_tracker(detector, window_name, frame_size=(FRAME_WIDTH, FRAME_HEIGHT), options=None):
+    """
+    Open the camera and drive a Detector through the pipeline, with an OpenCV window unless headless.
+    Returns True when the camera could not be opened or read, or the video ended; run_lanes and
+    run_tests do the same.
+    """
+    if options is None:
+        options = tracker_arg_parser().parse_args([])
+    if (options.lanes or 0) > 1 or options.lane_box:
+        from lanes import run_lanes
+        return run_lanes(detector, window_name, frame_size, options)
+    cap = open_capture(parse_source(options.source), frame_size, options.capture_fps)
+    if cap is None:
+        return True
+
+    if not options.headless:
+        cv2.namedWindow(window_name)
+    models = PoseModels()
+
+    def build(level):
+        return pose_estimator(models.get(level.complexity), options.roi, level.scale)
+
+    tuner = None
+    if options.autotune:
+        tuner, estimate = start_autotune(detector, options, cap, frame_size, build)
+    else:
+        estimate = build(DEFAULT_LEVEL)
+    actual_size = capture_size(cap)
+    detector.set_calibration(load_calibration(options, actual_size))
+    telemetry = TelemetryClient(station_url(detector.test, options.station, options.server))
+    recorder = None
+    if options.record:
+        recorder = LandmarkRecorder(options.record, actual_size)
+    metrics = TrackerMetrics(detector.test, options.station)
+    writer = results_writer(detector, options.station)
+
+    scheduler = AdaptiveScheduler() if options.adaptive else None
+    if tuner is not None:
+        tuner.register(metrics.registry)
+
+    try:
+        def infer(frame):
+            nonlocal estimate
+            if scheduler is not None and not scheduler.should_infer(frame, detector):
+                return None
+            start = time.perf_counter()
+            results = estimate(frame.image) if detector.needs_pose() else None
+            pose_landmarks = results.pose_landmarks if results is not None else None
+            if results is not None:
+                # frames the detector handled without pose (flow, ball) are not pose inferences
+                metrics.observe(frame, time.perf_counter() - start, pose_landmarks is not None)
+            if recorder is not None:
+                recorder.write(frame, pose_landmarks)
+            lm = pose_landmarks.landmark if pose_landmarks else None
+            posts = detector.process(lm, frame)
+            send_posts(telemetry, detector, posts)
+            write_results(writer, detector, posts)
+            if tuner is not None and results is not None:
+                tuner.observe(time.perf_counter() - start)
+                estimate = tuner.adjust(frame.timestamp, detector.in_attempt()) or estimate
+            return results
+
+        def render(frame, results):
+            vis_frame = frame.image
+            if detector.draw_landmarks and results is not None and results.pose_landmarks:
+                mp_drawing.draw_landmarks(vis_frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
+            detector.draw(vis_frame)
+            cv2.imshow(window_name, vis_frame)
+
+            key = cv2.waitKey(5)
+            if key == -1:
+                return True
+            key &= 0xFF
+            if key == ord('q'):
+                return False
+            pipeline.submit(detector.handle_key, key)
+            return True
+
+        def dispatch(command, data):
+            if command == "quit":
+                pipeline.stop()
+            else:
+                pipeline.submit(detector.handle_command, command, data)
+
+        pipeline = frame_pipeline(cap, infer, None if options.headless else render, options, detector.capture_backlog)
+        if not options.headless:
+            detector.bind_window(window_name, pipeline.submit)
+        metrics.bind(pipeline, telemetry)
+        servers = []
+        if options.metrics_port:
+            servers.append(start_metrics_server(metrics.registry, options.metrics_port))
+        control_port = options.control_port or (CONTROL_PORT if options.headless else None)
+        if control_port:
+            servers.append(start_control_server(dispatch, control_port))
+        try:
+            pipeline.run()
+        except KeyboardInterrupt:
+            pipeline.stop()
+        for server in servers:
+            server.shutdown()
+    finally:
+        models.close()
+        # flush queued results even if the pipeline or a detector raised
+        telemetry.close()
+        if writer is not None:
+            writer.close()
+
+    if scheduler is not None:
+        print(scheduler.summary())
+    if tuner is not None:
+        print(tuner.summary())
+    if recorder is not None:
+        recorder.close()
+    cap.release()
+    if not options.headless:
+        cv2.destroyAllWindows()
+    return pipeline.ended
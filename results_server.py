@@ -0,0 +1,513 @@
+"""
+results_server.py
+One Flask server for every fitness test and station.
+
+Replaces the per-test apps (app.py .. app4.py). State is namespaced as
+test -> station -> athlete, so any number of trackers can post to the same
+process on port 5000:
+
+ - GET  /<test>/<station>/            dashboard page (live via SSE)
+ - GET  /<test>/<station>/status      current athlete's state (?athlete=ID for another)
+ - GET  /<test>/<station>/stream      Server-Sent Events feed of state changes
+ - POST /<test>/<station>/increment   a rep / jump / throw (?athlete=ID optional)
+ - POST /<test>/<station>/update_reach  live sit-and-reach values
+ - POST /<test>/<station>/athlete     {"athlete": ID, "name": .., "age_group": ..} selects the current athlete
+ - GET  /results/<test>/best          each athlete's best attempt (?session=ID to limit to one session)
+ - GET  /results/session/<session>    every attempt of a session (?test=NAME optional)
+ - GET  /leaderboard/<test>           top athletes and percentiles (?n=10&age_group=U14)
+ - GET  /leaderboard/<test>/<athlete> one athlete's best, rank and percentile
+ - GET  /metrics                      request rates, latencies and viewer counts (Prometheus text format)
+
+Each station has its own lock, so posts from different stations never contend
+and concurrent posts to one station are applied atomically.
+
+Every attempt is also written to an SQLite database (store.py, --db). /status is
+always answered from the in-memory station state; on startup that state is
+rebuilt from the database for the current session (--session, default today).
+Leaderboards (leaderboard.py) are updated on every increment, never recomputed.
+"""
+
+import argparse
+import math
+import threading
+import time
+
+from flask import Flask, Response, render_template_string, request, jsonify, abort, g
+
+from broadcast import Broadcaster
+from leaderboard import Leaderboards
+from metrics import CONTENT_TYPE, Registry
+from store import DB_PATH, ResultsStore
+
+DEFAULT_ATHLETE = "default"
+
+app = Flask(__name__)
+
+registry = Registry()
+requests_total = registry.counter("results_requests_total", "HTTP requests handled",
+                                  ["endpoint", "method", "status"])
+request_seconds = registry.histogram("results_request_seconds", "Request latency for /status and /increment",
+                                     ["endpoint"])
+TIMED_ENDPOINTS = ("status", "increment")
+
+store = None  # ResultsStore, set in main(); None keeps everything in memory only
+leaderboards = Leaderboards()
+
+
+class SitAndReachState:
+    def __init__(self):
+        self.counter = 0
+        self.current_reach = 0.0
+        self.max_reach = 0.0
+
+    def increment(self, data):
+        self.counter += 1
+        if "reach_cm" in data and data["reach_cm"] > self.max_reach:
+            self.max_reach = data["reach_cm"]
+
+    def score(self, data):
+        return data.get("reach_cm")
+
+    def update_reach(self, data):
+        self.current_reach = data.get('current_reach', 0.0)
+        self.max_reach = data.get('max_reach', 0.0)
+
+    def snapshot(self):
+        return dict(counter=self.counter, current_reach=self.current_reach, max_reach=self.max_reach)
+
+
+class VerticalJumpState:
+    def __init__(self):
+        self.jump_count = 0
+        self.last_jump_height = 0.0
+        self.max_jump_height = 0.0
+
+    def increment(self, data):
+        self.jump_count += 1
+        if data and "jump_height" in data:
+            self.last_jump_height = data["jump_height"]
+            if self.last_jump_height > self.max_jump_height:
+                self.max_jump_height = self.last_jump_height
+
+    def score(self, data):
+        return data.get("jump_height")
+
+    def snapshot(self):
+        return dict(jump_count=self.jump_count, last_jump_height=self.last_jump_height,
+                    max_jump_height=self.max_jump_height)
+
+
+class SitUpState:
+    def __init__(self):
+        self.counter = 0
+
+    def increment(self, data):
+        self.counter += 1
+
+    def score(self, data):
+        # reps so far, so an athlete's best attempt is their rep total
+        return self.counter
+
+    def snapshot(self):
+        return dict(counter=self.counter)
+
+
+class BroadJumpState:
+    def __init__(self):
+        self.jump_count = 0
+        self.last_jump_distance = 0.0
+        self.max_jump_distance = 0.0
+
+    def increment(self, data):
+        self.jump_count += 1
+        if data and "jump_height" in data:
+            self.last_jump_distance = data["jump_height"]
+            if self.last_jump_distance > self.max_jump_distance:
+                self.max_jump_distance = self.last_jump_distance
+
+    def score(self, data):
+        return data.get("jump_height")
+
+    def snapshot(self):
+        return dict(jump_count=self.jump_count, last_jump_distance=self.last_jump_distance,
+                    max_jump_distance=self.max_jump_distance)
+
+
+class MedicineBallState:
+    def __init__(self):
+        self.throw_count = 0
+        self.last_metrics = {
+            "flight_time": 0.0,
+            "range_cm": 0.0,
+            "vx": 0.0,
+            "vy": 0.0,
+            "v": 0.0,
+            "angle_deg": 0.0,
+            "score": 0
+        }
+
+    def increment(self, data):
+        self.throw_count += 1
+        if data:
+            for key in self.last_metrics:
+                if key in data:
+                    self.last_metrics[key] = data[key]
+
+    def score(self, data):
+        return data.get("range_cm")
+
+    def snapshot(self):
+        return dict(throw_count=self.throw_count, last_metrics=dict(self.last_metrics))
+
+
+# test name -> (page title, state class, dashboard fields as (label, state key, decimals, unit))
+TESTS = {
+    "sit_and_reach": ("Sit and Reach Counter", SitAndReachState, [
+        ("Successful Attempts", "counter", None, ""),
+        ("Current Reach", "current_reach", None, "cm"),
+        ("Max Reach", "max_reach", None, "cm"),
+    ]),
+    "vertical_jump": ("Vertical Jump Counter", VerticalJumpState, [
+        ("Jump Count", "jump_count", None, ""),
+        ("Last Jump Height", "last_jump_height", 2, "cm"),
+        ("Highest Jump", "max_jump_height", 2, "cm"),
+    ]),
+    "sit_ups": ("Sit-up Counter", SitUpState, [
+        ("Successful Sit-ups", "counter", None, ""),
+    ]),
+    "broad_jump": ("Broad Jump Counter", BroadJumpState, [
+        ("Jump Count", "jump_count", None, ""),
+        ("Last Jump Distance", "last_jump_distance", 2, "cm"),
+        ("Highest Jump", "max_jump_distance", 2, "cm"),
+    ]),
+    "medicine_ball": ("Medicine Ball Throw Metrics", MedicineBallState, [
+        ("Throw Count", "throw_count", None, ""),
+        ("Flight Time", "last_metrics.flight_time", 2, "s"),
+        ("Range", "last_metrics.range_cm", 2, "cm"),
+        ("Vx", "last_metrics.vx", 2, "cm/s"),
+        ("Vy", "last_metrics.vy", 2, "cm/s"),
+        ("Speed", "last_metrics.v", 2, "cm/s"),
+        ("Release Angle", "last_metrics.angle_deg", 2, "°"),
+        ("Score", "last_metrics.score", None, ""),
+    ]),
+}
+
+
+class Station:
+    """All athletes' state for one test at one station, guarded by a single lock."""
+
+    def __init__(self, test, station_id):
+        self.test = test
+        self.station_id = station_id
+        self.state_cls = TESTS[test][1]
+        self.lock = threading.Lock()
+        self.athletes = {}
+        self.current_athlete = DEFAULT_ATHLETE
+        self.last_seq = {}  # telemetry client id -> last applied event sequence number
+        self.broadcaster = Broadcaster()
+
+    def _snapshot(self, athlete):
+        state = self.athletes.get(athlete)
+        if state is None:
+            state = self.state_cls()
+        snap = state.snapshot()
+        snap.update(test=self.test, station=self.station_id, athlete=athlete)
+        return snap
+
+    def status(self, athlete=None):
+        with self.lock:
+            return self._snapshot(athlete or self.current_athlete)
+
+    def apply(self, action, data, athlete=None, client=None, seq=None):
+        with self.lock:
+            if client is not None and seq is not None:
+                # Telemetry retries an event until acknowledged; skip ones already applied
+                if seq <= self.last_seq.get(client, 0):
+                    return
+                self.last_seq[client] = seq
+            athlete = athlete or self.current_athlete
+            state = self.athletes.get(athlete)
+            if state is None:
+                state = self.athletes[athlete] = self.state_cls()
+            data = data or {}
+            getattr(state, action)(data)
+            if action == "increment":
+                score = state.score(data)
+                leaderboards.record(self.test, athlete, score)
+                if store is not None:
+                    store.add_attempt(self.test, self.station_id, athlete, score, data, client, seq)
+            self.current_athlete = athlete
+            self.broadcaster.publish(self._snapshot(athlete))
+
+    def restore(self, athlete, data, client, seq):
+        """Re-apply a stored attempt at startup."""
+        state = self.athletes.get(athlete)
+        if state is None:
+            state = self.athletes[athlete] = self.state_cls()
+        state.increment(data)
+        leaderboards.record(self.test, athlete, state.score(data))
+        self.current_athlete = athlete
+        if client is not None and seq is not None:
+            self.last_seq[client] = max(seq, self.last_seq.get(client, 0))
+
+    def select_athlete(self, athlete):
+        with self.lock:
+            self.current_athlete = athlete
+            self.broadcaster.publish(self._snapshot(athlete))
+
+
+_stations = {}
+_stations_lock = threading.Lock()
+
+
+def viewer_count():
+    with _stations_lock:
+        stations = list(_stations.values())
+    return sum(station.broadcaster.viewer_count() for station in stations)
+
+
+registry.gauge("results_connected_viewers", "Dashboards connected to a /stream feed", function=viewer_count)
+registry.gauge("results_stations", "Stations that have been seen", function=lambda: len(_stations))
+
+
+def get_station(test, station_id):
+    if test not in TESTS:
+        abort(404)
+    return _station(test, station_id)
+
+
+def _station(test, station_id):
+    key = (test, station_id)
+    station = _stations.get(key)
+    if station is None:
+        with _stations_lock:
+            station = _stations.get(key)
+            if station is None:
+                station = _stations[key] = Station(test, station_id)
+    return station
+
+
+INDEX_HTML = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>Fitness Test Stations</title>
+    <link rel="stylesheet" href="/static/style.css">
+</head>
+<body>
+    <div class="container">
+        <h1>Stations</h1>
+        {% for test, station in stations %}
+        <p><a href="/{{ test }}/{{ station }}/">{{ titles[test] }} &mdash; {{ station }}</a></p>
+        {% else %}
+        <p>No station has reported yet.</p>
+        {% endfor %}
+    </div>
+</body>
+</html>
+"""
+
+DASHBOARD_HTML = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>{{ title }}</title>
+    <link rel="stylesheet" href="/static/style.css">
+</head>
+<body>
+    <div class="container">
+        <h1>{{ title }}</h1>
+        <p>Station {{ state.station }} &middot; Athlete <span id="athlete">{{ state.athlete }}</span></p>
+        {% for label, key, decimals, unit in fields %}
+        <p>{{ label }}: <span data-key="{{ key }}" data-decimals="{{ '' if decimals is none else decimals }}">{{ lookup(state, key, decimals) }}</span> {{ unit }}</p>
+        {% endfor %}
+    </div>
+    <script>
+        new EventSource('{{ base }}/stream').onmessage = function(e) {
+            const data = JSON.parse(e.data);
+            document.getElementById("athlete").textContent = data.athlete;
+            document.querySelectorAll("span[data-key]").forEach(function(el) {
+                const value = el.dataset.key.split('.').reduce((o, k) => o[k], data);
+                el.textContent = el.dataset.decimals === "" ? value : Number(value).toFixed(Number(el.dataset.decimals));
+            });
+        };
+    </script>
+</body>
+</html>
+"""
+
+
+def lookup(state, key, decimals):
+    value = state
+    for part in key.split('.'):
+        value = value[part]
+    return value if decimals is None else '{:.{}f}'.format(value, decimals)
+
+
+def _telemetry_seq():
+    client = request.headers.get("X-Telemetry-Client")
+    seq = request.headers.get("X-Telemetry-Seq")
+    if client is None or seq is None:
+        return None, None
+    if not seq.isdigit():
+        abort(400)
+    return client, int(seq)
+
+
+def _payload():
+    """The posted JSON object (None without one); 400 unless every value is a finite number."""
+    data = request.get_json(silent=True)
+    if data is None:
+        return None
+    if not isinstance(data, dict):
+        abort(400)
+    for value in data.values():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            abort(400)
+    return data
+
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response):
+    endpoint = request.endpoint or "unknown"
+    requests_total.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+    if endpoint in TIMED_ENDPOINTS:
+        request_seconds.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+@app.route('/')
+def index():
+    with _stations_lock:
+        stations = sorted(_stations)
+    titles = {test: spec[0] for test, spec in TESTS.items()}
+    return render_template_string(INDEX_HTML, stations=stations, titles=titles)
+
+
+@app.route('/<test>/<station_id>/')
+def dashboard(test, station_id):
+    station = get_station(test, station_id)
+    title, _, fields = TESTS[test]
+    return render_template_string(DASHBOARD_HTML, title=title, fields=fields, lookup=lookup,
+                                  state=station.status(), base=f"/{test}/{station_id}")
+
+
+@app.route('/<test>/<station_id>/status')
+def status(test, station_id):
+    station = get_station(test, station_id)
+    return jsonify(station.status(request.args.get('athlete')))
+
+
+@app.route('/<test>/<station_id>/stream')
+def stream(test, station_id):
+    return get_station(test, station_id).broadcaster.stream()
+
+
+@app.route('/<test>/<station_id>/increment', methods=['POST'])
+def increment(test, station_id):
+    station = get_station(test, station_id)
+    client, seq = _telemetry_seq()
+    station.apply('increment', _payload(), request.args.get('athlete'), client, seq)
+    return jsonify(success=True)
+
+
+@app.route('/<test>/<station_id>/update_reach', methods=['POST'])
+def update_reach(test, station_id):
+    station = get_station(test, station_id)
+    if not hasattr(station.state_cls, 'update_reach'):
+        abort(404)
+    station.apply('update_reach', _payload(), request.args.get('athlete'))
+    return jsonify(success=True)
+
+
+@app.route('/<test>/<station_id>/athlete', methods=['POST'])
+def select_athlete(test, station_id):
+    station = get_station(test, station_id)
+    data = request.get_json(silent=True) or {}
+    athlete = data.get('athlete')
+    if not athlete:
+        abort(400)
+    station.select_athlete(str(athlete))
+    if data.get('age_group'):
+        leaderboards.set_age_group(str(athlete), str(data['age_group']))
+    if store is not None and (data.get('name') or data.get('age_group')):
+        store.set_athlete(str(athlete), data.get('name'), data.get('age_group'))
+    return jsonify(success=True)
+
+
+@app.route('/results/<test>/best')
+def best_attempts(test):
+    if test not in TESTS or store is None:
+        abort(404)
+    return jsonify(store.best_attempts(test, request.args.get('session')))
+
+
+@app.route('/results/session/<session_id>')
+def session_attempts(session_id):
+    if store is None:
+        abort(404)
+    return jsonify(store.session_attempts(session_id, request.args.get('test')))
+
+
+@app.route('/leaderboard/<test>')
+def leaderboard(test):
+    if test not in TESTS:
+        abort(404)
+    n = request.args.get('n', 10, type=int)
+    return jsonify(leaderboards.leaderboard(test, n, request.args.get('age_group')))
+
+
+@app.route('/leaderboard/<test>/<athlete>')
+def standing(test, athlete):
+    if test not in TESTS:
+        abort(404)
+    result = leaderboards.standing(test, athlete)
+    if result is None:
+        abort(404)
+    return jsonify(result)
+
+
+def restore_session(results_store):
+    """Rebuild the in-memory station state and leaderboards from the session's stored attempts."""
+    for athlete in results_store.athletes():
+        if athlete["age_group"]:
+            leaderboards.set_age_group(athlete["athlete"], athlete["age_group"])
+    attempts = results_store.load_session()
+    for test, station_id, athlete, data, client, seq in attempts:
+        if test in TESTS:
+            _station(test, station_id).restore(athlete, data, client, seq)
+    print(f"Restored {len(attempts)} attempts from session {results_store.session_id}")
+
+
+def main(argv=None):
+    global store
+    parser = argparse.ArgumentParser(description="Results server for every test and station.")
+    parser.add_argument("--db", default=DB_PATH, help=f"SQLite database file (default {DB_PATH})")
+    parser.add_argument("--session", help="session id attempts are recorded under (default: today's date)")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--debug", action="store_true",
+                        help="Flask debug mode (interactive debugger; never on a network other machines reach)")
+    args = parser.parse_args(argv)
+
+    store = ResultsStore(args.db, args.session)
+    restore_session(store)
+    try:
+        app.run(port=args.port, debug=args.debug, threaded=True, use_reloader=False)
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
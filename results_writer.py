@@ -0,0 +1,110 @@
+"""
+results_writer.py
+Buffered, append-only CSV writer for tracker results.
+
+write() only appends a row to an in-memory buffer; a background thread writes
+buffered rows in one batch every FLUSH_SECONDS (or sooner once FLUSH_ROWS are
+waiting) and fsyncs, so the tracker loop never touches the disk. close() writes
+whatever is left; it also runs at interpreter exit as a safety net.
+
+Every session gets its own file next to the configured one, tagged with the
+station, e.g. situp_results.csv -> situp_results-gym2-20240511-093012.csv.
+Files are created exclusively and only ever appended to, so earlier sessions
+are never truncated; trackers starting in the same second take the next free
+suffix (-1, -2, ...).
+"""
+
+import atexit
+import csv
+import os
+import threading
+import time
+
+FLUSH_SECONDS = 2.0
+FLUSH_ROWS = 500
+
+
+def session_paths(path, tag=None):
+    """Candidate file names for this session derived from path, in order of preference."""
+    stem, ext = os.path.splitext(path)
+    if tag:
+        stem = f"{stem}-{tag}"
+    stem = f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}"
+    yield stem + ext
+    n = 1
+    while True:
+        yield f"{stem}-{n}{ext}"
+        n += 1
+
+
+def create_session_file(path, tag=None):
+    """Create this session's file exclusively: (path, file). Another process may take a name first."""
+    for candidate in session_paths(path, tag):
+        try:
+            return candidate, open(candidate, "x", newline="")
+        except FileExistsError:
+            continue
+
+
+class ResultsWriter:
+    def __init__(self, path, header, tag=None, flush_seconds=FLUSH_SECONDS):
+        self.path, self._file = create_session_file(path, tag)
+        self.flush_seconds = flush_seconds
+        self.rows_written = 0
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(header)
+        self._file.flush()
+
+        self._rows = []
+        self._cond = threading.Condition()
+        self._closing = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        print(f"Writing results to {self.path}")
+
+    def write(self, row):
+        """Queue one result row; never blocks on I/O."""
+        with self._cond:
+            self._rows.append(row)
+            if len(self._rows) >= FLUSH_ROWS:
+                self._cond.notify()
+
+    def close(self):
+        """Flush every buffered row and close the file."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closing = True
+            self._cond.notify()
+        self._thread.join()
+        self._file.close()
+        self._closed = True
+        atexit.unregister(self.close)
+
+    def _flush(self, rows):
+        self._csv.writerows(rows)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.rows_written += len(rows)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closing and len(self._rows) < FLUSH_ROWS:
+                    self._cond.wait(self.flush_seconds)
+                rows, self._rows = self._rows, []
+                closing = self._closing
+            if rows:
+                try:
+                    self._flush(rows)
+                except OSError as e:
+                    print(f"Could not write results to {self.path}:", e)
+                    with self._cond:
+                        self._rows[:0] = rows
+                    if not closing:
+                        time.sleep(self.flush_seconds)
+                        continue
+            if closing:
+                return
@@ -0,0 +1,115 @@
+"""
+roi.py
+Region-of-interest pose inference.
+
+RoiPose runs MediaPipe on a crop around the athlete instead of the full frame.
+The crop is the previous frame's landmark bounding box grown by ROI_MARGIN; the
+landmarks found in the crop are mapped back to full-frame normalized coordinates
+in place, so detectors and draw_landmarks see exactly what full-frame inference
+would give them. When the pose is lost inside the crop the same frame is re-run
+full-frame, and tracking restarts from there.
+
+The crop is only moved when the athlete leaves it or becomes much smaller than
+it, so MediaPipe's own frame-to-frame tracking sees a stable input. MediaPipe
+keeps its tracking box in the previous input's normalized coordinates, so the
+Pose is reset whenever the input changes geometry (the crop moves, or inference
+switches between crop and full frame) and detects afresh in the new input.
+"""
+
+from framering import RgbConverter
+
+ROI_MARGIN = 0.3            # grow the landmark box by this fraction of its longer side on every edge
+ROI_MIN_SIZE = 192          # px, never crop smaller than this
+ROI_MIN_VISIBILITY = 0.5    # landmarks used for the bounding box
+ROI_SHRINK_RATIO = 0.4      # re-crop when the athlete's box falls below this fraction of the crop area
+ROI_MAX_FRACTION = 0.8      # crops covering more of the frame than this run full-frame instead
+
+
+class RoiPose:
+    def __init__(self, pose, margin=ROI_MARGIN):
+        self.pose = pose
+        self.margin = margin
+        self.roi = None  # (x0, y0, x1, y1) in pixels
+        self.input_roi = None  # what the pose last ran on: a crop box, or None for the full frame
+        self.cropped_frames = 0
+        self.full_frames = 0
+        self.resets = 0
+        # separate buffers: the crop keeps its size while tracking, the full frame always does
+        self.crop_rgb = RgbConverter()
+        self.full_rgb = RgbConverter()
+
+    def process(self, image):
+        """Run pose on a BGR frame; returns MediaPipe results with full-frame landmarks."""
+        h, w = image.shape[:2]
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            self._switch_input(self.roi)
+            results = self.pose.process(self.crop_rgb(image[y0:y1, x0:x1]))
+            self.cropped_frames += 1
+            if results.pose_landmarks:
+                to_full_frame(results.pose_landmarks, self.roi, w, h)
+                self._update_roi(results.pose_landmarks, w, h)
+                return results
+            # Tracking lost: fall back to the whole frame
+            self.roi = None
+
+        self._switch_input(None)
+        results = self.pose.process(self.full_rgb(image))
+        self.full_frames += 1
+        if results.pose_landmarks:
+            self._update_roi(results.pose_landmarks, w, h)
+        return results
+
+    def _switch_input(self, roi):
+        # tracking from a differently framed input would start from a misplaced box
+        if roi != self.input_roi:
+            self.pose.reset()
+            self.resets += 1
+            self.input_roi = roi
+
+    def _update_roi(self, pose_landmarks, w, h):
+        box = landmark_box(pose_landmarks, w, h)
+        if box is None:
+            self.roi = None
+            return
+        bx0, by0, bx1, by1 = box
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            inside = bx0 >= x0 and by0 >= y0 and bx1 <= x1 and by1 <= y1
+            big_enough = (bx1 - bx0) * (by1 - by0) >= ROI_SHRINK_RATIO * (x1 - x0) * (y1 - y0)
+            if inside and big_enough:
+                return
+
+        pad = self.margin * max(bx1 - bx0, by1 - by0)
+        x0, y0, x1, y1 = bx0 - pad, by0 - pad, bx1 + pad, by1 + pad
+        # enforce a minimum crop size around the box centre
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        half_w = max(x1 - x0, ROI_MIN_SIZE) / 2
+        half_h = max(y1 - y0, ROI_MIN_SIZE) / 2
+        x0, x1 = max(0, int(cx - half_w)), min(w, int(cx + half_w))
+        y0, y1 = max(0, int(cy - half_h)), min(h, int(cy + half_h))
+        if x1 <= x0 or y1 <= y0 or (x1 - x0) * (y1 - y0) > ROI_MAX_FRACTION * w * h:
+            self.roi = None
+        else:
+            self.roi = (x0, y0, x1, y1)
+
+
+def landmark_box(pose_landmarks, w, h):
+    """Pixel bounding box (x0, y0, x1, y1) of the confidently visible landmarks."""
+    points = [(lm.x, lm.y) for lm in pose_landmarks.landmark if lm.visibility > ROI_MIN_VISIBILITY]
+    if not points:
+        return None
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return min(xs) * w, min(ys) * h, max(xs) * w, max(ys) * h
+
+
+def to_full_frame(pose_landmarks, roi, w, h):
+    """Map landmarks normalized to the crop back to full-frame normalized coordinates, in place."""
+    x0, y0, x1, y1 = roi
+    cw, ch = x1 - x0, y1 - y0
+    for lm in pose_landmarks.landmark:
+        lm.x = (lm.x * cw + x0) / w
+        lm.y = (lm.y * ch + y0) / h
+        # z uses the same scale as x
+        lm.z = lm.z * cw / w
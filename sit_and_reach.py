@@ -3,22 +3,28 @@ sit_and_reach.py
 Real-time Sit-and-Reach measurement using MediaPipe Pose + OpenCV.
 
 Controls:
- - 'c' : enter calibration mode (click two points on a known-length object on the displayed window)
+ - 'c' : enter calibration mode (click two points on a known-length object on the displayed window);
+         the result is saved to the camera's calibration file and loaded on the next start
  - 'r' : reset recorded max
  - 'q' : quit
+With --headless the same controls are POSTs to the control API (see control.py);
+calibration then takes the two points and their real-world length as JSON.
 
 Outputs:
  - on-screen: current reach (cm if calibrated), max reach
- - CSV: "sit_and_reach_results.csv" (timestamp, reach_px, reach_cm)
+ - CSV: "sit_and_reach_results-<session>.csv" (timestamp, reach_px_smoothed, reach_cm), one row per new max
 """
 
 import cv2
 import mediapipe as mp
 import numpy as np
+import threading
 import time
-import csv
 import webbrowser
-import requests
+
+import kernels
+from calibration import Calibration
+from pipeline import Detector, run_tracker, tracker_arg_parser
 
 # ---------- USER SETTINGS ----------
 SMOOTH_ALPHA = 0.6          # smoothing factor (0..1). Higher = more responsive, lower = smoother
@@ -31,20 +37,27 @@ FRAME_HEIGHT = 720
 mp_drawing = mp.solutions.drawing_utils
 mp_pose = mp.solutions.pose
 
+# Constraint parameters
+KNEE_LOCK_ANGLE = 165      # degrees, threshold for straight leg
+ANKLE_DIST_THRESHOLD = 0.05  # normalized, threshold for feet not sliding
+HIP_Y_THRESHOLD = 0.05     # normalized, threshold for hip lift
+WRIST_Y_DIFF_THRESHOLD = 0.05  # normalized, hands aligned
+HOLD_DURATION = 30         # frames (~1 sec at 30fps)
+
 # Globals used by mouse callback and main loop
-pixels_per_cm = None
 calibrating = False
 calib_points = []
 calib_frame = None
 counter_opened = False  # Add this at the top
+detector = None  # the detector the calibration clicks apply to
+submit = None  # queues a call onto the pipeline's inference thread
 
 def mouse_callback(event, x, y, flags, param):
     """
     Mouse callback used in calibration mode. User clicks two points on a known-length object.
     After two clicks we ask for the real-world length (cm) in the console and compute pixels/cm.
     """
-    global calib_points, calib_frame, pixels_per_cm, calibrating
-    if not calibrating:
+    if not calibrating or len(calib_points) == 2:
         return
     if event == cv2.EVENT_LBUTTONDOWN:
         calib_points.append((x, y))
@@ -56,249 +69,388 @@ def mouse_callback(event, x, y, flags, param):
             cv2.circle(frame_copy, calib_points[0], 5, (0,255,0), -1)
             cv2.circle(frame_copy, calib_points[1], 5, (0,255,0), -1)
             cv2.imshow(WINDOW_NAME, frame_copy)
-            # prompt for real-world length
-            while True:
-                try:
-                    val = float(input("Enter the real-world distance between the two clicked points (in cm): "))
-                    if val <= 0:
-                        print("Enter a positive number.")
-                        continue
-                    break
-                except Exception as e:
-                    print("Invalid input. Please enter a number (e.g. 20.0).")
             px = np.linalg.norm(np.array(calib_points[0]) - np.array(calib_points[1]))
-            pixels_per_cm = px / val
-            print(f"Calibration complete: {pixels_per_cm:.3f} pixels/cm")
-            calibrating = False
-            calib_points = []
+            # prompt off the render thread so the window keeps updating
+            threading.Thread(target=ask_length, args=(px,), daemon=True).start()
+
+def ask_length(px):
+    """Read the real-world length of the clicked line and queue the scale onto the inference thread."""
+    global calib_points, calibrating
+    while True:
+        try:
+            val = float(input("Enter the real-world distance between the two clicked points (in cm): "))
+            if not np.isfinite(val) or val <= 0:
+                print("Enter a positive number.")
+                continue
+            break
+        except Exception as e:
+            print("Invalid input. Please enter a number (e.g. 20.0).")
+    # calibrate_scale replaces the plane process() reads, so it must run on the inference thread
+    submit(detector.calibrate_scale, px / val)
+    calibrating = False
+    calib_points = []
+
+def angle(a, b, c):
+    # Returns angle at point b (in degrees)
+    return kernels.angle_deg(a.x - b.x, a.y - b.y, c.x - b.x, c.y - b.y)
 
 def landmark_to_pixel(landmark, w, h):
     """Convert MediaPipe normalized landmark to pixel coords (x,y)."""
     return int(landmark.x * w), int(landmark.y * h)
 
+def wrist_reach_cm(plane, wrist, ankle, w, h):
+    """Horizontal wrist-to-ankle distance on the calibrated plane (cm)."""
+    wrist_cm, _ = plane.to_cm(wrist.x * w, wrist.y * h)
+    ankle_cm, _ = plane.to_cm(ankle.x * w, ankle.y * h)
+    return abs(wrist_cm - ankle_cm)
+
+# toe/foot references in order of preference
+TOE_CANDIDATES = [
+    mp_pose.PoseLandmark.LEFT_FOOT_INDEX,
+    mp_pose.PoseLandmark.RIGHT_FOOT_INDEX,
+    mp_pose.PoseLandmark.LEFT_HEEL,
+    mp_pose.PoseLandmark.RIGHT_HEEL,
+    mp_pose.PoseLandmark.LEFT_ANKLE,
+    mp_pose.PoseLandmark.RIGHT_ANKLE,
+]
+
 def find_best_toe(landmarks):
     """Return the pixel coords of the best visible toe/foot reference (foot index, heel, ankle)."""
-    candidates = [
-        mp_pose.PoseLandmark.LEFT_FOOT_INDEX,
-        mp_pose.PoseLandmark.RIGHT_FOOT_INDEX,
-        mp_pose.PoseLandmark.LEFT_HEEL,
-        mp_pose.PoseLandmark.RIGHT_HEEL,
-        mp_pose.PoseLandmark.LEFT_ANKLE,
-        mp_pose.PoseLandmark.RIGHT_ANKLE,
-    ]
-    for c in candidates:
+    for c in TOE_CANDIDATES:
         lm = landmarks[c.value]
         if lm.visibility > MIN_VISIBILITY:
             return lm
     return None
 
-def main():
-    global WINDOW_NAME, calib_frame, calibrating, pixels_per_cm
+class SitAndReachDetector(Detector):
+    test = "sit_and_reach"
+    state_paths = ("/update_reach",)
+    results_csv = OUTPUT_CSV
+    results_header = ("reach_px_smoothed", "reach_cm")
+    calibration_plane = "wall"
+    # a held stretch; accuracy matters more than frame rate
+    target_fps = 15.0
+
+    def __init__(self):
+        self.reach_cm = 0.0
+        self.max_reach_cm = -999.0
+        self.smoothed_reach_px = None
+        self.smoothed_reach_cm = None
+        # No cm values until the camera's wall plane is calibrated
+        self.plane = None
+        self.calibration = None
+        self.offset = (0, 0)
+
+        # State for hold detection
+        self.hold_frames = 0
+        self.last_valid_reach = None
+        # 'c' grabs the next clean frame (before render draws on it) for click calibration
+        self.calibration_pending = False
+
+    def process(self, lm, frame):
+        global calib_frame, calibrating
+        h, w = frame.image.shape[:2]
+        if self.calibration_pending:
+            # copy now: render draws on frame.image and a ring slot is reused once released
+            calib_frame = frame.image.copy()
+            calibrating = True
+            self.calibration_pending = False
+        posts = []
+
+        if lm is not None:
+            # compute hip center x for forward direction guess
+            left_hip = lm[mp_pose.PoseLandmark.LEFT_HIP.value]
+            right_hip = lm[mp_pose.PoseLandmark.RIGHT_HIP.value]
+            hip_center_x = ((left_hip.x + right_hip.x) / 2.0) * w
+
+            # toe reference
+            toe_lm = find_best_toe(lm)
+
+            # fingertip candidates (index finger tips)
+            left_index = lm[mp_pose.PoseLandmark.LEFT_INDEX.value]
+            right_index = lm[mp_pose.PoseLandmark.RIGHT_INDEX.value]
+
+            if toe_lm is not None and (left_index.visibility > MIN_VISIBILITY or right_index.visibility > MIN_VISIBILITY):
+                toe_px = landmark_to_pixel(toe_lm, w, h)
+                left_px = landmark_to_pixel(left_index, w, h)
+                right_px = landmark_to_pixel(right_index, w, h)
+
+                # choose the hand that is further horizontally from the toe (likely the reaching hand)
+                dist_left = abs(left_px[0] - toe_px[0]) if left_index.visibility > MIN_VISIBILITY else -1
+                dist_right = abs(right_px[0] - toe_px[0]) if right_index.visibility > MIN_VISIBILITY else -1
+
+                if dist_left >= dist_right:
+                    hand_px = left_px
+                    hand_vis = left_index.visibility
+                else:
+                    hand_px = right_px
+                    hand_vis = right_index.visibility
 
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("ERROR: Camera could not be opened.")
-        return
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+                # Determine "forward" direction relative to hip->toe: if toe is to the right of hips, forward is +x
+                forward_sign = 1 if toe_px[0] > int(hip_center_x) else -1
 
-    WINDOW_NAME = "Sit-and-Reach (press 'c' to calibrate, 'q' to quit)"
-    cv2.namedWindow(WINDOW_NAME)
-    cv2.setMouseCallback(WINDOW_NAME, mouse_callback)
+                # raw reach in pixels (positive = fingertip beyond toes in forward direction)
+                reach_px = (hand_px[0] - toe_px[0]) * forward_sign
 
-    # CSV writer
-    csvfile = open(OUTPUT_CSV, "w", newline="")
-    csvw = csv.writer(csvfile)
-    csvw.writerow(["timestamp", "reach_px_smoothed", "reach_cm"])
+                # smooth
+                if self.smoothed_reach_px is None:
+                    self.smoothed_reach_px = reach_px
+                else:
+                    self.smoothed_reach_px = SMOOTH_ALPHA * reach_px + (1.0 - SMOOTH_ALPHA) * self.smoothed_reach_px
+
+                # convert to cm if calibrated (on the wall plane, so lens and perspective are accounted for)
+                self.reach_cm = None
+                if self.plane is not None:
+                    hand_cm, _ = self.plane.to_cm(*hand_px)
+                    toe_cm, _ = self.plane.to_cm(*toe_px)
+                    reach_cm = (hand_cm - toe_cm) * forward_sign
+                    if self.smoothed_reach_cm is None:
+                        self.smoothed_reach_cm = reach_cm
+                    else:
+                        self.smoothed_reach_cm = SMOOTH_ALPHA * reach_cm + (1.0 - SMOOTH_ALPHA) * self.smoothed_reach_cm
+                    self.reach_cm = self.smoothed_reach_cm
+                    if self.reach_cm > self.max_reach_cm:
+                        self.max_reach_cm = self.reach_cm
+                        # Notify Flask server to increment counter
+                        posts.append(("/increment", {"reach_cm": float(self.max_reach_cm)}))
+
+            # (a) Legs straight and flat
+            left_knee = lm[mp_pose.PoseLandmark.LEFT_KNEE.value]
+            right_knee = lm[mp_pose.PoseLandmark.RIGHT_KNEE.value]
+            left_ankle = lm[mp_pose.PoseLandmark.LEFT_ANKLE.value]
+            right_ankle = lm[mp_pose.PoseLandmark.RIGHT_ANKLE.value]
+            left_hip = lm[mp_pose.PoseLandmark.LEFT_HIP.value]
+            right_hip = lm[mp_pose.PoseLandmark.RIGHT_HIP.value]
+
+            left_leg_angle = angle(left_hip, left_knee, left_ankle)
+            right_leg_angle = angle(right_hip, right_knee, right_ankle)
+
+            legs_straight = left_leg_angle > KNEE_LOCK_ANGLE and right_leg_angle > KNEE_LOCK_ANGLE
+
+            # (b) Feet placement
+            ankle_dist = abs(left_ankle.x - right_ankle.x)
+            feet_stable = ankle_dist < ANKLE_DIST_THRESHOLD
+
+            # (c) Hip position
+            hip_y = (left_hip.y + right_hip.y) / 2
+            ankle_y = (left_ankle.y + right_ankle.y) / 2
+            hip_down = abs(hip_y - ankle_y) < HIP_Y_THRESHOLD
+
+            # (d) Hands aligned
+            left_wrist = lm[mp_pose.PoseLandmark.LEFT_WRIST.value]
+            right_wrist = lm[mp_pose.PoseLandmark.RIGHT_WRIST.value]
+            hands_aligned = abs(left_wrist.y - right_wrist.y) < WRIST_Y_DIFF_THRESHOLD
+
+            # (e) Reach forward
+            # Use the wrist further from the ankle (horizontal distance)
+            left_reach = abs(left_wrist.x - left_ankle.x)
+            right_reach = abs(right_wrist.x - right_ankle.x)
+            reach_px = max(left_reach, right_reach) * w  # convert normalized to pixels
+
+            # (f) Hold duration
+            valid_pose = legs_straight and feet_stable and hip_down and hands_aligned
+
+            if valid_pose:
+                if self.last_valid_reach is not None and abs(reach_px - self.last_valid_reach) < 10:
+                    self.hold_frames += 1
+                else:
+                    self.hold_frames = 1
+                    self.last_valid_reach = reach_px
+            else:
+                self.hold_frames = 0
+                self.last_valid_reach = None
+
+            # Only count if held for required duration
+            if self.hold_frames >= HOLD_DURATION:
+                # Only increment if new max
+                if self.plane is not None:
+                    self.reach_cm = max(wrist_reach_cm(self.plane, left_wrist, left_ankle, w, h),
+                                        wrist_reach_cm(self.plane, right_wrist, right_ankle, w, h))
+                    if self.reach_cm > self.max_reach_cm:
+                        self.max_reach_cm = self.reach_cm
+                        posts.append(("/increment", {"reach_cm": float(self.max_reach_cm)}))
+                self.hold_frames = 0  # reset after counting
+
+        # Update reach values on server
+        safe_reach_cm = self.reach_cm if isinstance(self.reach_cm, (int, float)) and self.reach_cm is not None else 0.0
+        safe_max_reach_cm = self.max_reach_cm if isinstance(self.max_reach_cm, (int, float)) and self.max_reach_cm is not None else -999.0
+        posts.append(("/update_reach", {"current_reach": float(safe_reach_cm), "max_reach": float(safe_max_reach_cm)}))
+        return posts
+
+    def result_rows(self, posts):
+        # One row per new recorded max
+        return [[f"{self.smoothed_reach_px:.1f}" if self.smoothed_reach_px is not None else "",
+                 f"{self.max_reach_cm:.2f}"] for path, payload in posts if path == "/increment"]
+
+    def draw(self, vis_frame):
+        # Show the current frame with annotations
+        if calibrating:
+            cv2.putText(vis_frame, "Calibration mode: Click two points", (50,50),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,255), 2, cv2.LINE_AA)
+            # keep the clicked points visible while the length is typed in the console
+            for point in calib_points:
+                cv2.circle(vis_frame, point, 5, (0,255,0), -1)
+            if len(calib_points) == 2:
+                cv2.line(vis_frame, calib_points[0], calib_points[1], (0,255,0), 2)
+            return
+        cv2.putText(vis_frame, f"Max Reach: {self.max_reach_cm:.1f} cm", (30,60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0,255,0), 2, cv2.LINE_AA)
+        if self.plane is not None and self.reach_cm is not None:
+            cv2.putText(vis_frame, f"Current Reach: {self.reach_cm:.1f} cm", (30,100),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255,255,255), 2, cv2.LINE_AA)
+
+    def handle_key(self, key):
+        if key == ord('c'):
+            self.calibration_pending = True
+        elif key == ord('r'):
+            self.max_reach_cm = -999.0
+            print("Recorded max reset.")
+
+    def handle_command(self, command, data):
+        if command != "calibrate":
+            return super().handle_command(command, data)
+        if "pixels_per_cm" in data:
+            value = float(data["pixels_per_cm"])
+        else:
+            (x1, y1), (x2, y2) = data["points"]
+            value = np.hypot(x2 - x1, y2 - y1) / float(data["length_cm"])
+        if not np.isfinite(value) or value <= 0:
+            print("Calibration rejected: pixels/cm must be a positive number.")
+            return
+        self.calibrate_scale(value)
+
+    def set_calibration(self, calibration, offset=(0, 0)):
+        self.calibration = calibration
+        self.offset = offset
+        if calibration.has_plane(self.calibration_plane):
+            self.plane = calibration.plane(self.calibration_plane).shifted(*offset)
+            if calibration.path is not None:
+                print(f"Loaded sit-and-reach calibration from {calibration.path}")
+
+    def calibrate_scale(self, pixels_per_cm):
+        """Apply a two-point calibration and save it to the camera's calibration file."""
+        if self.calibration is None:
+            self.calibration = Calibration()
+        self.calibration.set_scale(self.calibration_plane, pixels_per_cm)
+        self.plane = self.calibration.plane(self.calibration_plane).shifted(*self.offset)
+        self.smoothed_reach_cm = None
+        print(f"Calibration complete: {pixels_per_cm:.3f} pixels/cm")
+        if self.calibration.path is not None:
+            self.calibration.save()
+            print(f"Calibration saved to {self.calibration.path}")
+
+    def bind_window(self, window_name, submit_fn):
+        global WINDOW_NAME, detector, submit
+        WINDOW_NAME = window_name
+        detector = self
+        submit = submit_fn
+        cv2.setMouseCallback(window_name, mouse_callback)
+
+def batch_events(landmarks, index, timestamps, frame_size, plane=None):
+    """
+    Vectorized SitAndReachDetector over an (N, 33, 4) landmark array; returns [(index, path, payload)].
 
-    reach_cm = 0.0
+    All geometry (toe choice, reaching hand, leg angles, pose constraints) is computed
+    as array operations. The EMA smoothing, running max and hold counter depend on
+    the previous frame, so they run as one scalar pass over the precomputed arrays.
+    plane is the calibrated wall PlaneMap; without one no cm values (or increments) are produced.
+    """
+    L = kernels.as_float64(landmarks)
+    w, h = frame_size
+    P = mp_pose.PoseLandmark
+    X, Y, VIS = kernels.X, kernels.Y, kernels.VISIBILITY
+    seen = kernels.detected(L)
+
+    with np.errstate(invalid="ignore"):
+        # toe reference: first candidate above MIN_VISIBILITY
+        toe_ids = np.array([c.value for c in TOE_CANDIDATES])
+        toe_visible = L[:, toe_ids, VIS] > MIN_VISIBILITY
+        has_toe = toe_visible.any(axis=1)
+        toe = L[np.arange(len(L)), toe_ids[toe_visible.argmax(axis=1)]]
+
+        left_vis = L[:, P.LEFT_INDEX.value, VIS] > MIN_VISIBILITY
+        right_vis = L[:, P.RIGHT_INDEX.value, VIS] > MIN_VISIBILITY
+        has_reach = seen & has_toe & (left_vis | right_vis)
+
+        def px(values, scale):
+            # int() truncation, like landmark_to_pixel
+            return np.trunc(np.where(has_reach, values * scale, 0.0)).astype(np.int64)
+
+        toe_x = px(toe[:, X], w)
+        left_x = px(L[:, P.LEFT_INDEX.value, X], w)
+        right_x = px(L[:, P.RIGHT_INDEX.value, X], w)
+        dist_left = np.where(left_vis, np.abs(left_x - toe_x), -1)
+        dist_right = np.where(right_vis, np.abs(right_x - toe_x), -1)
+        use_left = dist_left >= dist_right
+        hand_x = np.where(use_left, left_x, right_x)
+        hip_center_x = px((L[:, P.LEFT_HIP.value, X] + L[:, P.RIGHT_HIP.value, X]) / 2.0, w)
+        forward_sign = np.where(toe_x > hip_center_x, 1, -1)
+
+        left_leg_angle = kernels.joint_angle(L, P.LEFT_HIP.value, P.LEFT_KNEE.value, P.LEFT_ANKLE.value)
+        right_leg_angle = kernels.joint_angle(L, P.RIGHT_HIP.value, P.RIGHT_KNEE.value, P.RIGHT_ANKLE.value)
+        legs_straight = (left_leg_angle > KNEE_LOCK_ANGLE) & (right_leg_angle > KNEE_LOCK_ANGLE)
+        feet_stable = np.abs(L[:, P.LEFT_ANKLE.value, X] - L[:, P.RIGHT_ANKLE.value, X]) < ANKLE_DIST_THRESHOLD
+        hip_y = (L[:, P.LEFT_HIP.value, Y] + L[:, P.RIGHT_HIP.value, Y]) / 2
+        ankle_y = (L[:, P.LEFT_ANKLE.value, Y] + L[:, P.RIGHT_ANKLE.value, Y]) / 2
+        hip_down = np.abs(hip_y - ankle_y) < HIP_Y_THRESHOLD
+        hands_aligned = np.abs(L[:, P.LEFT_WRIST.value, Y] - L[:, P.RIGHT_WRIST.value, Y]) < WRIST_Y_DIFF_THRESHOLD
+        valid_pose = legs_straight & feet_stable & hip_down & hands_aligned
+        hold_reach_px = np.maximum(np.abs(L[:, P.LEFT_WRIST.value, X] - L[:, P.LEFT_ANKLE.value, X]),
+                                   np.abs(L[:, P.RIGHT_WRIST.value, X] - L[:, P.RIGHT_ANKLE.value, X])) * w
+
+        reach_cm = hold_reach_cm = np.zeros(len(L))
+        if plane is not None:
+            hand_y = np.where(use_left, px(L[:, P.LEFT_INDEX.value, Y], h), px(L[:, P.RIGHT_INDEX.value, Y], h))
+            hand_cm, _ = plane.to_cm(hand_x, hand_y)
+            toe_cm, _ = plane.to_cm(toe_x, px(toe[:, Y], h))
+            reach_cm = (hand_cm - toe_cm) * forward_sign
+
+            def plane_x(i):
+                return plane.to_cm(L[:, i, X] * w, L[:, i, Y] * h)[0]
+            hold_reach_cm = np.maximum(np.abs(plane_x(P.LEFT_WRIST.value) - plane_x(P.LEFT_ANKLE.value)),
+                                       np.abs(plane_x(P.RIGHT_WRIST.value) - plane_x(P.RIGHT_ANKLE.value)))
+
+    events = []
     max_reach_cm = -999.0
-    smoothed_reach_px = None
-
-    # Constraint parameters
-    KNEE_LOCK_ANGLE = 165      # degrees, threshold for straight leg
-    ANKLE_DIST_THRESHOLD = 0.05  # normalized, threshold for feet not sliding
-    HIP_Y_THRESHOLD = 0.05     # normalized, threshold for hip lift
-    WRIST_Y_DIFF_THRESHOLD = 0.05  # normalized, hands aligned
-    HOLD_DURATION = 30         # frames (~1 sec at 30fps)
-
-    # State for hold detection
+    smoothed_reach_cm = None
     hold_frames = 0
     last_valid_reach = None
+    for i, (is_seen, reach_ok, r_cm, valid, hold_px, hold_cm) in enumerate(zip(
+            seen.tolist(), has_reach.tolist(), reach_cm.tolist(), valid_pose.tolist(), hold_reach_px.tolist(),
+            hold_reach_cm.tolist())):
+        if not is_seen:
+            continue
+        if reach_ok and plane is not None:
+            if smoothed_reach_cm is None:
+                smoothed_reach_cm = r_cm
+            else:
+                smoothed_reach_cm = SMOOTH_ALPHA * r_cm + (1.0 - SMOOTH_ALPHA) * smoothed_reach_cm
+            if smoothed_reach_cm > max_reach_cm:
+                max_reach_cm = smoothed_reach_cm
+                events.append((int(index[i]), "/increment", {"reach_cm": float(max_reach_cm)}))
+
+        if valid:
+            if last_valid_reach is not None and abs(hold_px - last_valid_reach) < 10:
+                hold_frames += 1
+            else:
+                hold_frames = 1
+                last_valid_reach = hold_px
+        else:
+            hold_frames = 0
+            last_valid_reach = None
+
+        if hold_frames >= HOLD_DURATION:
+            if plane is not None:
+                if hold_cm > max_reach_cm:
+                    max_reach_cm = hold_cm
+                    events.append((int(index[i]), "/increment", {"reach_cm": float(max_reach_cm)}))
+            hold_frames = 0
+    return events
 
-    with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Camera read failed. Exiting.")
-                break
-
-            h, w = frame.shape[:2]
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = pose.process(frame_rgb)
-            vis_frame = frame.copy()
-
-            # Draw landmarks for user feedback
-            if results.pose_landmarks:
-                mp_drawing.draw_landmarks(vis_frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-
-                lm = results.pose_landmarks.landmark
-
-                # compute hip center x for forward direction guess
-                left_hip = lm[mp_pose.PoseLandmark.LEFT_HIP.value]
-                right_hip = lm[mp_pose.PoseLandmark.RIGHT_HIP.value]
-                hip_center_x = ((left_hip.x + right_hip.x) / 2.0) * w
-
-                # toe reference
-                toe_lm = find_best_toe(lm)
-
-                # fingertip candidates (index finger tips)
-                left_index = lm[mp_pose.PoseLandmark.LEFT_INDEX.value]
-                right_index = lm[mp_pose.PoseLandmark.RIGHT_INDEX.value]
-
-                if toe_lm is not None and (left_index.visibility > MIN_VISIBILITY or right_index.visibility > MIN_VISIBILITY):
-                    toe_px = landmark_to_pixel(toe_lm, w, h)
-                    left_px = landmark_to_pixel(left_index, w, h)
-                    right_px = landmark_to_pixel(right_index, w, h)
-
-                    # choose the hand that is further horizontally from the toe (likely the reaching hand)
-                    dist_left = abs(left_px[0] - toe_px[0]) if left_index.visibility > MIN_VISIBILITY else -1
-                    dist_right = abs(right_px[0] - toe_px[0]) if right_index.visibility > MIN_VISIBILITY else -1
-
-                    if dist_left >= dist_right:
-                        hand_px = left_px
-                        hand_vis = left_index.visibility
-                    else:
-                        hand_px = right_px
-                        hand_vis = right_index.visibility
-
-                    # Determine "forward" direction relative to hip->toe: if toe is to the right of hips, forward is +x
-                    forward_sign = 1 if toe_px[0] > int(hip_center_x) else -1
-
-                    # raw reach in pixels (positive = fingertip beyond toes in forward direction)
-                    reach_px = (hand_px[0] - toe_px[0]) * forward_sign
-
-                    # smooth
-                    if smoothed_reach_px is None:
-                        smoothed_reach_px = reach_px
-                    else:
-                        smoothed_reach_px = SMOOTH_ALPHA * reach_px + (1.0 - SMOOTH_ALPHA) * smoothed_reach_px
-
-                    # convert to cm if calibrated
-                    reach_cm = None
-                    if pixels_per_cm is not None:
-                        reach_cm = smoothed_reach_px / pixels_per_cm
-                        if reach_cm > max_reach_cm:
-                            max_reach_cm = reach_cm
-                            # Notify Flask server to increment counter
-                            try:
-                                requests.post("http://127.0.0.1:5000/increment")
-                            except Exception as e:
-                                print("Could not update counter:", e)
-
-                # (a) Legs straight and flat
-                left_knee = lm[mp_pose.PoseLandmark.LEFT_KNEE.value]
-                right_knee = lm[mp_pose.PoseLandmark.RIGHT_KNEE.value]
-                left_ankle = lm[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-                right_ankle = lm[mp_pose.PoseLandmark.RIGHT_ANKLE.value]
-                left_hip = lm[mp_pose.PoseLandmark.LEFT_HIP.value]
-                right_hip = lm[mp_pose.PoseLandmark.RIGHT_HIP.value]
-
-                def angle(a, b, c):
-                    # Returns angle at point b (in degrees)
-                    ba = np.array([a.x - b.x, a.y - b.y])
-                    bc = np.array([c.x - b.x, c.y - b.y])
-                    cosine_angle = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc))
-                    return np.degrees(np.arccos(np.clip(cosine_angle, -1.0, 1.0)))
-
-                left_leg_angle = angle(left_hip, left_knee, left_ankle)
-                right_leg_angle = angle(right_hip, right_knee, right_ankle)
-
-                legs_straight = left_leg_angle > KNEE_LOCK_ANGLE and right_leg_angle > KNEE_LOCK_ANGLE
-
-                # (b) Feet placement
-                ankle_dist = abs(left_ankle.x - right_ankle.x)
-                feet_stable = ankle_dist < ANKLE_DIST_THRESHOLD
-
-                # (c) Hip position
-                hip_y = (left_hip.y + right_hip.y) / 2
-                ankle_y = (left_ankle.y + right_ankle.y) / 2
-                hip_down = abs(hip_y - ankle_y) < HIP_Y_THRESHOLD
-
-                # (d) Hands aligned
-                left_wrist = lm[mp_pose.PoseLandmark.LEFT_WRIST.value]
-                right_wrist = lm[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-                hands_aligned = abs(left_wrist.y - right_wrist.y) < WRIST_Y_DIFF_THRESHOLD
-
-                # (e) Reach forward
-                # Use the wrist further from the ankle (horizontal distance)
-                left_reach = abs(left_wrist.x - left_ankle.x)
-                right_reach = abs(right_wrist.x - right_ankle.x)
-                reach_px = max(left_reach, right_reach) * w  # convert normalized to pixels
-
-                # (f) Hold duration
-                valid_pose = legs_straight and feet_stable and hip_down and hands_aligned
-
-                if valid_pose:
-                    if last_valid_reach is not None and abs(reach_px - last_valid_reach) < 10:
-                        hold_frames += 1
-                    else:
-                        hold_frames = 1
-                        last_valid_reach = reach_px
-                else:
-                    hold_frames = 0
-                    last_valid_reach = None
-
-                # Only count if held for required duration
-                if hold_frames >= HOLD_DURATION:
-                    # Only increment if new max
-                    if pixels_per_cm is not None:
-                        reach_cm = reach_px / pixels_per_cm
-                        if reach_cm > max_reach_cm:
-                            max_reach_cm = reach_cm
-                            try:
-                                requests.post("http://127.0.0.1:5000/increment")
-                            except Exception as e:
-                                print("Could not update counter:", e)
-                    hold_frames = 0  # reset after counting
-
-            # Show the current frame with annotations
-            cv2.putText(vis_frame, f"Max Reach: {max_reach_cm:.1f} cm", (30,60),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0,255,0), 2, cv2.LINE_AA)
-            if pixels_per_cm is not None:
-                cv2.putText(vis_frame, f"Current Reach: {reach_cm:.1f} cm", (30,100),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255,255,255), 2, cv2.LINE_AA)
-            cv2.imshow(WINDOW_NAME, vis_frame)
-
-            # Update reach values on server
-            safe_reach_cm = reach_cm if isinstance(reach_cm, (int, float)) and reach_cm is not None else 0.0
-            safe_max_reach_cm = max_reach_cm if isinstance(max_reach_cm, (int, float)) and max_reach_cm is not None else -999.0
-            try:
-                requests.post(
-                    "http://127.0.0.1:5000/update_reach",
-                    json={"current_reach": float(safe_reach_cm), "max_reach": float(safe_max_reach_cm)}
-                )
-            except Exception as e:
-                print("Could not update reach values:", e)
-
-            key = cv2.waitKey(5)
-            if key == ord('q'):
-                break
-            elif key == ord('c'):
-                calibrating = True
-                calib_frame = frame.copy()
-                cv2.putText(calib_frame, "Calibration mode: Click two points", (50,50),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,255), 2, cv2.LINE_AA)
-                cv2.imshow(WINDOW_NAME, calib_frame)
-            elif key == ord('r'):
-                max_reach_cm = -999.0
-                with open(OUTPUT_CSV, "w", newline="") as csvfile:
-                    csvw = csv.writer(csvfile)
-                    csvw.writerow(["timestamp", "reach_px_smoothed", "reach_cm"])
-                print("Recorded max reset.")
-
-    cap.release()
-    cv2.destroyAllWindows()
+def main():
+    args = tracker_arg_parser().parse_args()
+    run_tracker(SitAndReachDetector(), "Sit-and-Reach (press 'c' to calibrate, 'q' to quit)",
+                frame_size=(FRAME_WIDTH, FRAME_HEIGHT), options=args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
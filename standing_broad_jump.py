@@ -1,106 +1,160 @@
+from collections import deque
+
 import cv2
 import mediapipe as mp
 import numpy as np
-import csv
-import requests
+
+import kernels
+from calibration import PlaneMap
+from pipeline import Detector, run_tracker, tracker_arg_parser
 
 OUTPUT_CSV = "broad_jump_results.csv"
 FRAME_WIDTH = 1280
 FRAME_HEIGHT = 720
+TAKEOFF_MARGIN_PX = 30        # rear ankle this far past the take-off line: the athlete is in the air
+LANDING_HOLD_SECONDS = 0.25   # landed once the rear ankle has not moved forward for this long
+LANDING_TOLERANCE_PX = 5      # forward movement smaller than this counts as standing still
 
 mp_drawing = mp.solutions.drawing_utils
 mp_pose = mp.solutions.pose
 
-PIXELS_PER_CM = 44.0  # Set from calibration
+class BroadJumpDetector(Detector):
+    test = "broad_jump"
+    results_csv = OUTPUT_CSV
+    results_header = ("jump_distance_cm",)
+    # Distances are measured along the floor plane's X axis (see calibration.py)
+    calibration_plane = "floor"
+    # fast movements: aim --autotune at a high frame rate
+    target_fps = 60.0
+
+    def __init__(self):
+        self.takeoff_x = None
+        self.takeoff_y = None
+        self.landing_x = None
+        self.landing_y = None
+        self.jump_distance_cm = 0.0
+        self.jump_count = 0
+        self.in_air = False
+        self.ankles_x = None
+        self.rear_ankle_y = None
+        # (timestamp, furthest rear ankle x so far) for the in-air frames of the last LANDING_HOLD_SECONDS
+        self.reach_history = deque()
+
+    def process(self, lm, frame):
+        if lm is None:
+            self.ankles_x = None
+            return []
+
+        h, w = frame.image.shape[:2]
+        # Use left and right ankles for measurement
+        left_ankle = lm[mp_pose.PoseLandmark.LEFT_ANKLE.value]
+        right_ankle = lm[mp_pose.PoseLandmark.RIGHT_ANKLE.value]
+        ankles_x = [left_ankle.x * w, right_ankle.x * w]
+        self.ankles_x = ankles_x
+        # the rear ankle (smallest x) is the one measured
+        self.rear_ankle_y = (left_ankle.y if ankles_x[0] <= ankles_x[1] else right_ankle.y) * h
+
+        if self.takeoff_x is not None:
+            # Detect landing (ankles move forward, then stop for LANDING_HOLD_SECONDS of capture time)
+            rear_x = min(ankles_x)
+            if not self.in_air:
+                if rear_x > self.takeoff_x + TAKEOFF_MARGIN_PX:
+                    self.in_air = True
+                    self.landing_x, self.landing_y = rear_x, self.rear_ankle_y
+                    self.reach_history = deque([(frame.timestamp, rear_x)])
+                return []
+            if rear_x > self.landing_x:
+                self.landing_x, self.landing_y = rear_x, self.rear_ankle_y
+            history = self.reach_history
+            history.append((frame.timestamp, self.landing_x))
+            limit = frame.timestamp - LANDING_HOLD_SECONDS
+            while len(history) > 1 and history[1][0] <= limit:
+                history.popleft()
+            if history[0][0] <= limit and self.landing_x - history[0][1] <= LANDING_TOLERANCE_PX:
+                # Landed and stopped moving forward
+                self.jump_distance_cm = jump_distance_cm(self.plane, self.takeoff_x, self.takeoff_y,
+                                                         self.landing_x, self.landing_y)
+                self.jump_count += 1
+                print(f"Jump {self.jump_count}: {self.jump_distance_cm:.2f} cm")
+                self.in_air = False
+                self.takeoff_x = None  # Reset for next jump
+                return [("/increment", {"jump_height": self.jump_distance_cm})]
+        return []
+
+    def result_rows(self, posts):
+        return [[f"{payload['jump_height']:.2f}"] for path, payload in posts if path == "/increment"]
+
+    def draw(self, vis_frame):
+        # Set take-off line (when standing still, press 's')
+        if self.ankles_x is not None and self.takeoff_x is None:
+            cv2.putText(vis_frame, "Stand at take-off line and press 's'", (30,100),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,0,255), 2, cv2.LINE_AA)
+
+        # Show info
+        cv2.putText(vis_frame, f"Jumps: {self.jump_count}", (30,60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0,255,0), 2, cv2.LINE_AA)
+        cv2.putText(vis_frame, f"Last Jump Distance: {self.jump_distance_cm:.2f} cm", (30,120),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,255,0), 2, cv2.LINE_AA)
+
+    def in_attempt(self):
+        return self.in_air
+
+    def handle_key(self, key):
+        if key == ord('s'):
+            # Set take-off line
+            if self.ankles_x is not None:
+                self.takeoff_x = min(self.ankles_x)
+                self.takeoff_y = self.rear_ankle_y
+                print(f"Take-off line set at x={self.takeoff_x:.2f} px")
+        elif key == ord('r'):
+            self.jump_count = 0
+            self.jump_distance_cm = 0.0
+            self.takeoff_x = None
+
+def jump_distance_cm(plane, takeoff_x, takeoff_y, landing_x, landing_y):
+    """Distance along the floor plane's X axis; without a take-off y it is taken level with the landing."""
+    if takeoff_y is None:
+        takeoff_y = landing_y
+    takeoff_cm, _ = plane.to_cm(takeoff_x, takeoff_y)
+    landing_cm, _ = plane.to_cm(landing_x, landing_y)
+    return landing_cm - takeoff_cm
+
+def batch_events(landmarks, index, timestamps, frame_size, takeoff_x, takeoff_y=None, plane=None):
+    """Vectorized BroadJumpDetector for one take-off line; returns [(index, path, payload)]."""
+    if plane is None:
+        plane = PlaneMap()
+    L = kernels.as_float64(landmarks)
+    w, h = frame_size
+    left_x = L[:, mp_pose.PoseLandmark.LEFT_ANKLE.value, kernels.X] * w
+    right_x = L[:, mp_pose.PoseLandmark.RIGHT_ANKLE.value, kernels.X] * w
+    ankle_x = np.minimum(left_x, right_x)
+    ankle_y = np.where(left_x <= right_x, L[:, mp_pose.PoseLandmark.LEFT_ANKLE.value, kernels.Y],
+                       L[:, mp_pose.PoseLandmark.RIGHT_ANKLE.value, kernels.Y]) * h
+    # NaN (no pose) compares False, so undetected frames never trigger either step
+    forward = np.flatnonzero(ankle_x > takeoff_x + TAKEOFF_MARGIN_PX)
+    if not len(forward):
+        return []
+    # in-air frames with a pose, from the first one past the line
+    air = np.flatnonzero(kernels.detected(L))
+    air = air[air >= forward[0]]
+    t = np.asarray(timestamps, dtype=np.float64)[air]
+    reach = np.maximum.accumulate(ankle_x[air])
+    # furthest reach LANDING_HOLD_SECONDS ago: the last frame at or before t - hold
+    ref = np.searchsorted(t, t - LANDING_HOLD_SECONDS, side="right") - 1
+    landed = (ref >= 0) & (reach - reach[np.maximum(ref, 0)] <= LANDING_TOLERANCE_PX)
+    landed[0] = False
+    if not landed.any():
+        return []
+    end = int(np.argmax(landed))
+    furthest = int(np.argmax(ankle_x[air[:end + 1]]))
+    distance = jump_distance_cm(plane, takeoff_x, takeoff_y, reach[end], ankle_y[air[furthest]])
+    return [(int(index[air[end]]), "/increment", {"jump_height": float(distance)})]
 
 def main():
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("ERROR: Camera could not be opened.")
-        return
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
-
+    args = tracker_arg_parser().parse_args()
     WINDOW_NAME = "Broad Jump Counter (press 'q' to quit, 'r' to reset, 's' to set take-off)"
-    cv2.namedWindow(WINDOW_NAME)
-
-    csvfile = open(OUTPUT_CSV, "w", newline="")
-    csvw = csv.writer(csvfile)
-    csvw.writerow(["timestamp", "jump_distance_cm"])
-
-    takeoff_x = None
-    landing_x = None
-    jump_distance_cm = 0.0
-    jump_count = 0
-    in_air = False
-
-    with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Camera read failed. Exiting.")
-                break
-
-            h, w = frame.shape[:2]
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = pose.process(frame_rgb)
-            vis_frame = frame.copy()
-
-            if results.pose_landmarks:
-                mp_drawing.draw_landmarks(vis_frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-                lm = results.pose_landmarks.landmark
-
-                # Use left and right ankles for measurement
-                left_ankle = lm[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-                right_ankle = lm[mp_pose.PoseLandmark.RIGHT_ANKLE.value]
-                ankles_x = [left_ankle.x * w, right_ankle.x * w]
-
-                # 1. Set take-off line (when standing still, press 's')
-                if takeoff_x is None:
-                    cv2.putText(vis_frame, "Stand at take-off line and press 's'", (30,100),
-                                cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,0,255), 2, cv2.LINE_AA)
-                else:
-                    # 2. Detect landing (ankles move forward, then stop)
-                    if not in_air and min(ankles_x) > takeoff_x + 30:
-                        in_air = True
-                        landing_x = min(ankles_x)
-                    elif in_air and min(ankles_x) <= landing_x:
-                        # Landed and stopped moving forward
-                        jump_distance_px = landing_x - takeoff_x
-                        jump_distance_cm = jump_distance_px / PIXELS_PER_CM
-                        jump_count += 1
-                        print(f"Jump {jump_count}: {jump_distance_cm:.2f} cm")
-                        try:
-                            requests.post("http://127.0.0.1:5000/increment", json={"jump_height": jump_distance_cm})
-                        except Exception as e:
-                            print("Could not update counter:", e)
-                        in_air = False
-                        takeoff_x = None  # Reset for next jump
-
-            # Show info
-            cv2.putText(vis_frame, f"Jumps: {jump_count}", (30,60),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0,255,0), 2, cv2.LINE_AA)
-            cv2.putText(vis_frame, f"Last Jump Distance: {jump_distance_cm:.2f} cm", (30,120),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,255,0), 2, cv2.LINE_AA)
-            cv2.imshow(WINDOW_NAME, vis_frame)
-
-            key = cv2.waitKey(5)
-            if key == ord('q'):
-                break
-            elif key == ord('s'):
-                # Set take-off line
-                if results.pose_landmarks:
-                    left_ankle = lm[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-                    right_ankle = lm[mp_pose.PoseLandmark.RIGHT_ANKLE.value]
-                    takeoff_x = min(left_ankle.x * w, right_ankle.x * w)
-                    print(f"Take-off line set at x={takeoff_x:.2f} px")
-            elif key == ord('r'):
-                jump_count = 0
-                jump_distance_cm = 0.0
-                takeoff_x = None
-
-    cap.release()
-    cv2.destroyAllWindows()
+
+    run_tracker(BroadJumpDetector(), WINDOW_NAME, frame_size=(FRAME_WIDTH, FRAME_HEIGHT), options=args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
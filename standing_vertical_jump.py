@@ -1,108 +1,241 @@
+from collections import deque
+
 import cv2
 import mediapipe as mp
 import numpy as np
-import csv
-import requests
+
+import kernels
+from calibration import PlaneMap
+from flow import PointFlow
+from pipeline import Detector, run_tracker, tracker_arg_parser
 
 OUTPUT_CSV = "jump_results.csv"
 FRAME_WIDTH = 1280
 FRAME_HEIGHT = 720
+RAISE_PX = 30               # wrist this far above standing reach: in the air
+APEX_WINDOW_SECONDS = 0.1   # wrist samples this close to the highest one are fitted for the apex
+LEAD_SECONDS = 0.5          # samples kept from before the wrist passes the standing reach, to find the take-off
+ANKLE_LIFT_PX = 25          # ankles this far above their standing level (more than a heel raise): feet off the ground
 
 mp_drawing = mp.solutions.drawing_utils
 mp_pose = mp.solutions.pose
 
-def main():
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("ERROR: Camera could not be opened.")
-        return
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+# followed by optical flow between pose frames in hybrid mode; the wrist comes first
+TRACKED_LANDMARKS = (mp_pose.PoseLandmark.RIGHT_WRIST, mp_pose.PoseLandmark.LEFT_ANKLE,
+                     mp_pose.PoseLandmark.RIGHT_ANKLE)
+
+class VerticalJumpDetector(Detector):
+    """
+    Vertical jump: the wrist's rise above the standing reach, measured at the apex.
+
+    Every wrist sample between leaving and returning to the standing reach is kept
+    and a parabola is fitted to the samples around the highest one, so the apex
+    can fall between frames. With the ankles' standing level known ('s' with the feet in
+    view), the take-off is where the ankles leave it and the take-off-to-apex time
+    is reported too.
+
+    pose_every > 1 is the hybrid mode for high frame rate capture (--capture-fps):
+    full pose runs on every pose_every-th frame only, and the wrist and ankles
+    are followed by optical flow (flow.PointFlow) on the frames in between.
+    """
+    test = "vertical_jump"
+    results_csv = OUTPUT_CSV
+    results_header = ("jump_height_cm",)
+    # Heights are measured on the wall plane (see calibration.py)
+    calibration_plane = "wall"
+    # fast movements: aim --autotune at a high frame rate
+    target_fps = 60.0
+    image_tracking = True
+
+    def __init__(self, pose_every=1):
+        self.standing_reach_x = None
+        self.standing_reach_y = None
+        self.standing_ankle_y = None
+        # (timestamp, wrist x, wrist y, ankle y) samples from LEAD_SECONDS (at least one frame) before
+        # leaving the standing reach to the first one back
+        self.trajectory = []
+        self.recent = deque()
+        self.prev = None
+        self.jump_height_cm = 0.0
+        self.jump_count = 0
+        self.in_air = False
+        self.wrist_x_px = None
+        self.wrist_y_px = None
+        self.ankle_y_px = None
+        self.pose_every = pose_every
+        self.since_pose = 0
+        self.flow = PointFlow()
+        if pose_every > 1:
+            # every frame between two poses must reach the detector, not just the latest
+            self.capture_backlog = 2 * pose_every
+
+    def hybrid(self):
+        return self.image_tracking and self.pose_every > 1
+
+    def needs_pose(self):
+        if not self.hybrid():
+            return True
+        return self.since_pose + 1 >= self.pose_every or not self.flow.tracking(0)
+
+    def process(self, lm, frame):
+        h, w = frame.image.shape[:2]
+        if lm is not None:
+            self.since_pose = 0
+            points = [(lm[landmark.value].x * w, lm[landmark.value].y * h) for landmark in TRACKED_LANDMARKS]
+            # Use right wrist for fingertip height (can use left or average); ankles only when clearly seen
+            points[1:] = [p if lm[landmark.value].visibility > 0.5 else None
+                          for p, landmark in zip(points[1:], TRACKED_LANDMARKS[1:])]
+            if self.hybrid():
+                self.flow.seed(frame.image, points)
+        elif self.hybrid():
+            self.since_pose += 1
+            points = self.flow.track(frame.image)
+        else:
+            points = None
+        if not points or points[0] is None:
+            self.wrist_x_px = self.wrist_y_px = None
+            return []
+
+        self.wrist_x_px, self.wrist_y_px = points[0]
+        ankles = [p[1] for p in points[1:] if p is not None]
+        self.ankle_y_px = sum(ankles) / len(ankles) if ankles else None
+        sample = (frame.timestamp, self.wrist_x_px, self.wrist_y_px,
+                  self.ankle_y_px if self.ankle_y_px is not None else np.nan)
+        prev, self.prev = self.prev, sample
+        lead = [r for r in self.recent if r[0] >= sample[0] - LEAD_SECONDS]
+        self.recent.append(sample)
+        while self.recent[0][0] < sample[0] - LEAD_SECONDS:
+            self.recent.popleft()
+
+        # Detect jump (wrist rises above threshold)
+        if self.standing_reach_y is not None:
+            if self.wrist_y_px < self.standing_reach_y - RAISE_PX:  # Jump detected (hand goes up)
+                if not self.in_air:
+                    self.in_air = True
+                    if not lead and prev is not None:
+                        lead = [prev]
+                    self.trajectory = lead + [sample]
+                else:
+                    self.trajectory.append(sample)
+            elif self.in_air:
+                # Jump finished, calculate height at the top of the jump (between frames if need be)
+                self.trajectory.append(sample)
+                self.in_air = False
+                return self._score()
+        return []
+
+    def _score(self):
+        peak_x, peak_y, rise = fit_jump(np.array(self.trajectory), self.standing_ankle_y)
+        self.jump_height_cm = float(jump_height_cm(self.plane, self.standing_reach_x, self.standing_reach_y,
+                                                   peak_x, peak_y))
+        self.jump_count += 1
+        payload = {"jump_height": self.jump_height_cm}
+        if rise is None:
+            print(f"Jump {self.jump_count}: {self.jump_height_cm:.2f} cm")
+        else:
+            payload["rise_time"] = rise
+            print(f"Jump {self.jump_count}: {self.jump_height_cm:.2f} cm, take-off to apex {rise * 1000:.0f} ms")
+        return [("/increment", payload)]
+
+    def result_rows(self, posts):
+        return [[f"{payload['jump_height']:.2f}"] for path, payload in posts if path == "/increment"]
+
+    def draw(self, vis_frame):
+        # Set standing reach (when user is standing still)
+        if self.wrist_y_px is not None and self.standing_reach_y is None:
+            cv2.putText(vis_frame, "Stand still and press 's' to set reach", (30,100),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,0,255), 2, cv2.LINE_AA)
+
+        # Show info
+        cv2.putText(vis_frame, f"Jumps: {self.jump_count}", (30,60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0,255,0), 2, cv2.LINE_AA)
+        cv2.putText(vis_frame, f"Last Jump Height: {self.jump_height_cm:.2f} cm", (30,120),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,255,0), 2, cv2.LINE_AA)
+
+    def in_attempt(self):
+        return self.in_air
+
+    def handle_key(self, key):
+        if key == ord('s'):
+            # Set standing reach
+            if self.wrist_y_px is not None:
+                self.standing_reach_x = self.wrist_x_px
+                self.standing_reach_y = self.wrist_y_px
+                self.standing_ankle_y = self.ankle_y_px
+                print(f"Standing reach set at y={self.standing_reach_y:.2f} px")
+        elif key == ord('r'):
+            self.jump_count = 0
+            self.jump_height_cm = 0.0
+
+def jump_height_cm(plane, standing_x, standing_y, peak_x, peak_y):
+    """Height between standing reach and peak on the wall plane; without a standing x the reach is taken
+    straight below the peak. Works on scalars or arrays."""
+    if standing_x is None:
+        standing_x = peak_x
+    _, standing_cm = plane.to_cm(standing_x, standing_y)
+    _, peak_cm = plane.to_cm(peak_x, peak_y)
+    return standing_cm - peak_cm
+
+def fit_jump(trajectory, standing_ankle_y=None):
+    """
+    (apex x, apex y, take-off to apex seconds or None) from an (n, 4) array of
+    (timestamp, wrist x, wrist y, ankle y) samples of one jump.
+    """
+    t, peak_x, peak_y = kernels.fit_minimum(trajectory[:, 0], trajectory[:, 1], trajectory[:, 2],
+                                            APEX_WINDOW_SECONDS)
+    rise = None
+    if standing_ankle_y is not None:
+        # the ankles' last departure from the ground before the highest wrist sample
+        takeoff = kernels.last_fall_below(trajectory[:, 0], trajectory[:, 3], standing_ankle_y - ANKLE_LIFT_PX,
+                                          int(np.argmin(trajectory[:, 2])))
+        if takeoff is not None:
+            rise = float(t) - takeoff
+    return peak_x, peak_y, rise
+
+def batch_events(landmarks, index, timestamps, frame_size, standing_reach_y, standing_reach_x=None, plane=None,
+                 standing_ankle_y=None):
+    """Vectorized VerticalJumpDetector over an (N, 33, 4) landmark array; returns [(index, path, payload)]."""
+    if plane is None:
+        plane = PlaneMap()
+    L = kernels.as_float64(landmarks)
+    w, h = frame_size
+    wrist_x_px = L[:, mp_pose.PoseLandmark.RIGHT_WRIST.value, kernels.X] * w
+    wrist_y_px = L[:, mp_pose.PoseLandmark.RIGHT_WRIST.value, kernels.Y] * h
+    ankles = [landmark.value for landmark in TRACKED_LANDMARKS[1:]]
+    ankle_y_px = np.where(L[:, ankles, kernels.VISIBILITY] > 0.5, L[:, ankles, kernels.Y] * h, np.nan)
+    with np.errstate(invalid="ignore"):
+        ankle_y_px = np.nansum(ankle_y_px, axis=1) / np.sum(~np.isnan(ankle_y_px), axis=1)
+    seen = kernels.detected(L)
+    raised = wrist_y_px < standing_reach_y - RAISE_PX
+    takeoffs, landings = kernels.alternations(seen & raised, seen & ~raised)
+    if not len(takeoffs):
+        return []
+    # each jump's trajectory: the frames with a pose from LEAD_SECONDS (at least one frame) before leaving
+    # the standing reach to landing
+    seen_idx = np.flatnonzero(seen)
+    ts = np.asarray(timestamps, dtype=np.float64)
+    samples = np.stack([ts, wrist_x_px, wrist_y_px, ankle_y_px], axis=1)
+    leads = np.searchsorted(ts[seen_idx], ts[takeoffs] - LEAD_SECONDS)
+    events = []
+    for lead, start, end in zip(leads, np.searchsorted(seen_idx, takeoffs), np.searchsorted(seen_idx, landings)):
+        frames = seen_idx[max(min(lead, start - 1), 0):end + 1]
+        peak_x, peak_y, rise = fit_jump(samples[frames], standing_ankle_y)
+        payload = {"jump_height": float(jump_height_cm(plane, standing_reach_x, standing_reach_y, peak_x, peak_y))}
+        if rise is not None:
+            payload["rise_time"] = rise
+        events.append((int(index[frames[-1]]), "/increment", payload))
+    return events
 
+def main():
+    parser = tracker_arg_parser()
+    parser.add_argument("--pose-every", type=int, default=1, metavar="K",
+                        help="run full pose on every K-th frame only and follow the wrist and ankles with "
+                             "optical flow in between (for high frame rates, see --capture-fps)")
+    args = parser.parse_args()
     WINDOW_NAME = "Vertical Jump Counter (press 'q' to quit, 'r' to reset)"
-    cv2.namedWindow(WINDOW_NAME)
-
-    csvfile = open(OUTPUT_CSV, "w", newline="")
-    csvw = csv.writer(csvfile)
-    csvw.writerow(["timestamp", "jump_height_cm"])
-
-    # Calibration: pixels_per_cm (set this after calibration, e.g. using wall marks)
-    pixels_per_cm = 44.0  # <-- Set this from your calibration step
-
-    standing_reach_y = None
-    peak_jump_y = None
-    jump_height_cm = 0.0
-    jump_count = 0
-    in_air = False
-
-    with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Camera read failed. Exiting.")
-                break
-
-            h, w = frame.shape[:2]
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = pose.process(frame_rgb)
-            vis_frame = frame.copy()
-
-            if results.pose_landmarks:
-                mp_drawing.draw_landmarks(vis_frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-                lm = results.pose_landmarks.landmark
-
-                # Use right wrist for fingertip height (can use left or average)
-                wrist = lm[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-                wrist_y_px = wrist.y * h
-
-                # 1. Set standing reach (when user is standing still)
-                if standing_reach_y is None:
-                    cv2.putText(vis_frame, "Stand still and press 's' to set reach", (30,100),
-                                cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,0,255), 2, cv2.LINE_AA)
-
-                # 2. Detect jump (wrist rises above threshold)
-                if standing_reach_y is not None:
-                    if wrist_y_px < standing_reach_y - 30:  # Jump detected (hand goes up)
-                        if not in_air:
-                            in_air = True
-                            peak_jump_y = wrist_y_px
-                        else:
-                            peak_jump_y = min(peak_jump_y, wrist_y_px)
-                    else:
-                        if in_air:
-                            # Jump finished, calculate height
-                            jump_height_px = standing_reach_y - peak_jump_y
-                            jump_height_cm = jump_height_px / pixels_per_cm
-                            jump_count += 1
-                            print(f"Jump {jump_count}: {jump_height_cm:.2f} cm")
-                            try:
-                                requests.post("http://127.0.0.1:5000/increment", json={"jump_height": jump_height_cm})
-                            except Exception as e:
-                                print("Could not update counter:", e)
-                            in_air = False
-
-            # Show info
-            cv2.putText(vis_frame, f"Jumps: {jump_count}", (30,60),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0,255,0), 2, cv2.LINE_AA)
-            cv2.putText(vis_frame, f"Last Jump Height: {jump_height_cm:.2f} cm", (30,120),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,255,0), 2, cv2.LINE_AA)
-            cv2.imshow(WINDOW_NAME, vis_frame)
-
-            key = cv2.waitKey(5)
-            if key == ord('q'):
-                break
-            elif key == ord('s'):
-                # Set standing reach
-                if results.pose_landmarks:
-                    wrist = lm[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-                    standing_reach_y = wrist.y * h
-                    print(f"Standing reach set at y={standing_reach_y:.2f} px")
-            elif key == ord('r'):
-                jump_count = 0
-                jump_height_cm = 0.0
-
-    cap.release()
-    cv2.destroyAllWindows()
+
+    run_tracker(VerticalJumpDetector(args.pose_every), WINDOW_NAME, frame_size=(FRAME_WIDTH, FRAME_HEIGHT),
+                options=args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,344 @@
+"""
+station.py
+Long-running station daemon: one open camera and one warm pose model, switching tests on request.
+
+    python station.py --test sit_ups --source 0 --headless
+    curl -X POST http://127.0.0.1:5100/switch -d '{"test": "vertical_jump"}'
+    curl -X POST http://127.0.0.1:5100/switch -d '{"test": "sit_ups", "thresholds": {"UP_ANGLE": 95}}'
+
+Starting a tracker script imports MediaPipe and OpenCV, loads the pose model and
+opens and sizes the camera, which takes seconds. The daemon does all of that
+once. At startup it also imports every test module, runs the pose model once
+on a blank frame and builds the calibration planes the tests measure on. A
+switch then only creates the new test's Detector between two frames, well
+under 100 ms from the request ("Switched to ... in N ms"; station_switch_seconds
+on /metrics).
+
+POST /switch takes JSON:
+
+    test          the test to run (required)
+    thresholds    {"NAME": value} for the test module's numeric constants, e.g.
+                  {"UP_ANGLE": 95} for sit_ups; every switch starts from the defaults
+    params        the Detector's constructor arguments, e.g. {"pose_every": 4}
+    calibration   calibration file (default: the station's), loaded once and kept
+    station       station id the results are posted under (default --station)
+
+An invalid switch (unknown test or threshold, wrong types, bad constructor
+arguments, unreadable calibration) is reported and the current test keeps
+running. A test may queue at most --max-capture-backlog frames for inference
+(vertical_jump with pose_every K queues 2K); that also sizes the
+--capture-process frame ring, and a switch needing more is refused. The new
+Detector starts from a clean state; each test/station pair keeps its results
+server client and results CSV for the life of the daemon. Keys and the other
+control commands go to the active test.
+"""
+
+import math
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from adaptive import AdaptiveScheduler
+from autotune import DEFAULT_LEVEL
+from calibration import Calibration, calibration_path
+from control import CONTROL_PORT, start_control_server
+from detectors import DETECTORS, create_detector, detector_class
+from landmarks import LandmarkRecorder
+from metrics import start_metrics_server
+from multitest import TestSlot
+from pipeline import (FRAME_HEIGHT, FRAME_WIDTH, PoseModels, TrackerMetrics, capture_size, frame_pipeline,
+                      mp_drawing, mp_pose, open_capture, parse_source, pose_estimator, start_autotune,
+                      station_url, tracker_arg_parser)
+from telemetry import TelemetryClient
+
+SWITCH_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+MAX_CAPTURE_BACKLOG = 8     # fits vertical_jump up to pose_every 4
+STATUS_COLOR = (255, 200, 0)
+
+
+class Station:
+    """The active test of the daemon, and what is kept loaded for switching to another one."""
+
+    def __init__(self, options, frame_size):
+        self.options = options
+        self.frame_size = frame_size
+        self.calibrations = {}  # path -> Calibration
+        self.slots = {}         # (test, station) -> TestSlot
+        self.defaults = {}      # (module, name) -> value before any threshold override
+        self.thresholds = (None, {})  # module and overrides of the active test
+        self.slot = None
+        self.station = None     # station id the active test posts under
+        self.pipeline = None
+        self.tuner = None
+        self.switch_seconds = None
+        for test in DETECTORS:
+            detector_class(test)
+        self.calibration(None)
+
+    @property
+    def detector(self):
+        return self.slot.detector
+
+    def in_attempt(self):
+        return self.detector.in_attempt()
+
+    def needs_pose(self):
+        return self.detector.needs_pose()
+
+    def handle_key(self, key):
+        self.detector.handle_key(key)
+
+    def handle_command(self, command, data):
+        self.detector.handle_command(command, data)
+
+    def queue_depth(self):
+        return sum(slot.telemetry.queue_depth() for slot in self.slots.values())
+
+    def calibration(self, path):
+        """The Calibration at path (default: the station's), with every plane a test uses built."""
+        path = path or self.options.calibration or calibration_path(self.options.station)
+        calibration = self.calibrations.get(path)
+        if calibration is None:
+            calibration = Calibration.load(path)
+            calibration.check_size(self.frame_size)
+            for test in DETECTORS:
+                plane = detector_class(test).calibration_plane
+                if plane is not None and calibration.has_plane(plane):
+                    calibration.plane(plane)
+            self.calibrations[path] = calibration
+        return calibration
+
+    def switch(self, data, requested=None):
+        """Make data["test"] the active test. Returns False, keeping the current test, if the switch fails."""
+        requested = requested or time.perf_counter()
+        try:
+            self._switch(data)
+        except Exception as e:
+            print(f"WARNING: switch rejected, keeping {self.detector.test if self.slot else 'no test'}: {e}")
+            return False
+        seconds = time.perf_counter() - requested
+        if self.switch_seconds is not None:
+            self.switch_seconds.observe(seconds)
+        print(f"Switched to {self.detector.test}/{self.station} in {seconds * 1000:.1f} ms")
+        return True
+
+    def _switch(self, data):
+        test, thresholds, params, calibration_file, station = check_switch(data)
+        module = sys.modules[detector_class(test).__module__]
+        thresholds = check_thresholds(module, thresholds)
+        calibration = self.calibration(calibration_file)
+        previous = self._override(module, thresholds)
+        try:
+            detector = create_detector(test, **params)
+            if detector.capture_backlog > self.options.max_capture_backlog:
+                raise ValueError(f"{test} queues {detector.capture_backlog} frames, more than "
+                                 f"--max-capture-backlog {self.options.max_capture_backlog}")
+            detector.set_calibration(calibration)
+        except Exception:
+            self._override(*previous)
+            raise
+
+        station = station or self.options.station
+        slot = self.slots.get((test, station))
+        if slot is None:
+            slot = self.slots[(test, station)] = TestSlot(
+                detector, TelemetryClient(station_url(test, station, self.options.server)), station)
+        slot.detector = detector
+        self.slot = slot
+        self.station = station
+        if self.pipeline is not None:
+            self.pipeline.capture_backlog = detector.capture_backlog
+        if self.tuner is not None:
+            self.tuner.target_fps = self.options.target_fps or detector.target_fps
+
+    def _override(self, module, thresholds):
+        """Put back every overridden threshold, then set thresholds on module. Returns the previous overrides."""
+        previous = self.thresholds
+        for (owner, name), value in self.defaults.items():
+            setattr(owner, name, value)
+        self.defaults.clear()
+        for name, value in thresholds.items():
+            self.defaults[(module, name)] = getattr(module, name)
+            setattr(module, name, value)
+        self.thresholds = (module, thresholds)
+        return previous
+
+    def draw_status(self, vis_frame):
+        cv2.putText(vis_frame, f"{self.detector.test} ({self.station})", (30, vis_frame.shape[0] - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, STATUS_COLOR, 2, cv2.LINE_AA)
+
+    def close(self):
+        for slot in self.slots.values():
+            slot.telemetry.close()
+            if slot.writer is not None:
+                slot.writer.close()
+
+
+def check_switch(data):
+    """(test, thresholds, params, calibration, station) of a /switch body; ValueError if it is malformed."""
+    if not isinstance(data, dict):
+        raise ValueError("the switch must be a JSON object")
+    test = data.get("test")
+    if not isinstance(test, str) or test not in DETECTORS:
+        raise ValueError(f"unknown test {test!r}; expected one of {', '.join(DETECTORS)}")
+    thresholds = data.get("thresholds") or {}
+    params = data.get("params") or {}
+    for name, value in (("thresholds", thresholds), ("params", params)):
+        if not isinstance(value, dict) or not all(isinstance(key, str) for key in value):
+            raise ValueError(f"{name} must be a JSON object")
+    calibration, station = data.get("calibration"), data.get("station")
+    for name, value in (("calibration", calibration), ("station", station)):
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{name} must be a string")
+    return test, thresholds, params, calibration, station
+
+
+def check_thresholds(module, thresholds):
+    """Validated {NAME: value} overrides of module's numeric UPPER_CASE constants."""
+    checked = {}
+    for name, value in thresholds.items():
+        default = getattr(module, name, None)
+        if not name.isupper() or isinstance(default, bool) or not isinstance(default, (int, float)):
+            raise ValueError(f"{module.__name__} has no numeric threshold {name!r}")
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"threshold {name} must be a number, got {value!r}")
+        checked[name] = value
+    return checked
+
+
+def run_station(options, frame_size=(FRAME_WIDTH, FRAME_HEIGHT)):
+    """Open the camera and pose model once and run tests on them, starting with options.test."""
+    if (options.lanes or 0) > 1 or options.lane_box:
+        print("ERROR: lanes are not supported by the station daemon.")
+        return
+    cap = open_capture(parse_source(options.source), frame_size, options.capture_fps)
+    if cap is None:
+        return
+    window_name = "Station (POST /switch to change test, 'q' to quit)"
+    if not options.headless:
+        cv2.namedWindow(window_name)
+    models = PoseModels()
+
+    def build(level):
+        return pose_estimator(models.get(level.complexity), options.roi, level.scale)
+
+    actual_size = capture_size(cap)
+    station = Station(options, actual_size)
+    if not station.switch({"test": options.test}):
+        cap.release()
+        return
+    tuner = None
+    if options.autotune:
+        tuner, estimate = start_autotune(station.detector, options, cap, frame_size, build)
+    else:
+        start = time.perf_counter()
+        estimate = build(DEFAULT_LEVEL)
+        # the first inference loads the model graph; pay for it now rather than on the first frame
+        estimate(np.zeros((actual_size[1], actual_size[0], 3), np.uint8))
+        print(f"Pose model ready in {time.perf_counter() - start:.1f} s")
+    station.tuner = tuner
+    recorder = None
+    if options.record:
+        recorder = LandmarkRecorder(options.record, actual_size)
+    metrics = TrackerMetrics("station", options.station)
+    station.switch_seconds = metrics.registry.histogram(
+        "station_switch_seconds", "Time from a switch request to the new test running", buckets=SWITCH_BUCKETS)
+    if tuner is not None:
+        tuner.register(metrics.registry)
+    scheduler = AdaptiveScheduler() if options.adaptive else None
+    bound = None
+
+    try:
+        def infer(frame):
+            nonlocal estimate
+            if scheduler is not None and not scheduler.should_infer(frame, station):
+                return None
+            start = time.perf_counter()
+            results = estimate(frame.image) if station.needs_pose() else None
+            pose_landmarks = results.pose_landmarks if results is not None else None
+            if results is not None:
+                # frames the detector handled without pose (flow, ball) are not pose inferences
+                metrics.observe(frame, time.perf_counter() - start, pose_landmarks is not None)
+            if recorder is not None:
+                recorder.write(frame, pose_landmarks)
+            station.slot.process(pose_landmarks.landmark if pose_landmarks else None, frame)
+            if tuner is not None and results is not None:
+                tuner.observe(time.perf_counter() - start)
+                estimate = tuner.adjust(frame.timestamp, station.in_attempt()) or estimate
+            return results
+
+        def render(frame, results):
+            nonlocal bound
+            vis_frame = frame.image
+            detector = station.detector
+            if detector is not bound:
+                detector.bind_window(window_name, pipeline.submit)
+                bound = detector
+            if detector.draw_landmarks and results is not None and results.pose_landmarks:
+                mp_drawing.draw_landmarks(vis_frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
+            detector.draw(vis_frame)
+            station.draw_status(vis_frame)
+            cv2.imshow(window_name, vis_frame)
+
+            key = cv2.waitKey(5)
+            if key == -1:
+                return True
+            key &= 0xFF
+            if key == ord('q'):
+                return False
+            pipeline.submit(station.handle_key, key)
+            return True
+
+        def dispatch(command, data):
+            if command == "quit":
+                pipeline.stop()
+            elif command == "switch":
+                pipeline.submit(station.switch, data, time.perf_counter())
+            else:
+                pipeline.submit(station.handle_command, command, data)
+
+        # size the capture process's ring for the longest backlog a switch may ask for
+        pipeline = frame_pipeline(cap, infer, None if options.headless else render, options,
+                                  options.max_capture_backlog)
+        station.pipeline = pipeline
+        pipeline.capture_backlog = station.detector.capture_backlog
+        metrics.bind(pipeline, station)
+        servers = []
+        if options.metrics_port:
+            servers.append(start_metrics_server(metrics.registry, options.metrics_port))
+        servers.append(start_control_server(dispatch, options.control_port or CONTROL_PORT))
+        try:
+            pipeline.run()
+        except KeyboardInterrupt:
+            pipeline.stop()
+        for server in servers:
+            server.shutdown()
+    finally:
+        models.close()
+        # flush queued results even if the pipeline or a detector raised
+        station.close()
+
+    if scheduler is not None:
+        print(scheduler.summary())
+    if tuner is not None:
+        print(tuner.summary())
+    if recorder is not None:
+        recorder.close()
+    cap.release()
+    if not options.headless:
+        cv2.destroyAllWindows()
+
+
+def main(argv=None):
+    parser = tracker_arg_parser("Keep the camera and pose model loaded and switch tests through the control API.")
+    parser.add_argument("--test", required=True, choices=list(DETECTORS), help="test to start with")
+    parser.add_argument("--max-capture-backlog", type=int, default=MAX_CAPTURE_BACKLOG,
+                        help=f"most frames a test may queue for inference (default {MAX_CAPTURE_BACKLOG}; "
+                             "vertical_jump with pose_every K needs 2K)")
+    run_station(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+station_host.py
+Run several camera lanes on one machine, one worker process per lane.
+
+Each lane is TEST:SOURCE[:STATION] and gets its own process with its own capture,
+MediaPipe Pose and detector, run headless through pipeline.run_tracker. A lane
+can host several tests on the same camera, TEST+TEST:SOURCE, sharing one pose
+inference per frame (multitest.run_tests). Every lane
+posts to the same results server (--server), which is the shared results sink;
+the dashboards for lane i are at /<test>/<station>/.
+
+The machine's cores are split into one contiguous block per lane and each worker
+is pinned to its block (Linux), with OpenCV limited to that many threads, so
+lanes cannot starve each other. With more lanes than cores, lanes share cores
+round-robin. Lane i's control API listens on --control-port + i, and its
+/metrics on --metrics-port + i when given.
+
+    python station_host.py sit_ups:0 sit_ups:1 vertical_jump:2:lane3
+    python station_host.py vertical_jump+broad_jump:0 sit_ups+sit_and_reach:1
+    python station_host.py broad_jump:clips/a.mp4 broad_jump:clips/b.mp4 --server http://10.0.0.5:5000
+
+A lane that crashes (non-zero exit) is restarted after RESTART_DELAY seconds.
+A camera lane that loses its camera (or cannot open it) exits non-zero, so it
+is restarted too; a lane whose video ends is left stopped.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from control import CONTROL_PORT
+from detectors import DETECTORS
+from pipeline import SERVER_URL
+
+RESTART_DELAY = 2.0
+SHUTDOWN_TIMEOUT = 5.0
+
+
+def parse_lane(spec, number):
+    """TEST[+TEST...]:SOURCE[:STATION] -> (test, source, station). Station defaults to lane<number>."""
+    parts = spec.split(":", 2)
+    tests = parts[0].split("+")
+    if len(parts) < 2 or not all(test in DETECTORS for test in tests) or len(set(tests)) != len(tests):
+        raise argparse.ArgumentTypeError(
+            f"lane {spec!r} must be TEST[+TEST...]:SOURCE[:STATION] with each TEST one of {', '.join(DETECTORS)}")
+    station = parts[2] if len(parts) == 3 else f"lane{number}"
+    return parts[0], parts[1], station
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def allocate_cores(cores, lanes):
+    """Split cores into one contiguous block per lane; lanes share cores when there are fewer cores than lanes."""
+    if lanes <= len(cores):
+        blocks = []
+        start = 0
+        for i in range(lanes):
+            size = len(cores) // lanes + (1 if i < len(cores) % lanes else 0)
+            blocks.append(cores[start:start + size])
+            start += size
+        return blocks
+    return [[cores[i % len(cores)]] for i in range(lanes)]
+
+
+def run_lane(test, source, station, cores, argv):
+    """Worker process entry point: pin to cores and run one headless tracker."""
+    import cv2
+    from detectors import create_detector
+    from multitest import run_tests
+    from pipeline import is_video_file, run_tracker, tracker_arg_parser
+
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    cv2.setNumThreads(len(cores))
+    options = tracker_arg_parser().parse_args(argv)
+    print(f"[{test}/{station}] source {source} on cores {cores}")
+    try:
+        if "+" in test:
+            ended = run_tests([create_detector(name) for name in test.split("+")], f"{test} {station}",
+                              options=options)
+        else:
+            ended = run_tracker(create_detector(test), f"{test} {station}", options=options)
+    except KeyboardInterrupt:
+        return
+    if ended and not is_video_file(source):
+        print(f"[{test}/{station}] camera {source} lost")
+        sys.exit(1)
+
+
+class Lane:
+    def __init__(self, number, test, source, station, cores, argv):
+        self.number = number
+        self.test = test
+        self.source = source
+        self.station = station
+        self.cores = cores
+        self.argv = argv
+        self.process = None
+        self.restarts = 0
+        self.restart_at = None
+
+    def start(self, context):
+        self.process = context.Process(target=run_lane, name=f"lane{self.number}",
+                                       args=(self.test, self.source, self.station, self.cores, self.argv))
+        self.process.start()
+        self.restart_at = None
+
+    def label(self):
+        return f"lane {self.number} ({self.test}/{self.station})"
+
+
+def lane_argv(args, number, source, station):
+    argv = ["--headless", "--source", source, "--station", station, "--server", args.server,
+            "--control-port", str(args.control_port + number)]
+    if args.metrics_port:
+        argv += ["--metrics-port", str(args.metrics_port + number)]
+    if args.roi:
+        argv.append("--roi")
+    if args.adaptive:
+        argv.append("--adaptive")
+    if args.autotune:
+        argv.append("--autotune")
+    return argv
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several camera lanes on one machine.")
+    parser.add_argument("lanes", nargs="+", metavar="TEST:SOURCE[:STATION]")
+    parser.add_argument("--server", default=SERVER_URL, help="results server every lane posts to")
+    parser.add_argument("--control-port", type=int, default=CONTROL_PORT,
+                        help="control API port of lane 0; lane i uses this + i")
+    parser.add_argument("--metrics-port", type=int, help="/metrics port of lane 0; lane i uses this + i")
+    parser.add_argument("--roi", action="store_true", help="ROI-cropped pose inference on every lane")
+    parser.add_argument("--adaptive", action="store_true", help="motion-gated pose rate on every lane")
+    parser.add_argument("--autotune", action="store_true",
+                        help="tune pose complexity and resolution per lane to its test's FPS target")
+    parser.add_argument("--cores", type=int, help="use only this many cores (default: all available)")
+    args = parser.parse_args(argv)
+
+    try:
+        specs = [parse_lane(spec, i) for i, spec in enumerate(args.lanes)]
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    cores = available_cores()
+    if args.cores:
+        cores = cores[:args.cores]
+    blocks = allocate_cores(cores, len(specs))
+
+    # MediaPipe and OpenCV are not fork-safe once initialised; give every lane a fresh interpreter
+    context = multiprocessing.get_context("spawn")
+    lanes = []
+    for i, ((test, source, station), block) in enumerate(zip(specs, blocks)):
+        lanes.append(Lane(i, test, source, station, block, lane_argv(args, i, source, station)))
+    for lane in lanes:
+        lane.start(context)
+    print(f"Started {len(lanes)} lanes on {len(cores)} cores, posting to {args.server}")
+
+    try:
+        while True:
+            running = 0
+            for lane in lanes:
+                if lane.process.is_alive():
+                    running += 1
+                    continue
+                if lane.restart_at is not None:
+                    if time.monotonic() >= lane.restart_at:
+                        lane.restarts += 1
+                        print(f"Restarting {lane.label()} (restart {lane.restarts})")
+                        lane.start(context)
+                    running += 1
+                    continue
+                if lane.process.exitcode not in (0, None):
+                    print(f"{lane.label()} exited with code {lane.process.exitcode}")
+                    lane.restart_at = time.monotonic() + RESTART_DELAY
+                    running += 1
+            if running == 0:
+                break
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("Stopping lanes...")
+    finally:
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for lane in lanes:
+            lane.process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if lane.process.is_alive():
+                lane.process.terminate()
+                lane.process.join()
+    print("All lanes stopped.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+store.py
+SQLite-backed history of every attempt posted to the results server.
+
+Schema:
+ - athletes(athlete_id, name, age_group)
+ - sessions(session_id, started_at)
+ - attempts(attempt_id, session_id, test, station, athlete_id, created_at,
+            score, metrics JSON, client_id, seq)
+
+score is the attempt's headline number (jump height, distance, throw range,
+reach, or the rep count for sit-ups), so "best attempt per athlete per test" is
+one index range scan on (test, athlete_id, score) and "all attempts in session X"
+one on (session_id, attempt_id).
+
+The database runs in WAL mode so readers never block the writer. add_attempt()
+only queues the row; a background thread inserts queued rows in one
+transaction every FLUSH_SECONDS (or once BATCH_SIZE rows are waiting), and
+close() writes the rest. The server keeps serving /status from memory; the
+database is read at startup (load_session) and by the history queries.
+"""
+
+import atexit
+import json
+import sqlite3
+import threading
+import time
+
+DB_PATH = "results.db"
+FLUSH_SECONDS = 0.5
+BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS athletes (
+    athlete_id TEXT PRIMARY KEY,
+    name TEXT,
+    age_group TEXT
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    attempt_id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL REFERENCES sessions(session_id),
+    test TEXT NOT NULL,
+    station TEXT NOT NULL,
+    athlete_id TEXT NOT NULL REFERENCES athletes(athlete_id),
+    created_at REAL NOT NULL,
+    score REAL,
+    metrics TEXT,
+    client_id TEXT,
+    seq INTEGER
+);
+CREATE INDEX IF NOT EXISTS attempts_best ON attempts(test, athlete_id, score DESC);
+CREATE INDEX IF NOT EXISTS attempts_session ON attempts(session_id, attempt_id);
+"""
+
+ATTEMPT_COLUMNS = ("attempt_id", "session_id", "test", "station", "athlete_id", "created_at", "score", "metrics")
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=10.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+def _attempt(row):
+    attempt = dict(zip(ATTEMPT_COLUMNS, row))
+    attempt["metrics"] = json.loads(attempt["metrics"]) if attempt["metrics"] else {}
+    return attempt
+
+
+class ResultsStore:
+    def __init__(self, path=DB_PATH, session_id=None):
+        self.path = path
+        self.session_id = session_id or time.strftime("%Y-%m-%d")
+        conn = connect(path)
+        with conn:
+            conn.executescript(SCHEMA)
+            conn.execute("INSERT OR IGNORE INTO sessions (session_id, started_at) VALUES (?, ?)",
+                         (self.session_id, time.time()))
+        conn.close()
+
+        self._pending = []
+        self._athletes = {}
+        self._cond = threading.Condition()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add_attempt(self, test, station, athlete, score, metrics, client=None, seq=None):
+        """Queue one attempt for the next batch insert."""
+        row = (self.session_id, test, station, athlete, time.time(), score,
+               json.dumps(metrics) if metrics else None, client, seq)
+        with self._cond:
+            self._athletes.setdefault(athlete, None)
+            self._pending.append(row)
+            if len(self._pending) >= BATCH_SIZE:
+                self._cond.notify()
+
+    def set_athlete(self, athlete, name=None, age_group=None):
+        """Queue an athlete's details; missing values keep what is stored."""
+        with self._cond:
+            self._athletes[athlete] = (name, age_group)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _flush(self, conn, athletes, rows):
+        with conn:
+            for athlete, details in athletes.items():
+                conn.execute("INSERT OR IGNORE INTO athletes (athlete_id) VALUES (?)", (athlete,))
+                if details is not None:
+                    name, age_group = details
+                    conn.execute("UPDATE athletes SET name = COALESCE(?, name), "
+                                 "age_group = COALESCE(?, age_group) WHERE athlete_id = ?",
+                                 (name, age_group, athlete))
+            conn.executemany(
+                "INSERT INTO attempts (session_id, test, station, athlete_id, created_at, score, metrics, "
+                "client_id, seq) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _run(self):
+        # sqlite3 connections belong to the thread that opened them
+        conn = connect(self.path)
+        while True:
+            with self._cond:
+                if not self._closing and len(self._pending) < BATCH_SIZE:
+                    self._cond.wait(FLUSH_SECONDS)
+                athletes, self._athletes = self._athletes, {}
+                rows, self._pending = self._pending, []
+                closing = self._closing
+            if athletes or rows:
+                try:
+                    self._flush(conn, athletes, rows)
+                except sqlite3.Error as e:
+                    print("Could not write attempts:", e)
+                    with self._cond:
+                        for athlete, details in athletes.items():
+                            self._athletes.setdefault(athlete, details)
+                        self._pending[:0] = rows
+                    if not closing:
+                        time.sleep(FLUSH_SECONDS)
+                        continue
+            if closing:
+                conn.close()
+                return
+
+    # Queries run on their own short-lived connection so they never wait on the writer
+
+    def _query(self, sql, params):
+        conn = connect(self.path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def load_session(self, session_id=None):
+        """Every attempt of a session in order, as (test, station, athlete, metrics, client, seq)."""
+        rows = self._query("SELECT test, station, athlete_id, metrics, client_id, seq FROM attempts "
+                           "WHERE session_id = ? ORDER BY attempt_id", (session_id or self.session_id,))
+        return [(test, station, athlete, json.loads(metrics) if metrics else {}, client, seq)
+                for test, station, athlete, metrics, client, seq in rows]
+
+    def session_attempts(self, session_id, test=None):
+        sql = f"SELECT {', '.join(ATTEMPT_COLUMNS)} FROM attempts WHERE session_id = ?"
+        params = [session_id]
+        if test is not None:
+            sql += " AND test = ?"
+            params.append(test)
+        return [_attempt(row) for row in self._query(sql + " ORDER BY attempt_id", params)]
+
+    def best_attempts(self, test, session_id=None):
+        """Each athlete's highest-scoring attempt at test (optionally within one session), best first."""
+        columns = ", ".join(c if c != "score" else "MAX(score) AS score" for c in ATTEMPT_COLUMNS)
+        sql = f"SELECT {columns} FROM attempts WHERE test = ? AND score IS NOT NULL"
+        params = [test]
+        if session_id is not None:
+            sql += " AND session_id = ?"
+            params.append(session_id)
+        sql += " GROUP BY athlete_id ORDER BY score DESC"
+        return [_attempt(row) for row in self._query(sql, params)]
+
+    def athletes(self):
+        rows = self._query("SELECT athlete_id, name, age_group FROM athletes ORDER BY athlete_id", ())
+        return [dict(athlete=a, name=n, age_group=g) for a, n, g in rows]
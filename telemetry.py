@@ -0,0 +1,146 @@
+"""
+telemetry.py
+Non-blocking client used by the trackers to push results to the Flask server.
+
+Two kinds of traffic are handled by one background sender thread:
+ - events (reps, jumps, throws): queued FIFO and delivered in order, retried until
+   the server accepts them so none are lost or reordered when it is slow or down.
+   Only connection errors and 5xx are retried; an event the server rejects
+   (4xx, e.g. a wrong test or station path) is logged and dropped so it cannot
+   hold up the ones behind it.
+ - state updates (e.g. /update_reach): coalesced per path to the latest value and
+   sent at most STATE_RATE_HZ times per second.
+
+event() and state() only touch an in-memory buffer, so the capture loop never
+waits on the network. Requests go over one pooled keep-alive requests.Session.
+"""
+
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+STATE_RATE_HZ = 10.0
+REQUEST_TIMEOUT = (0.5, 2.0)  # (connect, read) seconds
+RETRY_MIN_DELAY = 0.1
+RETRY_MAX_DELAY = 2.0
+
+
+class TelemetryClient:
+    def __init__(self, base_url, state_rate_hz=STATE_RATE_HZ):
+        self.base_url = base_url.rstrip("/")
+        self.state_interval = 1.0 / state_rate_hz if state_rate_hz > 0 else 0.0
+        self.client_id = uuid.uuid4().hex
+        self._seq = itertools.count(1)
+
+        self._events = deque()
+        self._states = {}
+        self._cond = threading.Condition()
+        self._closing = False
+        self._next_state_time = 0.0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def event(self, path, payload=None):
+        """Queue a discrete event for in-order, exactly-once delivery."""
+        with self._cond:
+            self._events.append((next(self._seq), path, payload))
+            self._cond.notify()
+
+    def state(self, path, payload):
+        """Record the latest state for path; only the newest value is sent."""
+        with self._cond:
+            self._states[path] = payload
+            self._cond.notify()
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._events) + len(self._states)
+
+    def close(self, timeout=5.0):
+        """Stop the sender, first trying to flush whatever is still queued."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"Gave up flushing to {self.base_url}: {self.queue_depth()} updates were not sent")
+        self.session.close()
+
+    def _post(self, path, payload, seq=None):
+        headers = {"X-Telemetry-Client": self.client_id}
+        if seq is not None:
+            headers["X-Telemetry-Seq"] = str(seq)
+        r = self.session.post(self.base_url + path, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
+        r.raise_for_status()
+
+    def _send(self, path, payload, seq=None):
+        """Post; failures worth retrying are raised, any other failure drops the message."""
+        try:
+            self._post(path, payload, seq)
+        except Exception as e:
+            if retryable(e):
+                raise
+            print(f"Dropped {path} (not retried): {e}")
+
+    def _state_due(self):
+        return self._states and time.monotonic() >= self._next_state_time
+
+    def _run(self):
+        delay = RETRY_MIN_DELAY
+        while True:
+            with self._cond:
+                while not (self._events or self._state_due() or self._closing):
+                    if self._states:
+                        self._cond.wait(max(0.0, self._next_state_time - time.monotonic()))
+                    else:
+                        self._cond.wait()
+                if self._closing and not (self._events or self._states):
+                    return
+                event = self._events[0] if self._events else None
+                states = {}
+                if event is None and (self._state_due() or self._closing):
+                    states, self._states = self._states, {}
+                    self._next_state_time = time.monotonic() + self.state_interval
+
+            try:
+                if event is not None:
+                    seq, path, payload = event
+                    self._send(path, payload, seq)
+                    with self._cond:
+                        self._events.popleft()
+                for path in list(states):
+                    self._send(path, states[path])
+                    del states[path]
+                delay = RETRY_MIN_DELAY
+            except Exception as e:
+                print("Could not update counter:", e)
+                if self._closing:
+                    with self._cond:
+                        lost_states = len(states) + len(self._states)
+                        print(f"Server unreachable while closing: {len(self._events)} events and "
+                              f"{lost_states} state updates for {self.base_url} were not sent")
+                    return
+                with self._cond:
+                    # Put back unsent states unless a newer value already arrived
+                    for path, payload in states.items():
+                        self._states.setdefault(path, payload)
+                    self._cond.wait(delay)
+                delay = min(delay * 2, RETRY_MAX_DELAY)
+
+
+def retryable(error):
+    """Connection problems and server errors (5xx) may succeed later; anything else will not."""
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))